@@ -0,0 +1,102 @@
+"""
+Offline stand-in for the Gemini-backed agent stack in finance_api.agents.
+
+FakeAgentSystem exposes the attributes of AgentSystem that the advice
+code uses (specialist chains, router, synthesis) without importing
+google.generativeai or langchain. Each call sleeps for a configurable
+latency and returns canned text, so advice endpoints can be benchmarked
+without network access or API keys.
+
+Usage (inside a process that has called django.setup()):
+    from benchmarks.fake_llm import install_fake_agents
+    install_fake_agents(latency_ms=300, tokens=60)
+"""
+import threading
+import time
+from typing import Any, Dict, Iterator
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeLLM:
+    """Returns a fixed number of tokens after a latency; streaming spreads the latency over the tokens"""
+
+    def __init__(self, name: str, latency_ms: float = 300, tokens: int = 60):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.tokens = tokens
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _answer(self, prompt: str) -> str:
+        with self._lock:
+            self.calls += 1
+        words = f'{self.name} advice for a prompt of {len(prompt)} characters'.split()
+        return ' '.join(words[i % len(words)] for i in range(self.tokens))
+
+    def invoke(self, prompt: Any) -> FakeMessage:
+        time.sleep(self.latency_ms / 1000)
+        return FakeMessage(self._answer(str(prompt)))
+
+    def stream(self, prompt: Any) -> Iterator[FakeMessage]:
+        delay = self.latency_ms / 1000 / max(self.tokens, 1)
+        for word in self._answer(str(prompt)).split(' '):
+            time.sleep(delay)
+            yield FakeMessage(word + ' ')
+
+
+class FakePrompt:
+    def __init__(self, template: str):
+        self.template = template
+
+    def format(self, **kwargs) -> str:
+        return self.template.format(**kwargs)
+
+
+class FakeChain:
+    """Matches the LLMChain surface used by agents.py: run(), .llm and .prompt"""
+
+    def __init__(self, llm: FakeLLM, template: str):
+        self.llm = llm
+        self.prompt = FakePrompt(template)
+
+    def run(self, inputs: Any) -> str:
+        prompt = self.prompt.format(**inputs) if isinstance(inputs, dict) else str(inputs)
+        return self.llm.invoke(prompt).content
+
+
+class FakeAgentSystem:
+    """Drop-in for finance_api.agents.AgentSystem backed by FakeLLMs"""
+
+    def __init__(self, latency_ms: float = 300, tokens: int = 60):
+        from finance_api.agents import ROUTING_TEMPLATE, SPECIALIST_TEMPLATES, SYNTHESIS_TEMPLATE
+
+        self.specialist_chains = {
+            name: FakeChain(FakeLLM(name, latency_ms, tokens), template)
+            for name, template in SPECIALIST_TEMPLATES.items()
+        }
+        self.routing_prompt = FakePrompt(ROUTING_TEMPLATE)
+        self.router_llm = FakeLLM('Router', latency_ms / 3, 1)
+        self.synthesis_prompt = FakePrompt(SYNTHESIS_TEMPLATE)
+        self.synthesis_llm = FakeLLM('Synthesis', latency_ms, tokens)
+        self.synthesis_chain = FakeChain(self.synthesis_llm, SYNTHESIS_TEMPLATE)
+        # The ReAct agent takes a routing step and a specialist step
+        self.router_agent = FakeChain(FakeLLM('ReAct', latency_ms * 2, tokens), '{question}')
+
+    def llm_calls(self) -> Dict[str, int]:
+        llms = [chain.llm for chain in self.specialist_chains.values()]
+        llms += [self.router_llm, self.synthesis_llm, self.router_agent.llm]
+        return {llm.name: llm.calls for llm in llms}
+
+
+def install_fake_agents(latency_ms: float = 300, tokens: int = 60) -> FakeAgentSystem:
+    """Make get_agent_system() return a FakeAgentSystem in this process"""
+    from finance_api import agents
+
+    system = FakeAgentSystem(latency_ms, tokens)
+    with agents._agent_system_lock:
+        agents._agent_system = system
+    return system
@@ -0,0 +1,95 @@
+"""
+Measure how long a fresh process takes to boot the Django app.
+
+Each sample runs in a new interpreter that calls django.setup() and imports
+the URL configuration (which pulls in every view and finance_api.agents),
+so it reflects what manage.py commands, test runs and workers pay at
+startup. With --build-agents the samples also build the LLM agent stack,
+which shows the cost that lazy initialization keeps out of startup.
+
+Usage:
+    python benchmarks/import_time.py [--runs 10] [--build-agents] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules whose presence after boot means the heavy LLM stack was imported
+HEAVY_MODULES = ('google.generativeai', 'langchain', 'langchain_google_genai')
+
+SAMPLE_SCRIPT = """
+import json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'finance_advisor.settings')
+import django
+django.setup()
+import finance_advisor.urls
+booted = time.perf_counter()
+if {build_agents!r}:
+    from finance_api.agents import get_agent_system
+    get_agent_system()
+done = time.perf_counter()
+print(json.dumps({{
+    'boot_ms': (booted - start) * 1000,
+    'total_ms': (done - start) * 1000,
+    'heavy_modules': sorted(name for name in {heavy_modules!r} if name in sys.modules),
+}}))
+"""
+
+
+def run_sample(build_agents: bool) -> dict:
+    """Boot the app once in a fresh interpreter and return its timings"""
+    script = SAMPLE_SCRIPT.format(build_agents=build_agents, heavy_modules=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, '-c', script],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def summarize(values: list) -> dict:
+    return {
+        'min': round(min(values), 1),
+        'median': round(statistics.median(values), 1),
+        'max': round(max(values), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='Number of fresh processes to sample')
+    parser.add_argument('--build-agents', action='store_true', help='Also build the LLM agent stack')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    samples = [run_sample(args.build_agents) for _ in range(args.runs)]
+    report = {
+        'runs': args.runs,
+        'build_agents': args.build_agents,
+        'boot_ms': summarize([sample['boot_ms'] for sample in samples]),
+        'total_ms': summarize([sample['total_ms'] for sample in samples]),
+        'heavy_modules_loaded_at_boot': samples[-1]['heavy_modules'] if not args.build_agents else None,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Django boot over {args.runs} runs (ms): {report['boot_ms']}")
+    if args.build_agents:
+        print(f"Boot + agent stack build (ms): {report['total_ms']}")
+    else:
+        loaded = report['heavy_modules_loaded_at_boot']
+        print(f"Heavy LLM modules imported at boot: {', '.join(loaded) if loaded else 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""
+Drive the API under concurrency against a local RapidAPI stub and fake LLM.
+
+The harness starts stub_rapidapi.py in a subprocess, points the services at
+it with FINANCE_UPSTREAM_BASE_URL, installs the FakeAgentSystem from
+fake_llm.py, creates a throwaway SQLite database with a benchmark user and
+portfolio, and serves the app from a threaded WSGI server in this process.
+Each scenario then sends --requests requests from --concurrency client
+threads and records:
+
+- latency percentiles (p50/p95/p99/max) and requests per second
+- error counts by HTTP status
+- upstream calls that reached the stub, and fake LLM calls
+- resident memory of the app process
+
+No network access or API keys are needed. The report is JSON (--json or
+--output), and --compare prints how a run differs from a saved report.
+
+Usage:
+    python benchmarks/load_test.py [--scenarios stock_quote,advice] [--concurrency 16]
+        [--requests 200] [--symbols 50] [--stub-latency-ms 80] [--error-rate 0.0]
+        [--llm-latency-ms 300] [--upstream-rate 1000] [--keep-caches]
+        [--json] [--output report.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+QUESTIONS = [
+    'Should I rebalance my portfolio toward more bonds?',
+    'How are tech stocks and the S&P 500 trending this quarter?',
+    'How can I reduce capital gains taxes when I sell shares?',
+    'How much should I put in my Roth IRA to retire at 60?',
+    'What are the tax implications of withdrawing from my 401k early to buy stocks?',
+    'Is it a good time to invest in dividend ETFs given the market outlook?',
+]
+
+# name -> callable(rng, symbols) returning (method, path, JSON body or None)
+Request = Tuple[str, str, Optional[Dict[str, Any]]]
+SCENARIOS: Dict[str, Callable[[random.Random, List[str]], Request]] = {
+    'stock_quote': lambda rng, symbols: ('GET', f'/api/finance/stock-quote/?symbol={rng.choice(symbols)}', None),
+    'batch_quotes': lambda rng, symbols: (
+        'POST', '/api/finance/quotes/batch/', {'symbols': rng.sample(symbols, min(10, len(symbols)))}
+    ),
+    'company_data': lambda rng, symbols: ('GET', f'/api/finance/company-data/?symbol={rng.choice(symbols)}', None),
+    'ticker_details': lambda rng, symbols: ('GET', f'/api/finance/ticker-details/{rng.choice(symbols)}/', None),
+    'search': lambda rng, symbols: ('GET', f'/api/finance/search/?query={rng.choice(symbols)[:rng.randint(1, 4)]}', None),
+    'chart': lambda rng, symbols: (
+        'GET', f"/api/finance/chart/?symbol={rng.choice(symbols)}&interval={rng.choice(['1m', '5m', '1h'])}", None
+    ),
+    'portfolios': lambda rng, symbols: ('GET', '/api/portfolios/', None),
+    'advice': lambda rng, symbols: ('POST', '/api/advice/', {'question': rng.choice(QUESTIONS)}),
+}
+
+
+def percentile(sorted_values: List[float], share: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(share * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def start_stub(args) -> Tuple[subprocess.Popen, str]:
+    """Start the stub server and return (process, base URL)"""
+    process = subprocess.Popen(
+        [
+            sys.executable, os.path.join(BENCHMARKS_DIR, 'stub_rapidapi.py'), '--port', '0',
+            '--latency-ms', str(args.stub_latency_ms), '--jitter-ms', str(args.stub_jitter_ms),
+            '--error-rate', str(args.error_rate), '--throttle-rate', str(args.throttle_rate),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = process.stdout.readline()
+    if 'http://' not in line:
+        process.kill()
+        raise RuntimeError(f'Stub server did not start: {line!r}')
+    return process, line.strip().split()[-1]
+
+
+def setup_app(args, stub_url: str, database: str):
+    """Configure and boot Django against the stub, returning the benchmark user's token"""
+    os.environ['FINANCE_UPSTREAM_BASE_URL'] = stub_url
+    os.environ.setdefault('RAPIDAPI_KEY', 'benchmark')
+    os.environ['FINANCE_RATE_LIMIT_PER_SECOND'] = str(args.upstream_rate)
+    os.environ['FINANCE_RATE_LIMIT_BURST'] = str(args.upstream_rate)
+    # A locally built symbol index would answer searches without the stub
+    os.environ['FINANCE_SYMBOL_INDEX_PATH'] = os.path.join(os.path.dirname(database), 'no-symbol-index.json.gz')
+    # Charts ingest each symbol from the stub once, then read from disk
+    os.environ['FINANCE_PRICE_HISTORY_PATH'] = os.path.join(os.path.dirname(database), 'price_history')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'finance_advisor.settings')
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, BENCHMARKS_DIR)
+
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = database
+    settings.DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = 30
+    settings.DEBUG = False
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+
+    from datetime import date
+
+    from django.contrib.auth.models import User
+    from rest_framework.authtoken.models import Token
+
+    from finance_api.models import Portfolio, Stock
+
+    user = User.objects.create_user(username='benchmark', password='benchmark-pass')
+    # bulk_create sends no signals, so no background context rebuild leaks into the first scenario
+    portfolio, = Portfolio.objects.bulk_create([Portfolio(user=user, name='Benchmark')])
+    Stock.objects.bulk_create([
+        Stock(portfolio=portfolio, symbol=symbol, name=f'{symbol} Inc', quantity=10,
+              purchase_price=100, purchase_date=date(2024, 1, 2))
+        for symbol in symbols_pool(min(args.symbols, 20))
+    ])
+    return Token.objects.create(user=user).key
+
+
+def start_app_server() -> Tuple[Any, str]:
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def symbols_pool(count: int) -> List[str]:
+    return [f'SYM{index:03d}' for index in range(count)]
+
+
+def reset_state(stub_url: str, keep_caches: bool) -> None:
+    requests.post(f'{stub_url}/__reset', timeout=5)
+    if keep_caches:
+        return
+    from finance_api.services import advice_cache, advice_context
+    from finance_api.services.response_cache import response_cache
+
+    response_cache.clear()
+    advice_cache.advice_cache.clear()
+    advice_context._contexts.clear()
+
+
+def run_scenario(name: str, args, app_url: str, stub_url: str, token: str, fake_agents) -> Dict[str, Any]:
+    reset_state(stub_url, args.keep_caches)
+    llm_before = sum(fake_agents.llm_calls().values())
+    rng = random.Random(args.seed)
+    symbols = symbols_pool(args.symbols)
+    planned = [SCENARIOS[name](rng, symbols) for _ in range(args.requests)]
+    local = threading.local()
+
+    def send(request: Request) -> Tuple[float, int]:
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+            session.headers['Authorization'] = f'Token {token}'
+        method, path, body = request
+        started = time.perf_counter()
+        try:
+            status = session.request(method, app_url + path, json=body, timeout=60).status_code
+        except requests.RequestException:
+            status = 0
+        return (time.perf_counter() - started) * 1000, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(send, planned))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    statuses: Dict[str, int] = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    upstream = requests.get(f'{stub_url}/__stats', timeout=5).json()
+    return {
+        'requests': len(results),
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(len(results) / elapsed, 1),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50), 2),
+            'p95': round(percentile(latencies, 0.95), 2),
+            'p99': round(percentile(latencies, 0.99), 2),
+            'max': round(latencies[-1], 2),
+            'mean': round(sum(latencies) / len(latencies), 2),
+        },
+        'statuses': statuses,
+        'errors': sum(count for status, count in statuses.items() if not status.startswith('2')),
+        'upstream_calls': upstream['total'],
+        'upstream_calls_by_path': upstream['calls'],
+        'upstream_errors_injected': upstream['errors'] + upstream['throttled'],
+        'llm_calls': sum(fake_agents.llm_calls().values()) - llm_before,
+        'rss_mb': round(rss_mb(), 1),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the relative change of the headline numbers against a saved report"""
+    def change(new: float, old: float) -> str:
+        return f'{(new - old) / old * 100:+.1f}%' if old else 'n/a'
+
+    print(f"\nCompared with {baseline.get('revision') or 'baseline'}:")
+    for name, scenario in report['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if old is None:
+            continue
+        print(
+            f"  {name:<15} p50 {change(scenario['latency_ms']['p50'], old['latency_ms']['p50']):>8}  "
+            f"p95 {change(scenario['latency_ms']['p95'], old['latency_ms']['p95']):>8}  "
+            f"req/s {change(scenario['requests_per_s'], old['requests_per_s']):>8}  "
+            f"upstream {scenario['upstream_calls']} vs {old['upstream_calls']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated scenarios to run')
+    parser.add_argument('--concurrency', type=int, default=16, help='Client threads sending requests')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+    parser.add_argument('--symbols', type=int, default=50, help='Distinct symbols requested (smaller means more cache hits)')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the request mix')
+    parser.add_argument('--stub-latency-ms', type=float, default=80, help='Mean stub response latency')
+    parser.add_argument('--stub-jitter-ms', type=float, default=20, help='Stub latency jitter')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of upstream calls failing with 503')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of upstream calls answered with 429')
+    parser.add_argument('--llm-latency-ms', type=float, default=300, help='Latency of each fake LLM call')
+    parser.add_argument('--llm-tokens', type=int, default=60, help='Tokens in each fake LLM answer')
+    parser.add_argument(
+        '--upstream-rate', type=float, default=1000,
+        help='Upstream rate limit per host (requests/s); lower it to benchmark the limiter itself',
+    )
+    parser.add_argument('--keep-caches', action='store_true', help='Do not clear the caches between scenarios')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    parser.add_argument('--compare', help='JSON report of an earlier run to compare with')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    stub, stub_url = start_stub(args)
+    workdir = tempfile.mkdtemp(prefix='finance-benchmark-')
+    try:
+        token = setup_app(args, stub_url, os.path.join(workdir, 'benchmark.sqlite3'))
+        from fake_llm import install_fake_agents
+
+        fake_agents = install_fake_agents(args.llm_latency_ms, args.llm_tokens)
+        server, app_url = start_app_server()
+        report = {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': {key: value for key, value in vars(args).items() if key not in ('json', 'output', 'compare')},
+            'scenarios': {},
+        }
+        for name in names:
+            report['scenarios'][name] = run_scenario(name, args, app_url, stub_url, token, fake_agents)
+        report['peak_rss_mb'] = round(peak_rss_mb(), 1)
+        server.shutdown()
+    finally:
+        stub.terminate()
+        stub.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'scenario':<15} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'upstream':>9} {'llm':>5}")
+        for name, scenario in report['scenarios'].items():
+            latency = scenario['latency_ms']
+            print(
+                f"{name:<15} {scenario['requests_per_s']:>8} {latency['p50']:>9} {latency['p95']:>9} "
+                f"{latency['p99']:>9} {scenario['errors']:>7} {scenario['upstream_calls']:>9} {scenario['llm_calls']:>5}"
+            )
+        print(f"Peak RSS: {report['peak_rss_mb']} MB")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
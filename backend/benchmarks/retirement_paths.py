@@ -0,0 +1,88 @@
+"""
+Measure Monte Carlo retirement projection throughput in paths per second.
+
+Every combination of --paths and --workers runs project_retirement() with
+the cache bypassed; workers=1 simulates every shard in this process, more
+workers spread the shards over the spawn-context process pool. The pool is
+started (and its workers import NumPy) by a warm-up run, so the timings
+show steady-state throughput rather than process start-up.
+
+Usage:
+    python benchmarks/retirement_paths.py [--paths 10000 100000] [--workers 1 2 4] [--repeat 3] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_PLAN = {
+    'current_age': 35,
+    'retirement_age': 65,
+    'end_age': 95,
+    'current_savings': 100000,
+    'annual_contribution': 15000,
+    'contribution_growth': 0.02,
+    'annual_withdrawal': 60000,
+}
+
+
+def time_projection(retirement, plan: dict, paths: int, workers: int, repeat: int) -> dict:
+    """Run one configuration ``repeat`` times and return its timings"""
+    seconds = []
+    for seed in range(repeat):
+        started = time.perf_counter()
+        retirement.project_retirement(plan, paths, seed=seed, workers=workers, use_cache=False)
+        seconds.append(time.perf_counter() - started)
+    median = statistics.median(seconds)
+    return {
+        'paths': paths,
+        'workers': workers,
+        'median_ms': round(median * 1000, 1),
+        'min_ms': round(min(seconds) * 1000, 1),
+        'paths_per_second': round(paths / median),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--paths', type=int, nargs='+', default=[10000, 50000, 100000], help='Path counts to run')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1],
+                        help='Worker counts to run')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per configuration')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    # The pool is sized once, from the environment
+    os.environ['FINANCE_RETIREMENT_WORKERS'] = str(max(args.workers))
+    sys.path.insert(0, BACKEND_DIR)
+    from finance_api.services import retirement_simulation as retirement
+
+    plan = retirement.parse_plan(SAMPLE_PLAN)
+    if max(args.workers) > 1:
+        retirement.run_simulation(plan, 2 * retirement.RETIREMENT_SHARD_PATHS, workers=max(args.workers))
+
+    results = [
+        time_projection(retirement, plan, paths, workers, args.repeat)
+        for paths in args.paths
+        for workers in sorted(set(args.workers))
+    ]
+    report = {'cpu_count': os.cpu_count(), 'repeat': args.repeat, 'results': results}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Retirement projection, {args.repeat} runs per configuration on {os.cpu_count()} CPUs")
+    for result in results:
+        print(
+            f"{result['paths']:>7} paths, {result['workers']} worker(s): "
+            f"{result['median_ms']:>8} ms median, {result['paths_per_second']:>10,} paths/s"
+        )
+
+
+if __name__ == '__main__':
+    main()
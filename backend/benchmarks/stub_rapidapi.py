@@ -0,0 +1,189 @@
+"""
+Stand-in for the RapidAPI hosts that replays recorded responses.
+
+Point the app at it with FINANCE_UPSTREAM_BASE_URL=http://127.0.0.1:<port>.
+Requests are matched on the path only (the x-rapidapi-host header is not
+needed because the two hosts use distinct paths), and every "{symbol}" in
+the recorded body is replaced by the requested symbol. Latency and
+failures can be injected to see how caching, coalescing, rate limiting
+and the circuit breakers behave.
+
+Control endpoints:
+    GET  /__stats   upstream call counts per path
+    POST /__reset   zero the counters
+
+Usage:
+    python benchmarks/stub_rapidapi.py [--port 8765] [--latency-ms 80] [--jitter-ms 20]
+        [--error-rate 0.0] [--throttle-rate 0.0] [--recordings PATH]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'rapidapi_responses.json')
+
+# Query parameters that name the requested symbol
+SYMBOL_PARAMS = ('symbol', 'ticker', 'tickers', 'query')
+
+
+def substitute(value: Any, symbol: str) -> Any:
+    """Replace {symbol} in every string of a recorded body"""
+    if isinstance(value, str):
+        return value.replace('{symbol}', symbol)
+    if isinstance(value, list):
+        return [substitute(item, symbol) for item in value]
+    if isinstance(value, dict):
+        return {key: substitute(item, symbol) for key, item in value.items()}
+    return value
+
+
+class Recordings:
+    """Recorded bodies by path pattern; "{symbol}" in a path matches one segment"""
+
+    def __init__(self, path: str):
+        with open(path) as f:
+            entries = json.load(f)
+        self.routes: List[Tuple[re.Pattern, str, Any]] = []
+        for entry in entries:
+            pattern = re.escape(entry['path']).replace(re.escape('{symbol}'), '(?P<symbol>[^/]+)')
+            self.routes.append((re.compile(f'^{pattern}$'), entry['path'], entry['body']))
+
+    def match(self, path: str, params: Dict[str, str]) -> Optional[Tuple[str, Any]]:
+        for pattern, route, body in self.routes:
+            found = pattern.match(path)
+            if found is None:
+                continue
+            symbol = found.groupdict().get('symbol') or next(
+                (params[name] for name in SYMBOL_PARAMS if params.get(name)), 'AAPL'
+            )
+            body = substitute(body, symbol.split(',')[0].split(':')[0].upper())
+            # Recordings hold a single page; later pages are empty
+            if params.get('page', '1') != '1' and isinstance(body, dict) and isinstance(body.get('body'), list):
+                body = dict(body, body=[])
+            return route, body
+        return None
+
+
+class StubState:
+    def __init__(self, recordings: Recordings, latency_ms: float, jitter_ms: float,
+                 error_rate: float, throttle_rate: float):
+        self.recordings = recordings
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.calls: Dict[str, int] = {}
+            self.errors = 0
+            self.throttled = 0
+
+    def count(self, route: str, counter: Optional[str] = None) -> None:
+        with self.lock:
+            self.calls[route] = self.calls.get(route, 0) + 1
+            if counter:
+                setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'total': sum(self.calls.values()),
+                'calls': dict(self.calls),
+                'errors': self.errors,
+                'throttled': self.throttled,
+            }
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            if self.path == '/__reset':
+                state.reset()
+                return self.send_json(200, {'reset': True})
+            self.send_json(404, {'message': 'Not found'})
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == '/__stats':
+                return self.send_json(200, state.stats())
+
+            params = {name: values[0] for name, values in parse_qs(url.query).items()}
+            matched = state.recordings.match(url.path, params)
+            if matched is None:
+                state.count(url.path)
+                return self.send_json(404, {'message': f'No recording for {url.path}'})
+            route, body = matched
+
+            delay = state.latency_ms + random.uniform(-state.jitter_ms, state.jitter_ms)
+            time.sleep(max(0.0, delay) / 1000)
+
+            roll = random.random()
+            if roll < state.error_rate:
+                state.count(route, 'errors')
+                return self.send_json(503, {'message': 'Service Unavailable'})
+            if roll < state.error_rate + state.throttle_rate:
+                state.count(route, 'throttled')
+                return self.send_json(429, {'message': 'Too many requests'}, {'Retry-After': '1'})
+            state.count(route)
+            self.send_json(200, body)
+
+    return Handler
+
+
+def create_server(port: int = 0, latency_ms: float = 80, jitter_ms: float = 20, error_rate: float = 0.0,
+                  throttle_rate: float = 0.0, recordings: str = DEFAULT_RECORDINGS) -> ThreadingHTTPServer:
+    """Create the stub server (port 0 picks a free port)"""
+    state = StubState(Recordings(recordings), latency_ms, jitter_ms, error_rate, throttle_rate)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (0 picks a free one)')
+    parser.add_argument('--latency-ms', type=float, default=80, help='Mean response latency')
+    parser.add_argument('--jitter-ms', type=float, default=20, help='Uniform +/- jitter added to the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 503')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of requests answered with 429')
+    parser.add_argument('--recordings', default=DEFAULT_RECORDINGS, help='JSON list of {host, path, body} recordings')
+    args = parser.parse_args()
+
+    server = create_server(args.port, args.latency_ms, args.jitter_ms, args.error_rate,
+                           args.throttle_rate, args.recordings)
+    # The harness reads the bound port from this line
+    print(f'Stub RapidAPI listening on http://127.0.0.1:{server.server_address[1]}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
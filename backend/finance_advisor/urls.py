@@ -18,10 +18,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from finance_api.views.finance_views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('finance_api.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
 
 # Add static and media URL patterns for development
@@ -1,21 +1,39 @@
 import os
-from typing import Dict, Any, Optional
-import google.generativeai as genai
-from langchain.prompts import PromptTemplate
-from langchain_google_genai import GoogleGenerativeAIChat
-from langchain.chains import LLMChain
-from langchain.agents import initialize_agent, Tool
-from langchain_core.language_models import BaseChatModel
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List, Optional
 import json
+from .services.advice_cache import advice_cache, normalize_question
+from .services.metrics import observe_llm_call
+from .services.retirement_simulation import parse_plan, project_retirement, summarize_projection
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+# google-generativeai and LangChain are imported when the agent system is
+# first used (see get_agent_system), not when this module is imported
 
-# Initialize the Gemini API
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
-genai.configure(api_key=GOOGLE_API_KEY)
+
+# Minimum share of the keyword score the top intent needs to skip the router agent
+INTENT_CONFIDENCE_THRESHOLD = float(os.environ.get("ADVICE_INTENT_THRESHOLD", "0.6"))
+# Minimum keyword score before the classifier trusts any intent
+INTENT_MIN_SCORE = 1.0
+
+# A specialist joins a fan-out when it holds at least this share of the keyword score
+FANOUT_MIN_SHARE = float(os.environ.get("ADVICE_FANOUT_MIN_SHARE", "0.15"))
+# One deadline, in seconds, shared by all the specialist chains of a fan-out
+SPECIALIST_TIMEOUT = float(os.environ.get("ADVICE_SPECIALIST_TIMEOUT", "20"))
+
+# Log the ReAct router agent's reasoning steps to stdout
+ADVICE_AGENT_VERBOSE = os.environ.get("ADVICE_AGENT_VERBOSE", "false").lower() == "true"
+
+# Prefix of the answer returned when the agent system fails
+ADVICE_ERROR_PREFIX = "I apologize, but I encountered an error while generating financial advice"
 
 # Define the specialized agents
-market_analysis_prompt = PromptTemplate(
-    input_variables=["question", "context"],
-    template="""
+MARKET_ANALYSIS_TEMPLATE = """
     You are a financial market analysis expert. Consider the user's question and any provided context.
     Question: {question}
     Context: {context}
@@ -25,11 +43,8 @@ market_analysis_prompt = PromptTemplate(
     2. Economic indicators that might impact the user's financial decisions
     3. Sector-specific insights if applicable
     """
-)
 
-investment_advice_prompt = PromptTemplate(
-    input_variables=["question", "context"],
-    template="""
+INVESTMENT_ADVICE_TEMPLATE = """
     You are a certified financial advisor specializing in investment strategies. Consider the user's question and any provided context.
     Question: {question}
     Context: {context}
@@ -40,11 +55,8 @@ investment_advice_prompt = PromptTemplate(
     3. Investment timeframes
     4. Diversification strategies
     """
-)
 
-tax_planning_prompt = PromptTemplate(
-    input_variables=["question", "context"],
-    template="""
+TAX_PLANNING_TEMPLATE = """
     You are a tax planning specialist. Consider the user's question and any provided context.
     Question: {question}
     Context: {context}
@@ -57,11 +69,8 @@ tax_planning_prompt = PromptTemplate(
     
     Note: Clarify that this is general advice and not legal or accounting advice.
     """
-)
 
-retirement_planning_prompt = PromptTemplate(
-    input_variables=["question", "context"],
-    template="""
+RETIREMENT_PLANNING_TEMPLATE = """
     You are a retirement planning specialist. Consider the user's question and any provided context.
     Question: {question}
     Context: {context}
@@ -71,11 +80,67 @@ retirement_planning_prompt = PromptTemplate(
     2. Retirement income projections
     3. Social security considerations
     4. Retirement account recommendations
+    
+    If the context includes a retirement_projection, base the income projections on its numbers.
+    """
+
+ROUTING_TEMPLATE = """
+    Pick the single best specialist for the user's financial question.
+    Specialists:
+    {tools}
+    
+    Question: {question}
+    
+    Answer with the specialist name only.
     """
+
+SYNTHESIS_TEMPLATE = """
+    You are a lead financial advisor. Several specialists answered parts of the user's question.
+    Question: {question}
+    Context: {context}
+    
+    Specialist analyses:
+    {analyses}
+    
+    Merge them into one coherent answer. Resolve any conflicts between the specialists,
+    avoid repeating the same point, and keep each specialist's key recommendations.
+    """
+
+# Specialist prompt templates and router tool descriptions, by tool name
+SPECIALIST_TEMPLATES = {
+    "MarketAnalysis": MARKET_ANALYSIS_TEMPLATE,
+    "InvestmentAdvice": INVESTMENT_ADVICE_TEMPLATE,
+    "TaxPlanning": TAX_PLANNING_TEMPLATE,
+    "RetirementPlanning": RETIREMENT_PLANNING_TEMPLATE,
+}
+SPECIALIST_DESCRIPTIONS = {
+    "MarketAnalysis": "Use this for questions about market trends, economic indicators, and financial markets.",
+    "InvestmentAdvice": "Use this for questions about investment strategies, asset allocation, and portfolio management.",
+    "TaxPlanning": "Use this for questions about tax optimization, tax implications of financial decisions, and tax strategies.",
+    "RetirementPlanning": "Use this for questions about retirement savings, retirement accounts, and retirement income strategies.",
+}
+DEFAULT_SPECIALIST = "InvestmentAdvice"
+
+RETIREMENT_PROJECTION_DESCRIPTION = (
+    "Use this to simulate whether retirement savings will last. Input is a JSON object with "
+    "current_age, retirement_age and optionally end_age, current_savings, annual_contribution, "
+    "contribution_growth, annual_withdrawal (today's dollars per year), expected_return, volatility "
+    "and inflation (annual fractions). Returns the success probability and balance percentiles."
 )
 
+def project_retirement_tool(inp: str) -> str:
+    """Router agent tool: Monte Carlo projection of a JSON retirement plan, as text"""
+    try:
+        plan = parse_plan(json.loads(inp))
+    except ValueError as e:
+        # json.JSONDecodeError is a ValueError; the agent can retry with a fixed input
+        return f"Invalid retirement plan: {e}"
+    return summarize_projection(project_retirement(plan))
+
 # Initialize Gemini model
-def create_gemini_llm(model_name="gemini-1.5-flash") -> BaseChatModel:
+def create_gemini_llm(model_name="gemini-1.5-flash") -> "BaseChatModel":
+    from langchain_google_genai import GoogleGenerativeAIChat
+    
     return GoogleGenerativeAIChat(
         model=model_name,
         temperature=0.3,
@@ -83,57 +148,320 @@ def create_gemini_llm(model_name="gemini-1.5-flash") -> BaseChatModel:
         convert_system_message_to_human=True
     )
 
-# Create specialized agents
-market_analysis_llm = create_gemini_llm()
-investment_advice_llm = create_gemini_llm()
-tax_planning_llm = create_gemini_llm()
-retirement_planning_llm = create_gemini_llm()
-
-market_analysis_chain = LLMChain(llm=market_analysis_llm, prompt=market_analysis_prompt)
-investment_advice_chain = LLMChain(llm=investment_advice_llm, prompt=investment_advice_prompt)
-tax_planning_chain = LLMChain(llm=tax_planning_llm, prompt=tax_planning_prompt)
-retirement_planning_chain = LLMChain(llm=retirement_planning_llm, prompt=retirement_planning_prompt)
-
-# Define tools for the router agent
-tools = [
-    Tool(
-        name="MarketAnalysis",
-        func=lambda inp: market_analysis_chain.run(json.loads(inp)),
-        description="Use this for questions about market trends, economic indicators, and financial markets.",
-    ),
-    Tool(
-        name="InvestmentAdvice",
-        func=lambda inp: investment_advice_chain.run(json.loads(inp)),
-        description="Use this for questions about investment strategies, asset allocation, and portfolio management.",
-    ),
-    Tool(
-        name="TaxPlanning",
-        func=lambda inp: tax_planning_chain.run(json.loads(inp)),
-        description="Use this for questions about tax optimization, tax implications of financial decisions, and tax strategies.",
-    ),
-    Tool(
-        name="RetirementPlanning",
-        func=lambda inp: retirement_planning_chain.run(json.loads(inp)),
-        description="Use this for questions about retirement savings, retirement accounts, and retirement income strategies.",
-    ),
-]
-
-# Create the router agent
-router_llm = create_gemini_llm()
-router_agent = initialize_agent(
-    tools,
-    router_llm,
-    agent="zero-shot-react-description",
-    verbose=True
+class AgentSystem:
+    """
+    The Gemini clients, specialist chains and router agent behind the advisor.
+    
+    Building it configures google-generativeai and creates every LLM client,
+    so it is done once per process by get_agent_system() rather than at
+    import time.
+    """
+    
+    def __init__(self):
+        import google.generativeai as genai
+        from langchain.agents import initialize_agent, Tool
+        from langchain.chains import LLMChain
+        from langchain.prompts import PromptTemplate
+        
+        # Initialize the Gemini API
+        genai.configure(api_key=GOOGLE_API_KEY)
+        
+        # Create specialized agents
+        self.specialist_chains = {
+            name: LLMChain(
+                llm=create_gemini_llm(),
+                prompt=PromptTemplate(input_variables=["question", "context"], template=template),
+            )
+            for name, template in SPECIALIST_TEMPLATES.items()
+        }
+        
+        # Define tools for the router agent
+        self.tools = [
+            Tool(
+                name=name,
+                func=lambda inp, name=name, chain=chain: run_chain(name, chain, json.loads(inp)),
+                description=SPECIALIST_DESCRIPTIONS[name],
+            )
+            for name, chain in self.specialist_chains.items()
+        ]
+        self.tools.append(Tool(
+            name="RetirementProjection",
+            func=project_retirement_tool,
+            description=RETIREMENT_PROJECTION_DESCRIPTION,
+        ))
+        
+        self.routing_prompt = PromptTemplate(input_variables=["question", "tools"], template=ROUTING_TEMPLATE)
+        
+        # Create the synthesis agent that merges fanned-out specialist answers
+        self.synthesis_prompt = PromptTemplate(
+            input_variables=["question", "context", "analyses"], template=SYNTHESIS_TEMPLATE
+        )
+        self.synthesis_llm = create_gemini_llm()
+        self.synthesis_chain = LLMChain(llm=self.synthesis_llm, prompt=self.synthesis_prompt)
+        
+        # Create the router agent
+        self.router_llm = create_gemini_llm()
+        self.router_agent = initialize_agent(
+            self.tools,
+            self.router_llm,
+            agent="zero-shot-react-description",
+            verbose=ADVICE_AGENT_VERBOSE
+        )
+
+_agent_system: Optional[AgentSystem] = None
+_agent_system_lock = threading.Lock()
+
+def get_agent_system() -> AgentSystem:
+    """
+    Get the process-wide agent system, building it on first use
+    
+    Returns:
+        AgentSystem: The shared agent system
+    """
+    global _agent_system
+    system = _agent_system
+    if system is None:
+        with _agent_system_lock:
+            system = _agent_system
+            if system is None:
+                system = _agent_system = AgentSystem()
+    return system
+
+# Vocabulary of the fast-path intent classifier, per specialist tool
+INTENT_KEYWORDS = {
+    "MarketAnalysis": [
+        "market", "markets", "stock market", "trend", "trends", "economy", "economic", "inflation",
+        "interest rate", "interest rates", "fed", "federal reserve", "recession", "gdp", "sector",
+        "s p 500", "nasdaq", "dow", "earnings", "outlook", "forecast", "bull", "bear", "volatility",
+        "crash", "rally", "indicator", "indicators",
+    ],
+    "InvestmentAdvice": [
+        "invest", "investing", "investment", "investments", "portfolio", "allocation", "asset allocation",
+        "diversify", "diversification", "stock", "stocks", "bond", "bonds", "etf", "etfs", "index fund",
+        "index funds", "mutual fund", "mutual funds", "rebalance", "rebalancing", "dividend", "dividends",
+        "buy", "sell", "risk tolerance", "crypto", "real estate", "shares",
+    ],
+    "TaxPlanning": [
+        "tax", "taxes", "taxed", "taxable", "tax bracket", "bracket", "deduction", "deductions",
+        "deductible", "capital gains", "capital gain", "irs", "write off", "tax loss harvesting",
+        "harvesting", "1099", "w 2", "refund", "filing", "estate tax", "gift tax", "hsa",
+    ],
+    "RetirementPlanning": [
+        "retire", "retirement", "retiring", "401k", "401 k", "403b", "ira", "iras", "roth",
+        "roth ira", "pension", "social security", "annuity", "annuities", "rmd", "nest egg",
+        "withdrawal rate", "early retirement", "fire",
+    ],
+}
+
+def _build_intent_weights() -> Dict[str, Dict[str, float]]:
+    """Weight each keyword by how specific it is to one intent (IDF-style)"""
+    intents_per_term: Dict[str, int] = {}
+    for keywords in INTENT_KEYWORDS.values():
+        for term in {normalize_question(keyword) for keyword in keywords}:
+            intents_per_term[term] = intents_per_term.get(term, 0) + 1
+    return {
+        intent: {
+            normalize_question(keyword): 1.0 / intents_per_term[normalize_question(keyword)]
+            for keyword in keywords
+        }
+        for intent, keywords in INTENT_KEYWORDS.items()
+    }
+
+INTENT_WEIGHTS = _build_intent_weights()
+
+def score_intents(question: str) -> Dict[str, float]:
+    """
+    Score a question against each specialist's keyword vocabulary
+    
+    Args:
+        question: The user's financial question
+    
+    Returns:
+        Dict mapping specialist tool names to keyword scores
+    """
+    words = normalize_question(question).split()
+    # Unigrams, bigrams and trigrams so multi-word keywords match as phrases
+    terms = [" ".join(words[i:i + n]) for n in (1, 2, 3) for i in range(len(words) - n + 1)]
+    return {
+        intent: sum(weights.get(term, 0.0) for term in terms)
+        for intent, weights in INTENT_WEIGHTS.items()
+    }
+
+def classify_intent(question: str) -> Optional[str]:
+    """
+    Pick the specialist for a question locally, without an LLM call
+    
+    Args:
+        question: The user's financial question
+    
+    Returns:
+        The specialist tool name, or None when the classifier is not confident
+    """
+    scores = score_intents(question)
+    intent, top_score = max(scores.items(), key=lambda item: item[1])
+    total = sum(scores.values())
+    if top_score < INTENT_MIN_SCORE or top_score / total < INTENT_CONFIDENCE_THRESHOLD:
+        return None
+    return intent
+
+def relevant_intents(question: str) -> List[str]:
+    """
+    List every specialist with a meaningful share of the question's keyword score
+    
+    Args:
+        question: The user's financial question
+    
+    Returns:
+        Specialist tool names, highest score first
+    """
+    scores = score_intents(question)
+    total = sum(scores.values())
+    if not total:
+        return []
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return [
+        intent for intent, score in ranked
+        if score >= INTENT_MIN_SCORE and score / total >= FANOUT_MIN_SHARE
+    ]
+
+# Shared pool for running specialist chains concurrently
+specialist_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("ADVICE_FANOUT_MAX_WORKERS", "8")),
+    thread_name_prefix="advice-specialist",
 )
 
-def get_financial_advice(question: str, context: Optional[Dict[Any, Any]] = None) -> str:
+def run_chain(label: str, chain, inputs: Any) -> str:
+    """
+    Run a chain or agent and record its latency and estimated token counts
+    
+    Args:
+        label: Chain label for the LLM metrics (a specialist name, "synthesis", ...)
+        chain: An LLMChain or agent executor
+        inputs: Dict of prompt variables, or the raw input string
+    
+    Returns:
+        str: The chain's answer
+    """
+    prompt = getattr(chain, "prompt", None)
+    prompt_text = prompt.format(**inputs) if prompt is not None and isinstance(inputs, dict) else str(inputs)
+    started = time.perf_counter()
+    result = ""
+    try:
+        result = chain.run(inputs)
+        return result
+    finally:
+        observe_llm_call(label, started, prompt_text, str(result))
+
+def route_question(question: str) -> str:
+    """
+    Pick the specialist tool for a question
+    
+    Uses the local intent classifier and only falls back to a single short
+    LLM call when it is not confident.
+    
+    Args:
+        question: The user's financial question
+    
+    Returns:
+        str: Name of the specialist tool (a key of SPECIALIST_TEMPLATES)
+    """
+    intent = classify_intent(question)
+    if intent is not None:
+        return intent
+    
+    system = get_agent_system()
+    tool_descriptions = "\n".join(f"- {name}: {description}" for name, description in SPECIALIST_DESCRIPTIONS.items())
+    prompt = system.routing_prompt.format(question=question, tools=tool_descriptions)
+    started = time.perf_counter()
+    reply = system.router_llm.invoke(prompt)
+    reply_text = getattr(reply, "content", reply)
+    observe_llm_call("router", started, prompt, str(reply_text))
+    for name in SPECIALIST_TEMPLATES:
+        if name.lower() in str(reply_text).lower():
+            return name
+    return DEFAULT_SPECIALIST
+
+def run_specialists(question: str, context: Dict[Any, Any], intents: List[str]) -> Dict[str, str]:
+    """
+    Run several specialist chains concurrently
+    
+    All chains share one SPECIALIST_TIMEOUT deadline, counted from the
+    call rather than from each chain's start, so the wall time is bounded
+    by the deadline rather than the sum. A chain still queued for a
+    specialist_executor worker at the deadline is cancelled. A chain
+    already running cannot be interrupted and keeps its worker until it
+    returns. Chains that fail or miss the deadline are left out of the
+    result.
+    
+    Args:
+        question: The user's financial question
+        context: Context passed to every specialist
+        intents: Specialist tool names to run
+    
+    Returns:
+        Dict mapping specialist tool names to their answers
+    """
+    specialist_chains = get_agent_system().specialist_chains
+    inputs = {"question": question, "context": json.dumps(context)}
+    futures = {
+        specialist_executor.submit(run_chain, intent, specialist_chains[intent], inputs): intent
+        for intent in intents
+    }
+    done, late = wait(futures, timeout=SPECIALIST_TIMEOUT)
+    for future in late:
+        future.cancel()
+    
+    analyses = {}
+    for future in done:
+        if future.exception() is None:
+            analyses[futures[future]] = future.result()
+    return analyses
+
+def format_analyses(analyses: Dict[str, str]) -> str:
+    """Lay out specialist answers for the synthesis prompt"""
+    return "\n\n".join(f"[{intent}]\n{answer}" for intent, answer in analyses.items())
+
+def fan_out_advice(question: str, context: Dict[Any, Any], intents: List[str]) -> str:
+    """
+    Answer a cross-domain question by running its specialists in parallel
+    and merging their answers with a single synthesis call
+    
+    Args:
+        question: The user's financial question
+        context: Context passed to every specialist
+        intents: Specialist tool names to run
+    
+    Returns:
+        str: The merged advice
+    """
+    analyses = run_specialists(question, context, intents)
+    if not analyses:
+        raise TimeoutError("No specialist answered in time")
+    if len(analyses) == 1:
+        return next(iter(analyses.values()))
+    return run_chain("synthesis", get_agent_system().synthesis_chain, {
+        "question": question,
+        "context": json.dumps(context),
+        "analyses": format_analyses(analyses),
+    })
+
+def get_financial_advice(question: str, context: Optional[Dict[Any, Any]] = None, use_cache: bool = True,
+                         raise_errors: bool = False) -> str:
     """
     Process a financial question through the multi-agent system and return advice.
     
+    Answers are served from the advice cache when the same (or, if enabled, a
+    nearly identical) question was already answered with the same context.
+    Questions spanning several domains fan out to those specialists in
+    parallel, questions with an obvious intent go straight to the matching
+    specialist chain, and only ambiguous ones pay for the ReAct router agent.
+    
     Args:
         question: The user's financial question
         context: Optional context like market data, portfolio data, etc.
+        use_cache: Whether to read and populate the advice cache
+        raise_errors: Raise agent failures instead of returning an apology
+            starting with ADVICE_ERROR_PREFIX
     
     Returns:
         str: The AI-generated financial advice
@@ -141,16 +469,103 @@ def get_financial_advice(question: str, context: Optional[Dict[Any, Any]] = None
     if context is None:
         context = {}
     
+    if use_cache:
+        advice_cache.warm_from_history(error_prefix=ADVICE_ERROR_PREFIX)
+        cached = advice_cache.get(question, context)
+        if cached is not None:
+            return cached
+    
     try:
-        # Prepare input for the router agent
-        inp = {
-            "question": question,
-            "context": json.dumps(context)
-        }
-        
-        # Execute the router agent to determine the best specialized agent
-        result = router_agent.run(f"Question: {question}\nContext: {json.dumps(context)}")
-        return result
+        intents = relevant_intents(question)
+        intent = classify_intent(question)
+        if len(intents) > 1:
+            # Cross-domain question: run the specialists concurrently and merge
+            result = fan_out_advice(question, context, intents)
+        elif intent is not None:
+            # Obvious intent: go straight to the specialist chain
+            result = run_chain(
+                intent, get_agent_system().specialist_chains[intent],
+                {"question": question, "context": json.dumps(context)},
+            )
+        else:
+            # Execute the router agent to determine the best specialized agent
+            result = run_chain(
+                "router_agent", get_agent_system().router_agent,
+                f"Question: {question}\nContext: {json.dumps(context)}",
+            )
     
     except Exception as e:
-        return f"I apologize, but I encountered an error while generating financial advice: {str(e)}. Please try a different question or contact support."
\ No newline at end of file
+        if raise_errors:
+            raise
+        return f"{ADVICE_ERROR_PREFIX}: {str(e)}. Please try a different question or contact support."
+    
+    if use_cache:
+        advice_cache.set(question, context, result)
+    return result
+
+def stream_financial_advice(question: str, context: Optional[Dict[Any, Any]] = None, use_cache: bool = True) -> Iterator[str]:
+    """
+    Stream advice for a financial question as the model generates it.
+    
+    Instead of the ReAct loop, the question is routed to one specialist
+    whose tokens are forwarded as they arrive; cross-domain questions run
+    their specialists in parallel first and stream the synthesis (or the
+    only answer that arrived in time). Cached answers are yielded in one
+    piece. Errors propagate to the caller.
+    
+    Args:
+        question: The user's financial question
+        context: Optional context like market data, portfolio data, etc.
+        use_cache: Whether to read and populate the advice cache
+    
+    Yields:
+        str: Consecutive chunks of the answer
+    """
+    if context is None:
+        context = {}
+    
+    if use_cache:
+        advice_cache.warm_from_history(error_prefix=ADVICE_ERROR_PREFIX)
+        cached = advice_cache.get(question, context)
+        if cached is not None:
+            yield cached
+            return
+    
+    system = get_agent_system()
+    intents = relevant_intents(question)
+    analyses = run_specialists(question, context, intents) if len(intents) > 1 else {}
+    if len(intents) > 1 and not analyses:
+        raise TimeoutError("No specialist answered in time")
+    if len(analyses) == 1:
+        # Only one specialist answered in time: its finished answer is the advice, as in fan_out_advice
+        answer = next(iter(analyses.values()))
+        yield answer
+        if use_cache:
+            advice_cache.set(question, context, answer)
+        return
+    if len(analyses) > 1:
+        # Cross-domain question: stream the synthesis of the specialist answers
+        label, llm = "synthesis", system.synthesis_llm
+        prompt = system.synthesis_prompt.format(
+            question=question, context=json.dumps(context), analyses=format_analyses(analyses)
+        )
+    else:
+        # The keyword classifier decides obvious questions; only the rest pay for the router call
+        label = route_question(question)
+        chain = system.specialist_chains[label]
+        llm = chain.llm
+        prompt = chain.prompt.format(question=question, context=json.dumps(context))
+    
+    chunks = []
+    started = time.perf_counter()
+    try:
+        for chunk in llm.stream(prompt):
+            text = getattr(chunk, "content", chunk)
+            if text:
+                chunks.append(text)
+                yield text
+    finally:
+        observe_llm_call(label, started, prompt, "".join(chunks))
+    
+    if use_cache:
+        advice_cache.set(question, context, "".join(chunks))
\ No newline at end of file
@@ -3,4 +3,12 @@ from django.apps import AppConfig
 
 class FinanceApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'finance_api'
\ No newline at end of file
+    name = 'finance_api'
+
+    def ready(self):
+        # Connect the signal handlers that keep cached advice contexts fresh
+        from . import signals  # noqa: F401
+        # Count database queries and their time per request for /metrics
+        from django.db.backends.signals import connection_created
+        from .services.metrics import install_db_wrapper
+        connection_created.connect(install_db_wrapper, dispatch_uid='finance_metrics_db_wrapper')
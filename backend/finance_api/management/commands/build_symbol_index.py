@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...services.symbol_index import SYMBOL_INDEX_PATH, SYMBOL_INDEX_TYPES, build_symbol_index
+
+
+class Command(BaseCommand):
+    help = 'Crawl the market tickers into the local symbol search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--types',
+            default=','.join(SYMBOL_INDEX_TYPES),
+            help='Comma-separated ticker types to crawl (default: FINANCE_SYMBOL_INDEX_TYPES)',
+        )
+        parser.add_argument(
+            '--max-pages',
+            type=int,
+            default=None,
+            help='Stop each type after this many pages',
+        )
+        parser.add_argument(
+            '--output',
+            default=SYMBOL_INDEX_PATH,
+            help='Where to write the index (default: FINANCE_SYMBOL_INDEX_PATH)',
+        )
+
+    def handle(self, *args, **options):
+        types = [ticker_type.strip().upper() for ticker_type in options['types'].split(',') if ticker_type.strip()]
+        started = time.monotonic()
+
+        def progress(ticker_type, page, rows):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{ticker_type} page {page}: {rows} tickers')
+
+        index = build_symbol_index(types, options['max_pages'], progress)
+        index.save(options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {len(index)} symbols in {time.monotonic() - started:.1f}s to {options["output"]}'
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from ...models import TickerSnapshot
+from ...services.symbol_index import SYMBOL_INDEX_TYPES
+from ...services.ticker_snapshots import TICKER_CRAWL_CONCURRENCY, crawl_tickers
+
+
+class Command(BaseCommand):
+    help = 'Crawl every page of the market tickers into a new versioned snapshot per type'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--types',
+            default=','.join(SYMBOL_INDEX_TYPES),
+            help='Comma-separated ticker types to crawl (default: FINANCE_SYMBOL_INDEX_TYPES)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=TICKER_CRAWL_CONCURRENCY,
+            help='Pages of a type fetched at once (default: FINANCE_TICKER_CRAWL_CONCURRENCY or 4)',
+        )
+        parser.add_argument(
+            '--max-pages',
+            type=int,
+            default=None,
+            help='Stop each type after this many pages',
+        )
+
+    def handle(self, *args, **options):
+        types = [ticker_type.strip().upper() for ticker_type in options['types'].split(',') if ticker_type.strip()]
+        for ticker_type in types:
+            snapshot = crawl_tickers(ticker_type, options['concurrency'], options['max_pages'])
+            if snapshot.status == TickerSnapshot.FAILED:
+                self.stderr.write(self.style.ERROR(
+                    f'{ticker_type} v{snapshot.version} failed after {snapshot.pages} pages: {snapshot.error}'
+                ))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f'{ticker_type} v{snapshot.version}: {snapshot.tickers} tickers from {snapshot.pages} pages '
+                f'({snapshot.added} added, {snapshot.changed} changed, {snapshot.removed} removed)'
+            ))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import Stock
+from ...services.circuit_breaker import UpstreamUnavailable
+from ...services.price_history import PRICE_HISTORY_PATH, RESOLUTIONS, get_price_store, ingest_history
+from ...services.rate_limiter import RateLimitExceeded
+
+
+class Command(BaseCommand):
+    help = 'Append the latest OHLCV bars of each symbol to the local price history store'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--symbols',
+            default='',
+            help='Comma-separated symbols (default: every symbol held in a portfolio)',
+        )
+        parser.add_argument(
+            '--resolution',
+            choices=list(RESOLUTIONS),
+            default='1m',
+            help='Bar size to fetch; coarser resolutions are rolled up from it (default: 1m)',
+        )
+        parser.add_argument(
+            '--output',
+            default=PRICE_HISTORY_PATH,
+            help='Store directory (default: FINANCE_PRICE_HISTORY_PATH)',
+        )
+
+    def handle(self, *args, **options):
+        symbols = [symbol.strip().upper() for symbol in options['symbols'].split(',') if symbol.strip()]
+        if not symbols:
+            symbols = sorted({symbol.upper() for symbol in Stock.objects.values_list('symbol', flat=True)})
+        if not symbols:
+            raise CommandError('No symbols given and no portfolio holds any')
+
+        store = get_price_store(options['output'])
+        failed = 0
+        for symbol in symbols:
+            try:
+                written = ingest_history(symbol, options['resolution'], store)
+            except (RateLimitExceeded, UpstreamUnavailable, ValueError) as e:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f'{symbol}: {e}'))
+                continue
+            self.stdout.write(f'{symbol}: {written} new {options["resolution"]} bars')
+        self.stdout.write(self.style.SUCCESS(
+            f'Ingested {len(symbols) - failed} of {len(symbols)} symbols into {options["output"]}'
+        ))
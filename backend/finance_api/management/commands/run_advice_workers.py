@@ -0,0 +1,61 @@
+import multiprocessing
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ...services.advice_jobs import ADVICE_WORKER_POLL_INTERVAL, fail_abandoned_jobs, run_worker
+
+
+class Command(BaseCommand):
+    help = 'Run a pool of worker processes that answer queued advice jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=int(os.environ.get('ADVICE_WORKERS', '4')),
+            help='Number of worker processes (default: ADVICE_WORKERS or 4)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=ADVICE_WORKER_POLL_INTERVAL,
+            help='Seconds an idle worker waits before polling the queue again',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            help='Exit each worker after answering this many jobs',
+        )
+
+    def handle(self, *args, **options):
+        failed = fail_abandoned_jobs()
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Failed {failed} abandoned advice job(s)'))
+
+        # Children must open their own database connections
+        connections.close_all()
+
+        workers = [
+            multiprocessing.Process(
+                target=run_worker,
+                args=(index, options['poll_interval'], options['max_jobs']),
+                name=f'advice-worker-{index}',
+            )
+            for index in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(self.style.SUCCESS(f'Started {len(workers)} advice worker(s)'))
+
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping advice workers...')
+            for worker in workers:
+                worker.terminate()
+            for worker in workers:
+                worker.join()
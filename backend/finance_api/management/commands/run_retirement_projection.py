@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...services.retirement_simulation import (
+    RETIREMENT_DEFAULT_PATHS,
+    RETIREMENT_PARALLEL_MIN_PATHS,
+    RETIREMENT_WORKERS,
+    parse_plan,
+    project_retirement,
+)
+
+
+class Command(BaseCommand):
+    help = 'Run a Monte Carlo retirement projection too large for a web request, over the process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('plan', help='Path of a JSON file holding the plan fields')
+        parser.add_argument(
+            '--paths',
+            type=int,
+            default=RETIREMENT_DEFAULT_PATHS,
+            help=f'Number of simulated paths (default: {RETIREMENT_DEFAULT_PATHS})',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Root seed (default: 0)')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help=f'Processes to use (default: FINANCE_RETIREMENT_WORKERS from {RETIREMENT_PARALLEL_MIN_PATHS} paths up, else 1)',
+        )
+        parser.add_argument('--output', default='', help='Write the projection JSON here instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['plan']) as f:
+                plan = parse_plan(json.load(f))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Invalid plan: {e}')
+
+        workers = options['workers']
+        if workers is None:
+            workers = RETIREMENT_WORKERS if options['paths'] >= RETIREMENT_PARALLEL_MIN_PATHS else 1
+        try:
+            projection = project_retirement(plan, options['paths'], options['seed'], workers, use_cache=False)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        payload = json.dumps(projection, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(payload)
+        else:
+            self.stdout.write(payload)
+        self.stderr.write(self.style.SUCCESS(
+            f"{projection['paths']} paths on {workers} worker(s): {projection['paths_per_second']:,} paths/s"
+        ))
@@ -0,0 +1,43 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .services.metrics import begin_request, finish_request
+
+
+class RequestMetricsMiddleware:
+    """
+    Record latency and database usage of every request, labelled by view.
+
+    Streaming responses are timed until their headers are ready, not until
+    the last event is sent.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token, started = begin_request()
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            finish_request(request, status, token, started)
+
+    async def __acall__(self, request):
+        token, started = begin_request()
+        status = 500
+        try:
+            response = await self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            finish_request(request, status, token, started)
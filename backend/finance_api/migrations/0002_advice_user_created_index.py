@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance_api', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='financialadvice',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='advice_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance_api', '0003_advice_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketTicker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker_type', models.CharField(max_length=20)),
+                ('symbol', models.CharField(max_length=32)),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('last_sale', models.FloatField(blank=True, null=True)),
+                ('net_change', models.FloatField(blank=True, null=True)),
+                ('pct_change', models.FloatField(blank=True, null=True)),
+                ('market_cap', models.FloatField(blank=True, null=True)),
+                ('data', models.JSONField(default=dict)),
+                ('content_hash', models.CharField(max_length=40)),
+                ('first_version', models.PositiveIntegerField()),
+                ('updated_version', models.PositiveIntegerField()),
+                ('last_seen_version', models.PositiveIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ticker_type', 'last_seen_version', 'symbol'], name='market_ticker_seen_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ticker_type', 'symbol'), name='market_ticker_symbol_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TickerSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker_type', models.CharField(max_length=20)),
+                ('version', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('building', 'Building'), ('complete', 'Complete'), ('failed', 'Failed')], default='building', max_length=10)),
+                ('pages', models.PositiveIntegerField(default=0)),
+                ('tickers', models.PositiveIntegerField(default=0)),
+                ('added', models.PositiveIntegerField(default=0)),
+                ('changed', models.PositiveIntegerField(default=0)),
+                ('removed', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('ticker_type', 'version'), name='ticker_snapshot_version_uniq')],
+            },
+        ),
+    ]
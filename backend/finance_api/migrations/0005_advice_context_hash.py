@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance_api', '0004_market_ticker_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='financialadvice',
+            name='context_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+    ]
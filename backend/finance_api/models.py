@@ -26,7 +26,111 @@ class FinancialAdvice(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='advice')
     question = models.TextField()
     answer = models.TextField()
+    # hash_context() of the context the answer was generated with, so the
+    # advice cache can replay it after a restart; blank for older rows
+    context_hash = models.CharField(max_length=40, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='advice_user_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Advice for {self.user.username}: {self.question[:50]}..."
+
+class AdviceJob(models.Model):
+    """A queued advice question, answered by the run_advice_workers pool"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='advice_jobs')
+    question = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    advice = models.OneToOneField(FinancialAdvice, on_delete=models.SET_NULL, null=True, blank=True, related_name='job')
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at', 'id'], name='advice_job_status_idx'),
+            models.Index(fields=['user', 'status'], name='advice_job_user_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Advice job {self.pk} ({self.status}) for {self.user.username}"
+
+
+class TickerSnapshot(models.Model):
+    """One crawl of the market tickers of a type, see the crawl_market_tickers command"""
+    BUILDING = 'building'
+    COMPLETE = 'complete'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (BUILDING, 'Building'),
+        (COMPLETE, 'Complete'),
+        (FAILED, 'Failed'),
+    ]
+    
+    ticker_type = models.CharField(max_length=20)
+    version = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=BUILDING)
+    pages = models.PositiveIntegerField(default=0)
+    tickers = models.PositiveIntegerField(default=0)
+    added = models.PositiveIntegerField(default=0)
+    changed = models.PositiveIntegerField(default=0)
+    removed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ticker_type', 'version'], name='ticker_snapshot_version_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.ticker_type} snapshot v{self.version} ({self.status})"
+
+class MarketTicker(models.Model):
+    """
+    Latest crawled row of a ticker.
+    
+    Rows are only rewritten when their content changes. A ticker belongs to
+    snapshot N of its type when last_seen_version == N.
+    """
+    ticker_type = models.CharField(max_length=20)
+    symbol = models.CharField(max_length=32)
+    name = models.CharField(max_length=255, blank=True)
+    last_sale = models.FloatField(null=True, blank=True)
+    net_change = models.FloatField(null=True, blank=True)
+    pct_change = models.FloatField(null=True, blank=True)
+    market_cap = models.FloatField(null=True, blank=True)
+    # The row as returned by the upstream API
+    data = models.JSONField(default=dict)
+    content_hash = models.CharField(max_length=40)
+    first_version = models.PositiveIntegerField()
+    updated_version = models.PositiveIntegerField()
+    last_seen_version = models.PositiveIntegerField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ticker_type', 'symbol'], name='market_ticker_symbol_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['ticker_type', 'last_seen_version', 'symbol'], name='market_ticker_seen_idx'),
+        ]
+    
     def __str__(self):
-        return f"Advice for {self.user.username}: {self.question[:50]}..."
\ No newline at end of file
+        return f"{self.symbol} ({self.ticker_type})"
@@ -0,0 +1,15 @@
+from rest_framework.pagination import CursorPagination
+
+
+class AdviceHistoryPagination(CursorPagination):
+    """
+    Cursor pagination over a user's advice history, newest first.
+
+    The cursor is positioned on created_at with id as the tie-breaker, which
+    the (user, created_at, id) index on FinancialAdvice serves directly, so
+    every page costs the same regardless of how deep the history goes.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Portfolio, Stock, FinancialAdvice
+from .models import Portfolio, Stock, FinancialAdvice, AdviceJob
+
+# Number of answer characters returned by the advice history summary mode
+ADVICE_SUMMARY_LENGTH = 200
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -47,4 +50,29 @@ class FinancialAdviceSerializer(serializers.ModelSerializer):
     class Meta:
         model = FinancialAdvice
         fields = ['id', 'question', 'answer', 'created_at']
-        read_only_fields = ['answer']
\ No newline at end of file
+        read_only_fields = ['answer']
+
+class FinancialAdviceSummarySerializer(serializers.ModelSerializer):
+    """
+    Compact advice representation for the history sidebar.
+
+    Expects the queryset to be annotated with ``answer_preview`` and
+    ``answer_length`` so the full answer is never loaded.
+    """
+    answer = serializers.CharField(source='answer_preview', read_only=True)
+    truncated = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = FinancialAdvice
+        fields = ['id', 'question', 'answer', 'truncated', 'created_at']
+    
+    def get_truncated(self, obj):
+        return obj.answer_length > ADVICE_SUMMARY_LENGTH
+
+class AdviceJobSerializer(serializers.ModelSerializer):
+    advice = FinancialAdviceSerializer(read_only=True)
+    
+    class Meta:
+        model = AdviceJob
+        fields = ['id', 'question', 'status', 'advice', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
\ No newline at end of file
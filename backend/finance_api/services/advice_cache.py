@@ -0,0 +1,259 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, FrozenSet, Optional, Set, Tuple
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Advice cache configuration
+ADVICE_CACHE_TTL = int(os.environ.get('ADVICE_CACHE_TTL', str(24 * 60 * 60)))
+ADVICE_CACHE_MAX_ENTRIES = int(os.environ.get('ADVICE_CACHE_MAX_ENTRIES', '2000'))
+# Minimum trigram Jaccard similarity for a near-duplicate hit; 0 (the default) disables it
+ADVICE_CACHE_SIMILARITY = float(os.environ.get('ADVICE_CACHE_SIMILARITY', '0'))
+# Number of recent FinancialAdvice rows loaded on first use
+ADVICE_CACHE_WARM_ROWS = int(os.environ.get('ADVICE_CACHE_WARM_ROWS', '500'))
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+_DIGIT = re.compile(r'\d')
+
+# Words that flip or qualify the advice while barely changing the trigrams;
+# contractions are split by normalize_question ("don't" -> "don t")
+QUALIFIER_WORDS = frozenset({
+    'no', 'not', 'never', 'nor', 'without', 'cannot', 'don', 'doesn', 'didn', 'isn', 'aren', 'wasn',
+    'shouldn', 'wouldn', 'won', 'can', 'should', 'good', 'bad', 'better', 'worse', 'best', 'worst',
+    'more', 'less', 'most', 'least', 'high', 'higher', 'low', 'lower', 'buy', 'sell', 'before', 'after',
+    'early', 'late', 'only', 'always',
+})
+
+
+def normalize_question(question: str) -> str:
+    """Lower-case a question and strip punctuation and repeated whitespace"""
+    question = _PUNCTUATION.sub(' ', question.lower())
+    return _WHITESPACE.sub(' ', question).strip()
+
+
+def hash_context(context: Optional[Dict[Any, Any]]) -> str:
+    """Stable digest of an advice context dict"""
+    payload = json.dumps(context or {}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Character trigrams of a normalized question, padded at word boundaries"""
+    padded = f'  {text} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def question_signature(text: str) -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+    """
+    Parts of a normalized question a near-duplicate must share exactly
+
+    Returns:
+        Tuple of (tokens containing digits, in order; qualifier and negation words)
+    """
+    words = text.split()
+    return tuple(word for word in words if _DIGIT.search(word)), frozenset(QUALIFIER_WORDS.intersection(words))
+
+
+class _Entry:
+    __slots__ = ('question', 'context_hash', 'answer', 'expires_at', 'grams', 'signature')
+
+    def __init__(self, question: str, context_hash: str, answer: str, expires_at: float, grams: FrozenSet[str]):
+        self.question = question
+        self.context_hash = context_hash
+        self.answer = answer
+        self.expires_at = expires_at
+        self.grams = grams
+        self.signature = question_signature(question)
+
+
+class AdviceCache:
+    """
+    Answer cache for the multi-agent advisor.
+
+    Answers are keyed on the normalized question plus a hash of the context.
+    When ``similarity`` is set, a miss falls back to the most similar cached
+    question with the same context, compared by character-trigram Jaccard
+    similarity. A near-duplicate must also have the same numbers and the
+    same negation/qualifier words ("age 25" never matches "age 55").
+    Candidates come from an inverted trigram index, so only entries sharing
+    trigrams with the question are scored. Entries expire after ``ttl``
+    seconds and the least recently used ones are evicted beyond
+    ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        ttl: int = ADVICE_CACHE_TTL,
+        max_entries: int = ADVICE_CACHE_MAX_ENTRIES,
+        similarity: float = ADVICE_CACHE_SIMILARITY,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        # (context hash, trigram) -> keys of the entries containing it
+        self._index: Dict[Tuple[str, str], Set[str]] = {}
+        self._lock = threading.Lock()
+        self._warmed = False
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(question: str, context_hash: str) -> str:
+        return hashlib.sha1(f'{context_hash}:{question}'.encode('utf-8')).hexdigest()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        for gram in entry.grams:
+            keys = self._index.get((entry.context_hash, gram))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[(entry.context_hash, gram)]
+
+    def _find_similar(self, normalized: str, context_hash: str, now: float) -> Optional[str]:
+        grams = trigrams(normalized)
+        signature = question_signature(normalized)
+        overlap: Dict[str, int] = {}
+        for gram in grams:
+            for key in self._index.get((context_hash, gram), ()):
+                overlap[key] = overlap.get(key, 0) + 1
+
+        best_key, best_score = None, self.similarity
+        for key, shared in overlap.items():
+            entry = self._entries[key]
+            if entry.expires_at <= now or entry.signature != signature:
+                continue
+            score = shared / (len(grams) + len(entry.grams) - shared)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def get(self, question: str, context: Optional[Dict[Any, Any]] = None) -> Optional[str]:
+        """
+        Look up a cached answer for a question and context
+
+        Args:
+            question: The user's financial question
+            context: The context the answer was generated with
+
+        Returns:
+            The cached answer, or None on a miss
+        """
+        normalized = normalize_question(question)
+        context_hash = hash_context(context)
+        key = self.make_key(normalized, context_hash)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.answer
+
+            if self.similarity > 0:
+                similar_key = self._find_similar(normalized, context_hash, now)
+                if similar_key is not None:
+                    self._entries.move_to_end(similar_key)
+                    self.near_hits += 1
+                    return self._entries[similar_key].answer
+
+            self.misses += 1
+            return None
+
+    def set(self, question: str, context: Optional[Dict[Any, Any]], answer: str, ttl: Optional[int] = None) -> None:
+        """Cache an answer for a question and context"""
+        self.set_hashed(question, hash_context(context), answer, ttl)
+
+    def set_hashed(self, question: str, context_hash: str, answer: str, ttl: Optional[int] = None) -> None:
+        """Cache an answer for a question and a context already reduced by hash_context()"""
+        normalized = normalize_question(question)
+        key = self.make_key(normalized, context_hash)
+        grams = trigrams(normalized)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(normalized, context_hash, answer, expires_at, grams)
+            for gram in grams:
+                self._index.setdefault((context_hash, gram), set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def warm_from_history(self, error_prefix: Optional[str] = None, limit: int = ADVICE_CACHE_WARM_ROWS) -> int:
+        """
+        Seed the cache from the most recent FinancialAdvice rows, once per process
+
+        Rows are keyed on their stored context_hash, so an answer is only
+        replayed for a question asked with exactly the same context.
+
+        Args:
+            error_prefix: Answers starting with this are stored errors and skipped
+            limit: Maximum number of rows to load
+
+        Returns:
+            Number of answers loaded
+        """
+        with self._lock:
+            if self._warmed:
+                return 0
+            self._warmed = True
+
+        from ..models import FinancialAdvice
+
+        try:
+            rows = FinancialAdvice.objects.exclude(context_hash='').only(
+                'question', 'answer', 'context_hash', 'created_at'
+            )
+            rows = rows.filter(created_at__gt=timezone.now() - timedelta(seconds=self.ttl))
+            if error_prefix:
+                rows = rows.exclude(answer__startswith=error_prefix)
+            rows = rows.order_by('-created_at')[:limit]
+            loaded = 0
+            # Oldest first, so the newest rows end up most recently used
+            for advice in reversed(list(rows)):
+                remaining = advice.created_at.timestamp() + self.ttl - time.time()
+                if remaining <= 0:
+                    continue
+                self.set_hashed(advice.question, advice.context_hash, advice.answer, ttl=int(remaining))
+                loaded += 1
+            return loaded
+        except Exception as e:
+            logger.warning(f"Could not warm the advice cache from history: {e}")
+            return 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits + self.near_hits) / lookups if lookups else 0.0,
+            }
+
+
+# Process-wide cache used by the advisor
+advice_cache = AdviceCache()
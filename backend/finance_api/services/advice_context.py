@@ -0,0 +1,282 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db import connection, transaction
+
+from ..models import Stock
+from .finance_data_service import FinanceDataService, get_batch_executor
+from .portfolio_valuation import extract_quote_price, fetch_quotes, value_holdings
+from .response_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Advice context configuration
+ADVICE_CONTEXT_TTL = int(os.environ.get('ADVICE_CONTEXT_TTL', '300'))
+ADVICE_CONTEXT_MAX_ENTRIES = int(os.environ.get('ADVICE_CONTEXT_MAX_ENTRIES', '1000'))
+# Size limit of the serialized context, in approximate LLM tokens
+ADVICE_CONTEXT_MAX_TOKENS = int(os.environ.get('ADVICE_CONTEXT_MAX_TOKENS', '800'))
+# Rough characters-per-token ratio used to turn the token budget into a length
+CHARS_PER_TOKEN = 4
+# Seconds without further holding changes before a context is rebuilt
+ADVICE_CONTEXT_REBUILD_DELAY = float(os.environ.get('ADVICE_CONTEXT_REBUILD_DELAY', '5'))
+
+# Keys of company data responses that may hold the sector
+SECTOR_FIELDS = ('sector', 'company_sector')
+UNKNOWN_SECTOR = 'Unknown'
+
+# user id -> (built_at, context), per process
+_contexts = LRUCache(ADVICE_CONTEXT_MAX_ENTRIES)
+
+# Background rebuilds after holdings change; kept off the batch pool because
+# building a context submits quote and sector fetches to it
+_precompute_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='advice-context')
+# user id -> timer of the pending rebuild
+_rebuild_timers: Dict[int, threading.Timer] = {}
+_pending_lock = threading.Lock()
+
+
+def extract_sector(result: Dict[str, Any]) -> Optional[str]:
+    """Pull the sector out of a get_company_data() response"""
+    data = result.get('data') if isinstance(result, dict) else None
+    if not isinstance(data, dict):
+        return None
+    for field in SECTOR_FIELDS:
+        if data.get(field):
+            return str(data[field])
+    return None
+
+
+def _sector_of(symbol: str, future) -> Optional[str]:
+    try:
+        return extract_sector(future.result())
+    except Exception as e:
+        logger.warning(f"Could not fetch company data for {symbol}: {e}")
+        return None
+
+
+def _weights(values: Dict[str, float], total: float) -> Dict[str, float]:
+    """Turn market values into rounded weights, largest first"""
+    if not total:
+        return {}
+    ranked = sorted(values.items(), key=lambda item: item[1], reverse=True)
+    return {key: round(value / total, 4) for key, value in ranked}
+
+
+def summarize_holdings(rows: List[Tuple], prices: Dict[str, Optional[float]], sectors: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    """
+    Condense a user's holdings into allocation, sector weights and P&L
+
+    Args:
+        rows: (stock id, symbol, name, quantity, purchase price, portfolio name) tuples
+        prices: Current price per upper-cased symbol (None if unavailable)
+        sectors: Sector per upper-cased symbol (None if unavailable)
+
+    Returns:
+        Dict with 'totals', 'holdings', 'sector_weights', 'portfolios' and 'unpriced_symbols'
+    """
+    valuation = value_holdings([row[:5] for row in rows], prices)
+    total_value = valuation['totals']['market_value']
+
+    # The same symbol may be held in several portfolios
+    by_symbol: Dict[str, Dict[str, Any]] = {}
+    sector_values: Dict[str, float] = {}
+    portfolio_values: Dict[str, float] = {}
+    for row, position in zip(rows, valuation['positions']):
+        symbol = position['symbol']
+        market_value = position['market_value'] or 0.0
+        holding = by_symbol.setdefault(symbol, {
+            'symbol': symbol,
+            'name': position['name'],
+            'sector': sectors.get(symbol) or UNKNOWN_SECTOR,
+            'quantity': 0.0,
+            'market_value': 0.0,
+            'cost_basis': 0.0,
+        })
+        holding['quantity'] += position['quantity']
+        holding['market_value'] += market_value
+        holding['cost_basis'] += position['cost_basis']
+        sector_values[holding['sector']] = sector_values.get(holding['sector'], 0.0) + market_value
+        portfolio_values[row[5]] = portfolio_values.get(row[5], 0.0) + market_value
+
+    holdings = []
+    for holding in sorted(by_symbol.values(), key=lambda item: item['market_value'], reverse=True):
+        priced = holding['symbol'] not in valuation['unpriced_symbols']
+        holdings.append({
+            'symbol': holding['symbol'],
+            'name': holding['name'],
+            'sector': holding['sector'],
+            'quantity': round(holding['quantity'], 4),
+            'weight': round(holding['market_value'] / total_value, 4) if priced and total_value else None,
+            'market_value': round(holding['market_value'], 2) if priced else None,
+            'pnl_pct': (
+                round((holding['market_value'] / holding['cost_basis'] - 1) * 100, 2)
+                if priced and holding['cost_basis'] else None
+            ),
+        })
+
+    return {
+        'totals': valuation['totals'],
+        'holdings': holdings,
+        'sector_weights': _weights(sector_values, total_value),
+        'portfolios': _weights(portfolio_values, total_value),
+        'unpriced_symbols': valuation['unpriced_symbols'],
+    }
+
+
+def fit_to_budget(context: Dict[str, Any], max_chars: int) -> Dict[str, Any]:
+    """
+    Drop the smallest holdings until the serialized context fits the budget
+
+    Holdings are ordered by market value, so the positions that matter
+    most to the advice are kept. The number dropped is recorded under
+    'omitted_holdings'.
+
+    Args:
+        context: Context built by build_advice_context()
+        max_chars: Maximum length of the compact JSON serialization
+
+    Returns:
+        The context, trimmed in place
+    """
+    portfolio = context.get('portfolio')
+    if portfolio is None or _serialized_length(context) <= max_chars:
+        return context
+
+    holdings = portfolio['holdings']
+    # Largest number of holdings that still fits, found by binary search
+    low, high = 0, len(holdings)
+    while low < high:
+        keep = (low + high + 1) // 2
+        portfolio['holdings'] = holdings[:keep]
+        portfolio['omitted_holdings'] = len(holdings) - keep
+        if _serialized_length(context) <= max_chars:
+            low = keep
+        else:
+            high = keep - 1
+
+    portfolio['holdings'] = holdings[:low]
+    portfolio['omitted_holdings'] = len(holdings) - low
+    return context
+
+
+def _serialized_length(context: Dict[str, Any]) -> int:
+    return len(json.dumps(context, separators=(',', ':')))
+
+
+def build_advice_context(user, language: str = 'en') -> Dict[str, Any]:
+    """
+    Assemble the portfolio context the advisor agents answer with
+
+    Holdings across all of the user's portfolios are read in one query, and
+    their quotes and sectors are fetched concurrently through the cached
+    FinanceDataService, quotes in batches of at most BATCH_MAX_SYMBOLS.
+
+    Args:
+        user: The user asking for advice
+        language: Language code for the market data requests
+
+    Returns:
+        Dict with the username and, if the user holds any stocks, a 'portfolio' summary
+    """
+    context: Dict[str, Any] = {'user': user.username}
+
+    rows = list(
+        Stock.objects.filter(portfolio__user_id=user.pk)
+        .order_by('id')
+        .values_list('id', 'symbol', 'name', 'quantity', 'purchase_price', 'portfolio__name')
+    )
+    if not rows:
+        return context
+
+    symbols = list(dict.fromkeys(row[1].strip().upper() for row in rows))
+    # Company data is cached for hours, so sectors rarely reach the upstream API
+    executor = get_batch_executor()
+    sector_futures = {
+        symbol: executor.submit(FinanceDataService.get_company_data, symbol, language)
+        for symbol in symbols
+    }
+    quotes = fetch_quotes(symbols, language)
+    prices = {symbol: extract_quote_price(result) for symbol, result in quotes.items()}
+    sectors = {symbol: _sector_of(symbol, future) for symbol, future in sector_futures.items()}
+
+    context['portfolio'] = summarize_holdings(rows, prices, sectors)
+    return fit_to_budget(context, ADVICE_CONTEXT_MAX_TOKENS * CHARS_PER_TOKEN)
+
+
+def get_advice_context(user) -> Dict[str, Any]:
+    """
+    Get the user's advice context, building it only if it is not cached
+
+    Args:
+        user: The user asking for advice
+
+    Returns:
+        The context dict
+    """
+    found, entry, _ = _contexts.get(user.pk)
+    if found:
+        return entry[1]
+    return _store(user)
+
+
+def cached_advice_context(user_id: int) -> Optional[Tuple[float, Dict[str, Any]]]:
+    """Return (built_at, context) for a user if a context is cached, without building one"""
+    found, entry, _ = _contexts.get(user_id)
+    return entry if found else None
+
+
+def invalidate_advice_context(user_id: int) -> None:
+    """
+    Drop a user's cached context after their holdings changed
+
+    The context is rebuilt in the background once the current transaction
+    commits and ADVICE_CONTEXT_REBUILD_DELAY seconds pass without another
+    change, so a burst of edits costs one rebuild and the user's next
+    question still finds it ready.
+    """
+    _contexts.delete(user_id)
+    transaction.on_commit(lambda: _schedule_precompute(user_id))
+
+
+def _store(user) -> Dict[str, Any]:
+    built_at = time.time()
+    context = build_advice_context(user)
+    _contexts.set(user.pk, (built_at, context), built_at + ADVICE_CONTEXT_TTL)
+    return context
+
+
+def _schedule_precompute(user_id: int) -> None:
+    with _pending_lock:
+        previous = _rebuild_timers.get(user_id)
+        if previous is not None:
+            previous.cancel()
+        timer = threading.Timer(ADVICE_CONTEXT_REBUILD_DELAY, _start_precompute, (user_id,))
+        timer.daemon = True
+        _rebuild_timers[user_id] = timer
+        timer.start()
+
+
+def _start_precompute(user_id: int) -> None:
+    with _pending_lock:
+        # A later change restarted the delay
+        if _rebuild_timers.get(user_id) is not threading.current_thread():
+            return
+        del _rebuild_timers[user_id]
+    _precompute_executor.submit(_precompute, user_id)
+
+
+def _precompute(user_id: int) -> None:
+    from django.contrib.auth.models import User
+
+    try:
+        user = User.objects.only('id', 'username').get(pk=user_id)
+        _store(user)
+    except Exception as e:
+        logger.warning(f"Could not precompute the advice context for user {user_id}: {e}")
+    finally:
+        connection.close()
@@ -0,0 +1,181 @@
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+from typing import Optional
+
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Advice job queue configuration
+# Jobs a single user may have running at once
+ADVICE_JOBS_PER_USER = int(os.environ.get('ADVICE_JOBS_PER_USER', '2'))
+# Jobs running at once across every worker process
+ADVICE_JOBS_GLOBAL = int(os.environ.get('ADVICE_JOBS_GLOBAL', '8'))
+# Queued plus running jobs a user may have before enqueueing is refused
+ADVICE_JOBS_MAX_PENDING_PER_USER = int(os.environ.get('ADVICE_JOBS_MAX_PENDING_PER_USER', '10'))
+# Running jobs older than this are considered abandoned by a dead worker
+ADVICE_JOB_TIMEOUT = int(os.environ.get('ADVICE_JOB_TIMEOUT', '300'))
+# Seconds a worker sleeps when no job can be claimed
+ADVICE_WORKER_POLL_INTERVAL = float(os.environ.get('ADVICE_WORKER_POLL_INTERVAL', '1.0'))
+
+# Queued jobs inspected per claim attempt
+CLAIM_BATCH = 20
+
+
+class QueueFullError(Exception):
+    """Raised when a user already has too many pending advice jobs"""
+
+
+def enqueue_job(user, question: str):
+    """
+    Queue an advice question for the worker pool
+
+    Args:
+        user: The user asking
+        question: The user's financial question
+
+    Returns:
+        The created AdviceJob
+
+    Raises:
+        QueueFullError: If the user has ADVICE_JOBS_MAX_PENDING_PER_USER pending jobs
+    """
+    from ..models import AdviceJob
+
+    pending = AdviceJob.objects.filter(
+        user=user, status__in=[AdviceJob.QUEUED, AdviceJob.RUNNING]
+    ).count()
+    if pending >= ADVICE_JOBS_MAX_PENDING_PER_USER:
+        raise QueueFullError(
+            f'At most {ADVICE_JOBS_MAX_PENDING_PER_USER} advice requests may be pending at once'
+        )
+    return AdviceJob.objects.create(user=user, question=question)
+
+
+def claim_next_job(worker: str):
+    """
+    Claim the oldest queued job whose owner is below the per-user limit
+
+    The claim is a conditional UPDATE on status='queued', so exactly one
+    worker wins each job even when several poll at once. The per-user and
+    global limits are checked just before claiming; concurrent workers can
+    briefly overshoot them by at most one job each.
+
+    Args:
+        worker: Identifier recorded on the claimed job
+
+    Returns:
+        The claimed AdviceJob, or None if nothing can be claimed now
+    """
+    from ..models import AdviceJob
+
+    running = AdviceJob.objects.filter(status=AdviceJob.RUNNING)
+    if running.count() >= ADVICE_JOBS_GLOBAL:
+        return None
+
+    busy_users = running.values('user_id').annotate(jobs=Count('id')).filter(
+        jobs__gte=ADVICE_JOBS_PER_USER
+    ).values_list('user_id', flat=True)
+    candidates = AdviceJob.objects.filter(status=AdviceJob.QUEUED).exclude(
+        user_id__in=list(busy_users)
+    ).order_by('created_at', 'id').values_list('id', flat=True)[:CLAIM_BATCH]
+
+    for job_id in candidates:
+        claimed = AdviceJob.objects.filter(pk=job_id, status=AdviceJob.QUEUED).update(
+            status=AdviceJob.RUNNING, worker=worker, started_at=timezone.now()
+        )
+        if claimed:
+            return AdviceJob.objects.select_related('user').get(pk=job_id)
+    return None
+
+
+def run_job(job) -> None:
+    """
+    Answer a claimed job and record the result
+
+    The result is written with a conditional UPDATE on status='running',
+    so a job that fail_abandoned_jobs() already failed keeps that outcome
+    and its answer is not saved.
+
+    Args:
+        job: AdviceJob in the running state
+    """
+    from ..agents import get_financial_advice
+    from ..models import AdviceJob, FinancialAdvice
+    from .advice_cache import hash_context
+    from .advice_context import get_advice_context
+
+    running = AdviceJob.objects.filter(pk=job.pk, status=AdviceJob.RUNNING)
+    try:
+        context = get_advice_context(job.user)
+        # Failures must fail the job rather than be saved as the answer
+        answer = get_financial_advice(job.question, context, raise_errors=True)
+    except Exception as e:
+        logger.error(f"Advice job {job.pk} failed: {e}")
+        running.update(status=AdviceJob.FAILED, error=str(e), finished_at=timezone.now())
+        return
+
+    with transaction.atomic():
+        advice = FinancialAdvice.objects.create(
+            user=job.user, question=job.question, answer=answer, context_hash=hash_context(context)
+        )
+        if not running.update(advice=advice, status=AdviceJob.SUCCEEDED, finished_at=timezone.now()):
+            logger.warning(f"Advice job {job.pk} was failed while it ran; dropping its answer")
+            transaction.set_rollback(True)
+
+
+def fail_abandoned_jobs() -> int:
+    """
+    Fail running jobs whose worker died before finishing them
+
+    Returns:
+        Number of jobs failed
+    """
+    from ..models import AdviceJob
+
+    cutoff = timezone.now() - timedelta(seconds=ADVICE_JOB_TIMEOUT)
+    return AdviceJob.objects.filter(status=AdviceJob.RUNNING, started_at__lt=cutoff).update(
+        status=AdviceJob.FAILED,
+        error='The advice request timed out',
+        finished_at=timezone.now(),
+    )
+
+
+def worker_name(index: int) -> str:
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def run_worker(index: int, poll_interval: float = ADVICE_WORKER_POLL_INTERVAL, max_jobs: Optional[int] = None) -> None:
+    """
+    Claim and answer jobs until interrupted
+
+    Meant to run in its own process, started by the run_advice_workers
+    command.
+
+    Args:
+        index: Position of this worker in the pool
+        poll_interval: Seconds to sleep when no job can be claimed
+        max_jobs: Stop after answering this many jobs (None runs forever)
+    """
+    import django
+
+    django.setup()
+    name = worker_name(index)
+    done = 0
+    try:
+        while max_jobs is None or done < max_jobs:
+            close_old_connections()
+            job = claim_next_job(name)
+            if job is None:
+                fail_abandoned_jobs()
+                time.sleep(poll_interval)
+                continue
+            run_job(job)
+            done += 1
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,324 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional, List, Tuple
+
+from asgiref.sync import sync_to_async
+
+from .finance_data_service import (
+    FinanceDataService,
+    RAPIDAPI_HOST_FINANCE,
+    RAPIDAPI_HOST_YAHOO,
+    CACHE_TTLS,
+    DEFAULT_CACHE_TTL,
+    BATCH_MAX_WORKERS,
+    DEFAULT_PRIORITY,
+    METHOD_PRIORITIES,
+    RATE_LIMIT_MAX_WAIT,
+    circuit_breakers,
+    decode_json,
+    is_cacheable,
+    is_upstream_failure,
+    mark_stale,
+    rate_limiter,
+    stale_window,
+    upstream_url,
+)
+from .circuit_breaker import UpstreamUnavailable
+from .http_session import HTTP_MAX_RETRIES, HTTP_RETRY_STATUS_CODES, get_async_client, retry_delay
+from .metrics import upstream_latency, upstream_outcome
+from .rate_limiter import RateLimitExceeded
+from .response_cache import response_cache
+from .single_flight import AsyncSingleFlight
+from .symbol_index import local_search
+
+logger = logging.getLogger(__name__)
+
+# Coalesces concurrent cache misses for the same request on each event loop
+async_upstream_calls = AsyncSingleFlight()
+
+# Background stale-while-revalidate refreshes, by (event loop id, cache key)
+_refresh_tasks: Dict[Tuple[int, str], asyncio.Task] = {}
+
+
+class AsyncFinanceDataService:
+    """
+    Non-blocking counterpart of FinanceDataService for async views.
+
+    Requests go through a pooled httpx.AsyncClient per upstream host and share
+    the response cache (and its TTLs) with the sync service, so both variants
+    can serve each other's cached responses.
+    """
+
+    get_headers = staticmethod(FinanceDataService.get_headers)
+
+    @classmethod
+    async def _get(cls, method: str, host: str, url: str, params: Optional[Dict[str, str]] = None,
+                   max_age: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Serve a GET request from the response cache or the upstream API
+
+        Follows the same caching, stale-while-revalidate and circuit breaker
+        rules as FinanceDataService._get.
+
+        Args:
+            method: Name of the calling service method (cache namespace)
+            host: RapidAPI host the request is addressed to
+            url: Full endpoint URL
+            params: Query string parameters
+            max_age: Refetch cached responses older than this many seconds,
+                even within their TTL (e.g. pollers that must see each change)
+
+        Returns:
+            Dict containing the decoded JSON response
+        """
+        key = response_cache.make_key(method, url, params)
+        found, data, fresh_until = await response_cache.aget(method, key)
+        now = time.time()
+        if found and fresh_until > now:
+            # The response was fetched one TTL before it expires
+            fetched_at = fresh_until - CACHE_TTLS.get(method, DEFAULT_CACHE_TTL)
+            if max_age is None or now - fetched_at <= max_age:
+                return data
+        elif found and now - fresh_until <= stale_window(method):
+            cls._revalidate(method, host, url, params, key)
+            return mark_stale(data, fresh_until, 'revalidating')
+
+        try:
+            return await async_upstream_calls.do(key, lambda: cls._refresh(method, host, url, params, key))
+        except (RateLimitExceeded, UpstreamUnavailable):
+            if found and fresh_until > time.time():
+                # Only the max_age refetch failed; the response is still within its TTL
+                return data
+            if found:
+                return mark_stale(data, fresh_until, 'upstream_unavailable')
+            raise
+
+    @classmethod
+    async def _refresh(cls, method: str, host: str, url: str, params: Optional[Dict[str, str]], key: str) -> Any:
+        """Async variant of FinanceDataService._refresh"""
+        breaker = circuit_breakers.get(host, method)
+        if not breaker.allow():
+            raise UpstreamUnavailable(
+                f'{host} is unavailable ({method})', host, method, retry_after=breaker.retry_after()
+            )
+
+        try:
+            status_code, data = await cls._fetch(method, host, url, params)
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            logger.error(f"Upstream request to {host} ({method}) failed: {e}")
+            raise UpstreamUnavailable(f'{host} is unavailable ({method})', host, method) from e
+
+        if is_upstream_failure(status_code):
+            breaker.record_failure()
+            raise UpstreamUnavailable(
+                f'{host} answered {status_code} ({method})', host, method, retry_after=breaker.retry_after() or None
+            )
+
+        breaker.record_success()
+        if is_cacheable(status_code, data):
+            await response_cache.aset(key, data, CACHE_TTLS.get(method, DEFAULT_CACHE_TTL))
+        return data
+
+    @classmethod
+    def _revalidate(cls, method: str, host: str, url: str, params: Optional[Dict[str, str]], key: str) -> None:
+        """Refresh a stale response in a background task, once per key at a time"""
+        task_key = (id(asyncio.get_running_loop()), key)
+        if task_key in _refresh_tasks:
+            return
+
+        async def refresh():
+            try:
+                await async_upstream_calls.do(key, lambda: cls._refresh(method, host, url, params, key))
+            except Exception as e:
+                logger.warning(f"Background refresh of {method} failed: {e}")
+            finally:
+                _refresh_tasks.pop(task_key, None)
+
+        _refresh_tasks[task_key] = asyncio.get_running_loop().create_task(refresh())
+
+    @classmethod
+    async def _fetch(cls, method: str, host: str, url: str, params: Optional[Dict[str, str]] = None) -> Tuple[int, Any]:
+        """
+        Send a GET request through the pooled async client, retrying 429/5xx with backoff
+
+        Every attempt is admitted by the shared rate limiter first and every
+        failed attempt counts against the circuit breaker, as in
+        FinanceDataService._fetch.
+
+        Returns:
+            Tuple of (HTTP status code, decoded JSON body or an error dict
+            if the body is not JSON)
+        """
+        client = get_async_client(host)
+        priority = METHOD_PRIORITIES.get(method, DEFAULT_PRIORITY)
+        breaker = circuit_breakers.get(host, method)
+        attempt = 0
+        while True:
+            await rate_limiter.aacquire(host, method, priority, RATE_LIMIT_MAX_WAIT)
+            started = time.perf_counter()
+            status = None
+            try:
+                response = await client.get(upstream_url(url), headers=cls.get_headers(host), params=params)
+                status = response.status_code
+            finally:
+                upstream_latency.observe(time.perf_counter() - started, method, host, upstream_outcome(status))
+            # The attempt that would open the circuit is returned, and _refresh records it
+            retryable = (
+                response.status_code in HTTP_RETRY_STATUS_CODES and attempt < HTTP_MAX_RETRIES and not breaker.would_open()
+            )
+            delay = retry_delay(response, attempt) if retryable else None
+            if delay is None:
+                return response.status_code, decode_json(response)
+            # A retried attempt never reaches _refresh, so its failure is recorded here
+            breaker.record_failure()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @classmethod
+    async def get_company_cash_flow(cls, symbol: str, period: str = 'QUARTERLY', language: str = 'en') -> Dict[str, Any]:
+        """Async variant of FinanceDataService.get_company_cash_flow"""
+        url = "https://real-time-finance-data.p.rapidapi.com/company-cash-flow"
+
+        querystring = {
+            "symbol": symbol,
+            "period": period,
+            "language": language
+        }
+
+        return await cls._get('get_company_cash_flow', RAPIDAPI_HOST_FINANCE, url, querystring)
+
+    @classmethod
+    async def get_company_data(cls, symbol: str, language: str = 'en') -> Dict[str, Any]:
+        """Async variant of FinanceDataService.get_company_data"""
+        url = "https://real-time-finance-data.p.rapidapi.com/company-data"
+
+        querystring = {
+            "symbol": symbol,
+            "language": language
+        }
+
+        return await cls._get('get_company_data', RAPIDAPI_HOST_FINANCE, url, querystring)
+
+    @classmethod
+    async def get_stock_price(cls, symbol: str, language: str = 'en') -> Dict[str, Any]:
+        """Async variant of FinanceDataService.get_stock_price"""
+        url = "https://real-time-finance-data.p.rapidapi.com/stock-price"
+
+        querystring = {
+            "symbol": symbol,
+            "language": language
+        }
+
+        return await cls._get('get_stock_price', RAPIDAPI_HOST_FINANCE, url, querystring)
+
+    @classmethod
+    async def get_market_news(cls, symbols: Optional[str] = None, language: str = 'en') -> Dict[str, Any]:
+        """Async variant of FinanceDataService.get_market_news"""
+        url = "https://real-time-finance-data.p.rapidapi.com/market-news"
+
+        querystring = {"language": language}
+        if symbols:
+            querystring["symbols"] = symbols
+
+        return await cls._get('get_market_news', RAPIDAPI_HOST_FINANCE, url, querystring)
+
+    @classmethod
+    async def get_stock_quote(cls, symbol: str, language: str = 'en', max_age: Optional[float] = None) -> Dict[str, Any]:
+        """Async variant of FinanceDataService.get_stock_quote; see _get for ``max_age``"""
+        url = "https://real-time-finance-data.p.rapidapi.com/stock-quote"
+
+        querystring = {
+            "symbol": symbol,
+            "language": language
+        }
+
+        return await cls._get('get_stock_quote', RAPIDAPI_HOST_FINANCE, url, querystring, max_age)
+
+    @classmethod
+    async def get_stock_quotes(cls, symbols: List[str], language: str = 'en') -> Dict[str, Dict[str, Any]]:
+        """
+        Async variant of FinanceDataService.get_stock_quotes
+
+        At most BATCH_MAX_WORKERS quotes of one batch are in flight at a time.
+        """
+        unique_symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol.strip()))
+        semaphore = asyncio.Semaphore(BATCH_MAX_WORKERS)
+
+        async def fetch(symbol):
+            async with semaphore:
+                return await cls.get_stock_quote(symbol, language)
+
+        quotes = await asyncio.gather(*(fetch(symbol) for symbol in unique_symbols), return_exceptions=True)
+
+        results = {}
+        for symbol, quote in zip(unique_symbols, quotes):
+            if isinstance(quote, Exception):
+                results[symbol] = {'error': str(quote)}
+            else:
+                results[symbol] = {'data': quote}
+        return results
+
+    @classmethod
+    async def search_symbols(cls, query: str, language: str = 'en') -> Dict[str, Any]:
+        """Async variant of FinanceDataService.search_symbols"""
+        # Loading or reloading the index reads and decompresses a file
+        local = await sync_to_async(local_search, thread_sensitive=False)(query)
+        if local is not None:
+            return local
+
+        url = "https://real-time-finance-data.p.rapidapi.com/search"
+
+        querystring = {
+            "query": query,
+            "language": language
+        }
+
+        return await cls._get('search_symbols', RAPIDAPI_HOST_FINANCE, url, querystring)
+
+    @classmethod
+    async def get_market_tickers(cls, page: str = "1", type: str = "STOCKS") -> Dict[str, Any]:
+        """Async variant of FinanceDataService.get_market_tickers"""
+        url = "https://yahoo-finance15.p.rapidapi.com/api/v2/markets/tickers"
+
+        querystring = {
+            "page": page,
+            "type": type
+        }
+
+        return await cls._get('get_market_tickers', RAPIDAPI_HOST_YAHOO, url, querystring)
+
+    @classmethod
+    async def get_ticker_details(cls, ticker: str) -> Dict[str, Any]:
+        """Async variant of FinanceDataService.get_ticker_details"""
+        url = f"https://yahoo-finance15.p.rapidapi.com/api/v2/get-summary/{ticker}"
+
+        return await cls._get('get_ticker_details', RAPIDAPI_HOST_YAHOO, url)
+
+    @classmethod
+    async def get_stock_history(cls, symbol: str, interval: str = '1d') -> Dict[str, Any]:
+        """Async variant of FinanceDataService.get_stock_history"""
+        url = "https://yahoo-finance15.p.rapidapi.com/api/v1/markets/stock/history"
+
+        querystring = {
+            "symbol": symbol,
+            "interval": interval,
+            "diffandsplits": "false"
+        }
+
+        return await cls._get('get_stock_history', RAPIDAPI_HOST_YAHOO, url, querystring)
+
+    @classmethod
+    async def get_ticker_news(cls, ticker: str, type: str = "ALL") -> Dict[str, Any]:
+        """Async variant of FinanceDataService.get_ticker_news"""
+        url = "https://yahoo-finance15.p.rapidapi.com/api/v2/markets/news"
+
+        querystring = {
+            "tickers": ticker,
+            "type": type
+        }
+
+        return await cls._get('get_ticker_news', RAPIDAPI_HOST_YAHOO, url, querystring)
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# Circuit breaker configuration
+# Consecutive upstream failures that open a circuit
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('FINANCE_CIRCUIT_FAILURE_THRESHOLD', '5'))
+# Seconds an open circuit fails fast before letting a trial request through
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get('FINANCE_CIRCUIT_RESET_TIMEOUT', '30'))
+
+
+class UpstreamUnavailable(Exception):
+    """
+    Raised when an upstream request failed or was not attempted because its circuit is open
+
+    Attributes:
+        host: Upstream host the request was addressed to
+        endpoint: Service method that made the request
+        retry_after: Seconds until the circuit lets requests through again, if known
+    """
+
+    def __init__(self, message: str, host: str, endpoint: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.host = host
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker for one upstream endpoint.
+
+    The circuit opens after ``failure_threshold`` consecutive failures and
+    rejects calls for ``reset_timeout`` seconds. It then half-opens and lets
+    a single trial call through: success closes the circuit, failure opens
+    it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started = 0.0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may be attempted now; half-open circuits admit one trial at a time"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.trial_started = 0.0
+            if self.state == self.CLOSED:
+                return True
+            # A trial that never reported back (e.g. it was shed locally) is replaced
+            if self.state == self.HALF_OPEN and now - self.trial_started >= self.reset_timeout:
+                self.trial_started = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def would_open(self) -> bool:
+        """Whether one more failure opens the circuit"""
+        with self._lock:
+            return self.state != self.CLOSED or self.failures + 1 >= self.failure_threshold
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit half-opens"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'state': self.state, 'failures': self.failures, 'rejected': self.rejected}
+
+
+class CircuitBreakerRegistry:
+    """Thread-safe map of (host, endpoint) to its circuit breaker"""
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get((host, endpoint))
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get((host, endpoint))
+                if breaker is None:
+                    breaker = self._breakers[(host, endpoint)] = CircuitBreaker(
+                        self.failure_threshold, self.reset_timeout
+                    )
+        return breaker
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Breaker state per host and endpoint"""
+        with self._lock:
+            breakers = list(self._breakers.items())
+        hosts: Dict[str, Dict[str, Any]] = {}
+        for (host, endpoint), breaker in breakers:
+            hosts.setdefault(host, {})[endpoint] = breaker.stats()
+        return hosts
@@ -1,11 +1,168 @@
+import logging
 import os
-import requests
-from typing import Dict, Any, Optional, List, Union
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple, Union
+from urllib.parse import urlsplit
+
+from .circuit_breaker import CircuitBreakerRegistry, UpstreamUnavailable
+from .http_session import HTTP_MAX_RETRIES, HTTP_RETRY_STATUS_CODES, get_session, get_timeout, retry_delay
+from .metrics import upstream_latency, upstream_outcome
+from .rate_limiter import RateLimiter, RateLimitExceeded
+from .response_cache import response_cache
+from .single_flight import SingleFlight
+from .symbol_index import local_search
+
+logger = logging.getLogger(__name__)
 
 # RapidAPI configuration
 RAPIDAPI_KEY = os.environ.get('RAPIDAPI_KEY', '')  # Provide default empty string
 RAPIDAPI_HOST_FINANCE = 'real-time-finance-data.p.rapidapi.com'
 RAPIDAPI_HOST_YAHOO = 'yahoo-finance15.p.rapidapi.com'
+# Send upstream requests to this scheme://host[:port] instead (e.g. the benchmark stub server)
+UPSTREAM_BASE_URL = os.environ.get('FINANCE_UPSTREAM_BASE_URL', '').rstrip('/')
+# Error returned in place of an upstream body that is not JSON; never cached
+NON_JSON_ERROR = 'The upstream API answered with a body that is not JSON'
+
+# Response cache TTLs (seconds) per service method
+CACHE_TTLS = {
+    'get_stock_quote': 15,
+    'get_stock_price': 15,
+    'get_ticker_details': 60,
+    'get_stock_history': 60,
+    'get_market_news': 5 * 60,
+    'get_ticker_news': 5 * 60,
+    'search_symbols': 60 * 60,
+    'get_market_tickers': 60 * 60,
+    'get_company_cash_flow': 6 * 60 * 60,
+    'get_company_data': 12 * 60 * 60,
+}
+DEFAULT_CACHE_TTL = 60
+# Expired responses younger than this multiple of their TTL are served while
+# a background request refreshes them (stale-while-revalidate)
+STALE_WHILE_REVALIDATE_FACTOR = float(os.environ.get('FINANCE_STALE_WHILE_REVALIDATE_FACTOR', '1'))
+
+# Upstream rate limits per host: (requests per second, burst), matching the RapidAPI plan
+RATE_LIMIT_PER_SECOND = float(os.environ.get('FINANCE_RATE_LIMIT_PER_SECOND', '5'))
+RATE_LIMIT_BURST = float(os.environ.get('FINANCE_RATE_LIMIT_BURST', '10'))
+# Requests per UTC day per host; 0 means unlimited
+DAILY_QUOTA = int(os.environ.get('FINANCE_DAILY_QUOTA', '0'))
+# Longest a request waits for the rate limiter before it is shed (seconds)
+RATE_LIMIT_MAX_WAIT = float(os.environ.get('FINANCE_RATE_LIMIT_MAX_WAIT', '2'))
+
+# Tighter per-endpoint limits, within the host limit: (requests per second, burst)
+ENDPOINT_RATE_LIMITS = {
+    'get_market_news': (0.5, 2),
+    'get_ticker_news': (0.5, 2),
+    'get_market_tickers': (1, 2),
+}
+
+# Priority lane per service method; lane 0 is served first
+METHOD_PRIORITIES = {
+    'get_stock_quote': 0,
+    'get_stock_price': 0,
+    'get_ticker_details': 1,
+    'get_company_data': 1,
+    'search_symbols': 1,
+    'get_stock_history': 2,
+    'get_company_cash_flow': 2,
+    'get_market_tickers': 2,
+    'get_market_news': 2,
+    'get_ticker_news': 2,
+}
+DEFAULT_PRIORITY = 1
+# Share of a host's burst each lane must leave for the more urgent lanes
+LANE_RESERVES = {0: 0.0, 1: 0.1, 2: 0.3}
+
+# Batch quote configuration
+BATCH_MAX_WORKERS = int(os.environ.get('FINANCE_BATCH_MAX_WORKERS', '16'))
+BATCH_MAX_SYMBOLS = int(os.environ.get('FINANCE_BATCH_MAX_SYMBOLS', '100'))
+
+_batch_executor: Optional[ThreadPoolExecutor] = None
+_batch_executor_lock = threading.Lock()
+
+# Coalesces concurrent cache misses for the same request into one upstream call
+upstream_calls = SingleFlight()
+
+# Background stale-while-revalidate refreshes and the keys they are refreshing
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='finance-refresh')
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+# Shared by the sync and async services
+circuit_breakers = CircuitBreakerRegistry()
+rate_limiter = RateLimiter(
+    host_limits={
+        RAPIDAPI_HOST_FINANCE: (RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST),
+        RAPIDAPI_HOST_YAHOO: (RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST),
+    },
+    endpoint_limits=ENDPOINT_RATE_LIMITS,
+    daily_quotas={RAPIDAPI_HOST_FINANCE: DAILY_QUOTA, RAPIDAPI_HOST_YAHOO: DAILY_QUOTA},
+    lane_reserves=LANE_RESERVES,
+)
+
+def upstream_url(url: str) -> str:
+    """Point a RapidAPI URL at UPSTREAM_BASE_URL, if one is configured"""
+    if not UPSTREAM_BASE_URL:
+        return url
+    return UPSTREAM_BASE_URL + urlsplit(url)._replace(scheme='', netloc='').geturl()
+
+def get_batch_executor() -> ThreadPoolExecutor:
+    """Return the shared thread pool that bounds concurrent batch fetches"""
+    global _batch_executor
+    if _batch_executor is None:
+        with _batch_executor_lock:
+            if _batch_executor is None:
+                _batch_executor = ThreadPoolExecutor(
+                    max_workers=BATCH_MAX_WORKERS,
+                    thread_name_prefix='finance-batch',
+                )
+    return _batch_executor
+
+def is_upstream_failure(status_code: int) -> bool:
+    """Whether an upstream status means the API is unhealthy rather than the request invalid"""
+    return status_code == 429 or status_code >= 500
+
+def decode_json(response) -> Any:
+    """
+    Decode an upstream response body
+    
+    Bodies that are not JSON, such as an HTML error page, are replaced by
+    an error dict so the status code is still reported to the caller.
+    """
+    try:
+        return response.json()
+    except ValueError:
+        logger.warning(f"Upstream answered {response.status_code} with a body that is not JSON")
+        return {'error': NON_JSON_ERROR}
+
+def is_cacheable(status_code: int, data: Any) -> bool:
+    """Whether an upstream response is a success worth caching"""
+    return 200 <= status_code < 300 and not (isinstance(data, dict) and data.get('error') == NON_JSON_ERROR)
+
+def stale_window(method: str) -> float:
+    """Seconds past expiry during which a response is served while it is refreshed"""
+    return CACHE_TTLS.get(method, DEFAULT_CACHE_TTL) * STALE_WHILE_REVALIDATE_FACTOR
+
+def mark_stale(data: Any, fresh_until: float, reason: str) -> Any:
+    """
+    Label a cached response that is served past its TTL
+    
+    Args:
+        data: Cached response
+        fresh_until: Epoch timestamp at which the response expired
+        reason: 'revalidating' or 'upstream_unavailable'
+    
+    Returns:
+        A copy of a dict response with a 'stale' entry; other values unchanged
+    """
+    if not isinstance(data, dict):
+        return data
+    return {
+        **data,
+        'stale': {'reason': reason, 'expired_seconds_ago': round(max(0.0, time.time() - fresh_until), 1)},
+    }
 
 class FinanceDataService:
     """Service to handle all financial data API requests"""
@@ -18,6 +175,179 @@ class FinanceDataService:
             'x-rapidapi-host': host
         }
     
+    @classmethod
+    def _get(cls, method: str, host: str, url: str, params: Optional[Dict[str, str]] = None,
+             use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Serve a GET request from the response cache or the upstream API
+        
+        Successful upstream responses are cached for the method's TTL in
+        CACHE_TTLS; client error responses are passed through without being
+        cached. Concurrent misses for the same key wait on a single upstream
+        request and share its result or exception. Upstream requests go
+        through the rate limiter and the endpoint's circuit breaker.
+        
+        Expired responses are served with a 'stale' marker while a
+        background request refreshes them, for up to stale_window(method)
+        seconds, and as a fallback whenever the upstream request is shed or
+        fails.
+        
+        With use_cache=False the cache is not read and nothing stale is
+        served: the response comes from the upstream API, and any answer
+        other than 2xx raises UpstreamUnavailable.
+        
+        Args:
+            method: Name of the calling service method (cache namespace)
+            host: RapidAPI host the request is addressed to
+            url: Full endpoint URL
+            params: Query string parameters
+            use_cache: Read the response cache and fall back to stale data
+            
+        Returns:
+            Dict containing the decoded JSON response
+        
+        Raises:
+            RateLimitExceeded: If the request was shed and nothing is cached
+            UpstreamUnavailable: If the upstream API failed and nothing is cached
+        """
+        key = response_cache.make_key(method, url, params)
+        if not use_cache:
+            # Kept apart from cached reads, which accept client error responses
+            return upstream_calls.do(
+                f'{key}:fresh', lambda: cls._refresh(method, host, url, params, key, require_success=True)
+            )
+        found, data, fresh_until = response_cache.get(method, key)
+        if found and fresh_until > time.time():
+            return data
+        if found and time.time() - fresh_until <= stale_window(method):
+            cls._revalidate(method, host, url, params, key)
+            return mark_stale(data, fresh_until, 'revalidating')
+        
+        try:
+            return upstream_calls.do(key, lambda: cls._refresh(method, host, url, params, key))
+        except (RateLimitExceeded, UpstreamUnavailable):
+            if found:
+                return mark_stale(data, fresh_until, 'upstream_unavailable')
+            raise
+    
+    @classmethod
+    def _refresh(cls, method: str, host: str, url: str, params: Optional[Dict[str, str]], key: str,
+                 require_success: bool = False) -> Any:
+        """
+        Fetch a response through the endpoint's circuit breaker and cache it on success
+        
+        Returns:
+            The decoded JSON response
+        
+        Raises:
+            UpstreamUnavailable: If the circuit is open, the request failed,
+                the upstream API answered 429/5xx, or it answered any other
+                non-2xx status and require_success is set
+        """
+        breaker = circuit_breakers.get(host, method)
+        if not breaker.allow():
+            raise UpstreamUnavailable(
+                f'{host} is unavailable ({method})', host, method, retry_after=breaker.retry_after()
+            )
+        
+        try:
+            status_code, data = cls._fetch(method, host, url, params)
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            logger.error(f"Upstream request to {host} ({method}) failed: {e}")
+            raise UpstreamUnavailable(f'{host} is unavailable ({method})', host, method) from e
+        
+        if is_upstream_failure(status_code):
+            breaker.record_failure()
+            raise UpstreamUnavailable(
+                f'{host} answered {status_code} ({method})', host, method, retry_after=breaker.retry_after() or None
+            )
+        
+        breaker.record_success()
+        if is_cacheable(status_code, data):
+            response_cache.set(key, data, CACHE_TTLS.get(method, DEFAULT_CACHE_TTL))
+        elif require_success:
+            raise UpstreamUnavailable(f'{host} answered {status_code} ({method})', host, method)
+        return data
+    
+    @classmethod
+    def _revalidate(cls, method: str, host: str, url: str, params: Optional[Dict[str, str]], key: str) -> None:
+        """Refresh a stale response in the background, once per key at a time"""
+        with _refreshing_lock:
+            if key in _refreshing:
+                return
+            _refreshing.add(key)
+        
+        def refresh():
+            try:
+                upstream_calls.do(key, lambda: cls._refresh(method, host, url, params, key))
+            except Exception as e:
+                logger.warning(f"Background refresh of {method} failed: {e}")
+            finally:
+                with _refreshing_lock:
+                    _refreshing.discard(key)
+        
+        _refresh_executor.submit(refresh)
+    
+    @classmethod
+    def _fetch(cls, method: str, host: str, url: str, params: Optional[Dict[str, str]] = None) -> Tuple[int, Any]:
+        """
+        Send a GET request through the pooled session for the upstream host,
+        retrying 429/5xx with backoff
+        
+        Every attempt is admitted by the rate limiter first, so retries count
+        against the host and endpoint buckets and the daily quota. Every failed
+        attempt counts against the circuit breaker, and retrying stops once one
+        more failure would open it.
+        
+        Returns:
+            Tuple of (HTTP status code, decoded JSON body or an error dict
+            if the body is not JSON)
+        """
+        session = get_session(host)
+        priority = METHOD_PRIORITIES.get(method, DEFAULT_PRIORITY)
+        breaker = circuit_breakers.get(host, method)
+        attempt = 0
+        while True:
+            rate_limiter.acquire(host, method, priority, RATE_LIMIT_MAX_WAIT)
+            started = time.perf_counter()
+            status = None
+            try:
+                response = session.get(upstream_url(url), headers=cls.get_headers(host), params=params, timeout=get_timeout())
+                status = response.status_code
+            finally:
+                upstream_latency.observe(time.perf_counter() - started, method, host, upstream_outcome(status))
+            # The attempt that would open the circuit is returned, and _refresh records it
+            retryable = (
+                response.status_code in HTTP_RETRY_STATUS_CODES and attempt < HTTP_MAX_RETRIES and not breaker.would_open()
+            )
+            delay = retry_delay(response, attempt) if retryable else None
+            if delay is None:
+                return response.status_code, decode_json(response)
+            # A retried attempt never reaches _refresh, so its failure is recorded here
+            breaker.record_failure()
+            time.sleep(delay)
+            attempt += 1
+    
+    @classmethod
+    def cache_stats(cls) -> Dict[str, Any]:
+        """Return hit/miss counters for the response cache"""
+        stats = response_cache.stats()
+        stats['single_flight'] = upstream_calls.stats()
+        return stats
+    
+    @classmethod
+    def rate_limit_stats(cls) -> Dict[str, Any]:
+        """Return upstream rate limits, quota usage and admission counters per host"""
+        return rate_limiter.stats()
+    
+    @classmethod
+    def circuit_breaker_stats(cls) -> Dict[str, Any]:
+        """Return the circuit breaker state per host and endpoint"""
+        return circuit_breakers.stats()
+    
     @classmethod
     def get_company_cash_flow(cls, symbol: str, period: str = 'QUARTERLY', language: str = 'en') -> Dict[str, Any]:
         """
@@ -39,10 +369,7 @@ class FinanceDataService:
             "language": language
         }
         
-        headers = cls.get_headers(RAPIDAPI_HOST_FINANCE)
-        
-        response = requests.get(url, headers=headers, params=querystring)
-        return response.json()
+        return cls._get('get_company_cash_flow', RAPIDAPI_HOST_FINANCE, url, querystring)
     
     @classmethod
     def get_company_data(cls, symbol: str, language: str = 'en') -> Dict[str, Any]:
@@ -63,10 +390,7 @@ class FinanceDataService:
             "language": language
         }
         
-        headers = cls.get_headers(RAPIDAPI_HOST_FINANCE)
-        
-        response = requests.get(url, headers=headers, params=querystring)
-        return response.json()
+        return cls._get('get_company_data', RAPIDAPI_HOST_FINANCE, url, querystring)
     
     @classmethod
     def get_stock_price(cls, symbol: str, language: str = 'en') -> Dict[str, Any]:
@@ -87,10 +411,7 @@ class FinanceDataService:
             "language": language
         }
         
-        headers = cls.get_headers(RAPIDAPI_HOST_FINANCE)
-        
-        response = requests.get(url, headers=headers, params=querystring)
-        return response.json()
+        return cls._get('get_stock_price', RAPIDAPI_HOST_FINANCE, url, querystring)
     
     @classmethod
     def get_market_news(cls, symbols: Optional[str] = None, language: str = 'en') -> Dict[str, Any]:
@@ -110,10 +431,7 @@ class FinanceDataService:
         if symbols:
             querystring["symbols"] = symbols
         
-        headers = cls.get_headers(RAPIDAPI_HOST_FINANCE)
-        
-        response = requests.get(url, headers=headers, params=querystring)
-        return response.json()
+        return cls._get('get_market_news', RAPIDAPI_HOST_FINANCE, url, querystring)
     
     @classmethod
     def get_stock_quote(cls, symbol: str, language: str = 'en') -> Dict[str, Any]:
@@ -134,16 +452,48 @@ class FinanceDataService:
             "language": language
         }
         
-        headers = cls.get_headers(RAPIDAPI_HOST_FINANCE)
+        return cls._get('get_stock_quote', RAPIDAPI_HOST_FINANCE, url, querystring)
+    
+    @classmethod
+    def get_stock_quotes(cls, symbols: List[str], language: str = 'en') -> Dict[str, Dict[str, Any]]:
+        """
+        Get stock quotes for many symbols concurrently
         
-        response = requests.get(url, headers=headers, params=querystring)
-        return response.json()
+        Symbols are normalized (stripped, upper-cased) and de-duplicated, then
+        fetched in parallel on the shared batch thread pool. A failure for one
+        symbol does not affect the others.
+        
+        Args:
+            symbols: Stock symbols (tickers)
+            language: Language code
+            
+        Returns:
+            Dict mapping each normalized symbol to {'data': quote} or {'error': message}
+        """
+        unique_symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol.strip()))
+        
+        executor = get_batch_executor()
+        futures = {
+            symbol: executor.submit(cls.get_stock_quote, symbol, language)
+            for symbol in unique_symbols
+        }
+        
+        results = {}
+        for symbol, future in futures.items():
+            try:
+                results[symbol] = {'data': future.result()}
+            except Exception as e:
+                results[symbol] = {'error': str(e)}
+        return results
     
     @classmethod
     def search_symbols(cls, query: str, language: str = 'en') -> Dict[str, Any]:
         """
         Search for stocks, ETFs, mutual funds, indices, and cryptocurrencies
         
+        Answered from the local symbol index when it has a match; RapidAPI
+        is only queried for misses or before the index is built.
+        
         Args:
             query: Search query
             language: Language code
@@ -151,6 +501,10 @@ class FinanceDataService:
         Returns:
             Dict containing search results
         """
+        local = local_search(query)
+        if local is not None:
+            return local
+
         url = "https://real-time-finance-data.p.rapidapi.com/search"
         
         querystring = {
@@ -158,19 +512,17 @@ class FinanceDataService:
             "language": language
         }
         
-        headers = cls.get_headers(RAPIDAPI_HOST_FINANCE)
-        
-        response = requests.get(url, headers=headers, params=querystring)
-        return response.json()
+        return cls._get('search_symbols', RAPIDAPI_HOST_FINANCE, url, querystring)
     
     @classmethod
-    def get_market_tickers(cls, page: str = "1", type: str = "STOCKS") -> Dict[str, Any]:
+    def get_market_tickers(cls, page: str = "1", type: str = "STOCKS", use_cache: bool = True) -> Dict[str, Any]:
         """
         Get market tickers
         
         Args:
             page: Page number
             type: Type of tickers (STOCKS, MUTUAL_FUNDS, ETFS, INDICES, FUTURES, OPTIONS)
+            use_cache: Serve cached or stale pages (crawls pass False)
             
         Returns:
             Dict containing market tickers
@@ -182,10 +534,7 @@ class FinanceDataService:
             "type": type
         }
         
-        headers = cls.get_headers(RAPIDAPI_HOST_YAHOO)
-        
-        response = requests.get(url, headers=headers, params=querystring)
-        return response.json()
+        return cls._get('get_market_tickers', RAPIDAPI_HOST_YAHOO, url, querystring, use_cache)
     
     @classmethod
     def get_ticker_details(cls, ticker: str) -> Dict[str, Any]:
@@ -200,10 +549,29 @@ class FinanceDataService:
         """
         url = f"https://yahoo-finance15.p.rapidapi.com/api/v2/get-summary/{ticker}"
         
-        headers = cls.get_headers(RAPIDAPI_HOST_YAHOO)
+        return cls._get('get_ticker_details', RAPIDAPI_HOST_YAHOO, url)
+    
+    @classmethod
+    def get_stock_history(cls, symbol: str, interval: str = '1d') -> Dict[str, Any]:
+        """
+        Get OHLCV price bars for a symbol
+        
+        Args:
+            symbol: Stock symbol (ticker)
+            interval: Bar size (1m, 5m, 15m, 30m, 1h, 1d, 1wk, 1mo)
+            
+        Returns:
+            Dict containing bars keyed by their UTC timestamp under 'body'
+        """
+        url = "https://yahoo-finance15.p.rapidapi.com/api/v1/markets/stock/history"
+        
+        querystring = {
+            "symbol": symbol,
+            "interval": interval,
+            "diffandsplits": "false"
+        }
         
-        response = requests.get(url, headers=headers)
-        return response.json()
+        return cls._get('get_stock_history', RAPIDAPI_HOST_YAHOO, url, querystring)
     
     @classmethod
     def get_ticker_news(cls, ticker: str, type: str = "ALL") -> Dict[str, Any]:
@@ -224,7 +592,4 @@ class FinanceDataService:
             "type": type
         }
         
-        headers = cls.get_headers(RAPIDAPI_HOST_YAHOO)
-        
-        response = requests.get(url, headers=headers, params=querystring)
-        return response.json()
\ No newline at end of file
+        return cls._get('get_ticker_news', RAPIDAPI_HOST_YAHOO, url, querystring)
\ No newline at end of file
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Connection pool configuration
+HTTP_POOL_SIZE = int(os.environ.get('FINANCE_HTTP_POOL_SIZE', '20'))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('FINANCE_HTTP_CONNECT_TIMEOUT', '3.05'))
+HTTP_READ_TIMEOUT = float(os.environ.get('FINANCE_HTTP_READ_TIMEOUT', '10'))
+HTTP_MAX_RETRIES = int(os.environ.get('FINANCE_HTTP_MAX_RETRIES', '3'))
+HTTP_BACKOFF_FACTOR = float(os.environ.get('FINANCE_HTTP_BACKOFF_FACTOR', '0.5'))
+HTTP_RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Longest Retry-After honoured before a retry; longer ones return the response instead of tying up the worker
+HTTP_MAX_RETRY_AFTER = float(os.environ.get('FINANCE_HTTP_MAX_RETRY_AFTER', str(HTTP_READ_TIMEOUT)))
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+# Async clients are bound to the event loop that created them
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]' = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_timeout() -> Tuple[float, float]:
+    """Return the (connect, read) timeout used for upstream requests"""
+    return (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+
+def create_session(
+    pool_size: int = HTTP_POOL_SIZE,
+    max_retries: int = HTTP_MAX_RETRIES,
+    backoff_factor: float = HTTP_BACKOFF_FACTOR,
+) -> requests.Session:
+    """
+    Create a keep-alive session with a bounded connection pool and connect retries
+
+    Only connection failures are retried here, since those requests never
+    reached the upstream. Retrying 429/5xx responses is left to the caller,
+    which must pass every attempt through the rate limiter and the circuit
+    breaker (see retry_delay).
+
+    Args:
+        pool_size: Maximum number of pooled connections kept open to the host
+        max_retries: Number of retries on connection errors
+        backoff_factor: Exponential backoff factor between retries (seconds)
+
+    Returns:
+        A configured requests.Session
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=0,
+        status=0,
+        other=0,
+        allowed_methods=frozenset(['GET']),
+        backoff_factor=backoff_factor,
+        respect_retry_after_header=False,
+        # Hand the upstream response back to the caller instead of raising
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+        pool_block=False,
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def retry_delay(response, attempt: int) -> Optional[float]:
+    """
+    Backoff before retrying a 429/5xx response, honouring a numeric Retry-After header
+
+    Args:
+        response: The requests or httpx response to retry
+        attempt: Number of attempts already retried
+
+    Returns:
+        Seconds to wait, or None when Retry-After asks for longer than
+        HTTP_MAX_RETRY_AFTER and the response should be returned as it is
+    """
+    retry_after = response.headers.get('Retry-After')
+    if retry_after and retry_after.isdigit():
+        return float(retry_after) if float(retry_after) <= HTTP_MAX_RETRY_AFTER else None
+    return HTTP_BACKOFF_FACTOR * (2 ** attempt)
+
+
+def get_session(host: str) -> requests.Session:
+    """
+    Get the shared session for an upstream host, creating it on first use.
+
+    Sessions only carry the connection pool and retry policy, so a single
+    instance can safely be shared by every worker thread.
+
+    Args:
+        host: Upstream host name
+
+    Returns:
+        The pooled requests.Session for the host
+    """
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = create_session()
+                _sessions[host] = session
+    return session
+
+
+def close_sessions() -> None:
+    """Close every pooled session and drop its connections"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def create_async_client(pool_size: int = HTTP_POOL_SIZE, max_retries: int = HTTP_MAX_RETRIES) -> httpx.AsyncClient:
+    """
+    Create a pooled keep-alive async client
+
+    The transport retries connection failures only; retrying 429/5xx
+    responses with backoff is left to the caller.
+
+    Args:
+        pool_size: Maximum number of pooled connections kept open to the host
+        max_retries: Number of retries on connection errors
+
+    Returns:
+        A configured httpx.AsyncClient
+    """
+    return httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(retries=max_retries),
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+    )
+
+
+def get_async_client(host: str) -> httpx.AsyncClient:
+    """
+    Get the shared async client for an upstream host on the running event loop
+
+    Args:
+        host: Upstream host name
+
+    Returns:
+        The pooled httpx.AsyncClient for the host
+    """
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(host)
+    if client is None or client.is_closed:
+        client = create_async_client()
+        clients[host] = client
+    return client
+
+
+async def aclose_clients() -> None:
+    """Close the async clients owned by the running event loop"""
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
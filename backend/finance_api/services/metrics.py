@@ -0,0 +1,262 @@
+import bisect
+import contextvars
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Metrics configuration
+# Clients allowed to scrape /metrics
+METRICS_ALLOWED_IPS = set(os.environ.get('FINANCE_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(','))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# (name, type, help, [(labels, value[, suffix])]) as returned by collectors
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def collect(self) -> Iterable[Family]:
+        with self._lock:
+            values = list(self._values.items())
+        yield self.name, 'counter', self.documentation, [
+            (dict(zip(self.labelnames, labelvalues)), value) for labelvalues, value in values
+        ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of label names"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labelvalues -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self) -> Iterable[Family]:
+        with self._lock:
+            series = [(labelvalues, list(counts), total) for labelvalues, (counts, total) in self._series.items()]
+        samples = []
+        for labelvalues, counts, total in series:
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append(({**labels, 'le': _format_value(bound)}, cumulative, '_bucket'))
+            samples.append((labels, total, '_sum'))
+            samples.append((labels, cumulative, '_count'))
+        yield self.name, 'histogram', self.documentation, samples
+
+
+class Registry:
+    """Metrics and scrape-time collectors rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        """Add a callable that reports current values (e.g. cache counters) at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        families = [family for metric in self._metrics for family in metric.collect()]
+        for collector in self._collectors:
+            families.extend(collector())
+        for name, kind, documentation, samples in families:
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample in samples:
+                labels, value = sample[0], sample[1]
+                suffix = sample[2] if len(sample) > 2 else ''
+                lines.append(f'{name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+view_latency = registry.register(Histogram(
+    'finance_http_request_duration_seconds', 'Time to produce a response, per view',
+    ('view', 'method', 'status'),
+))
+view_db_queries = registry.register(Histogram(
+    'finance_http_request_db_queries', 'Database queries issued while handling a request, per view',
+    ('view',), QUERY_COUNT_BUCKETS,
+))
+view_db_time = registry.register(Histogram(
+    'finance_http_request_db_seconds', 'Time spent in database queries while handling a request, per view',
+    ('view',),
+))
+upstream_latency = registry.register(Histogram(
+    'finance_upstream_request_duration_seconds', 'RapidAPI request latency, per service method and host',
+    ('method', 'host', 'outcome'),
+))
+llm_latency = registry.register(Histogram(
+    'finance_llm_call_duration_seconds', 'LLM call latency, per chain',
+    ('chain',), LLM_LATENCY_BUCKETS,
+))
+llm_tokens = registry.register(Counter(
+    'finance_llm_tokens_total', 'LLM tokens per chain and direction, estimated from text length',
+    ('chain', 'direction'),
+))
+
+
+def upstream_outcome(status: Optional[int]) -> str:
+    """Label for an upstream response: its status class, or 'error' if none was received"""
+    return f'{status // 100}xx' if status else 'error'
+
+
+# Rough characters-per-token ratio used for LLM token estimates
+CHARS_PER_TOKEN = 4
+
+
+def observe_llm_call(chain: str, started: float, prompt: str, answer: str) -> None:
+    """Record an LLM call that started at time.perf_counter() value ``started``"""
+    llm_latency.observe(time.perf_counter() - started, chain)
+    llm_tokens.inc(chain, 'prompt', amount=math.ceil(len(prompt) / CHARS_PER_TOKEN))
+    llm_tokens.inc(chain, 'completion', amount=math.ceil(len(answer) / CHARS_PER_TOKEN))
+
+
+# [queries, seconds] of the request being handled; sync_to_async threads inherit it
+_request_db: contextvars.ContextVar = contextvars.ContextVar('finance_request_db', default=None)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper that charges queries to the current request"""
+    totals = _request_db.get()
+    if totals is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        totals[0] += 1
+        totals[1] += time.perf_counter() - started
+
+
+def install_db_wrapper(sender, connection, **kwargs) -> None:
+    """connection_created receiver that instruments every new database connection"""
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+def begin_request() -> Tuple[contextvars.Token, float]:
+    return _request_db.set([0, 0.0]), time.perf_counter()
+
+
+def finish_request(request, status: int, token: contextvars.Token, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    queries, db_seconds = _request_db.get()
+    _request_db.reset(token)
+    match = getattr(request, 'resolver_match', None)
+    # Route names keep the label set small; unmatched paths share one label
+    view = (match.view_name or match._func_path) if match is not None else 'unmatched'
+    view_latency.observe(elapsed, view, request.method, str(status))
+    view_db_queries.observe(queries, view)
+    view_db_time.observe(db_seconds, view)
+
+
+def _service_collector() -> Iterable[Family]:
+    from .advice_cache import advice_cache
+    from .async_finance_data_service import async_upstream_calls
+    from .finance_data_service import circuit_breakers, rate_limiter, upstream_calls
+    from .response_cache import response_cache
+
+    cache = response_cache.stats()
+    lookups, ratios = [], []
+    for method, counters in cache['methods'].items():
+        for result in ('hits', 'shared_hits', 'stale_hits', 'misses'):
+            lookups.append(({'cache': 'response', 'method': method, 'result': result}, counters[result]))
+        total = sum(counters.values())
+        fresh = counters['hits'] + counters['shared_hits']
+        ratios.append(({'cache': 'response', 'method': method}, fresh / total if total else 0.0))
+    advice = advice_cache.stats()
+    for result in ('hits', 'near_hits', 'misses'):
+        lookups.append(({'cache': 'advice', 'method': 'get_financial_advice', 'result': result}, advice[result]))
+    ratios.append(({'cache': 'advice', 'method': 'get_financial_advice'}, advice['hit_ratio']))
+    yield 'finance_cache_lookups_total', 'counter', 'Cache lookups by cache, method and result', lookups
+    yield 'finance_cache_hit_ratio', 'gauge', 'Share of cache lookups answered fresh', ratios
+
+    coalesced, in_flight = [], []
+    for client, flights in (('sync', upstream_calls.stats()), ('async', async_upstream_calls.stats())):
+        coalesced.append(({'client': client}, flights['coalesced']))
+        in_flight.append(({'client': client}, flights['in_flight']))
+    yield 'finance_upstream_coalesced_total', 'counter', 'Cache misses that waited on an identical in-flight request', coalesced
+    yield 'finance_upstream_in_flight', 'gauge', 'Upstream requests currently in flight', in_flight
+
+    tokens, waiting, admissions, wait_seconds = [], [], [], []
+    for host, host_stats in rate_limiter.stats().items():
+        if 'tokens' in host_stats:
+            tokens.append(({'host': host}, host_stats['tokens']))
+            waiting.append(({'host': host}, host_stats['waiting']))
+        for endpoint, counters in host_stats['endpoints'].items():
+            for result in ('admitted', 'shed', 'quota_exhausted'):
+                admissions.append(({'host': host, 'endpoint': endpoint, 'result': result}, counters[result]))
+            wait_seconds.append(({'host': host, 'endpoint': endpoint}, counters['wait_seconds']))
+    yield 'finance_rate_limit_tokens', 'gauge', 'Tokens left in each host bucket', tokens
+    yield 'finance_rate_limit_waiting', 'gauge', 'Requests waiting for host tokens', waiting
+    yield 'finance_rate_limit_requests_total', 'counter', 'Upstream requests by rate limiter decision', admissions
+    yield 'finance_rate_limit_wait_seconds_total', 'counter', 'Time upstream requests spent waiting for tokens', wait_seconds
+
+    states = {'closed': 0, 'half_open': 1, 'open': 2}
+    circuit, rejected = [], []
+    for host, endpoints in circuit_breakers.stats().items():
+        for endpoint, breaker in endpoints.items():
+            labels = {'host': host, 'endpoint': endpoint}
+            circuit.append((labels, states[breaker['state']]))
+            rejected.append((labels, breaker['rejected']))
+    yield 'finance_circuit_state', 'gauge', 'Circuit breaker state (0 closed, 1 half-open, 2 open)', circuit
+    yield 'finance_circuit_rejected_total', 'counter', 'Calls failed fast by an open circuit', rejected
+
+
+registry.register_collector(_service_collector)
@@ -0,0 +1,295 @@
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from statistics import NormalDist
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .finance_data_service import get_batch_executor
+from .portfolio_valuation import Holding
+from .price_history import PriceHistoryStore, get_price_store, ingest_history, normalize_symbol
+from .response_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Portfolio risk configuration
+# Index the portfolio beta is measured against
+RISK_BENCHMARK = os.environ.get('FINANCE_RISK_BENCHMARK', '^GSPC')
+# Calendar days of daily closes the statistics are computed over
+RISK_LOOKBACK_DAYS = int(os.environ.get('FINANCE_RISK_LOOKBACK_DAYS', str(5 * 365)))
+RISK_CONFIDENCE_LEVELS = (0.95, 0.99)
+# Holdings with fewer daily returns are left out rather than shortening the window for all
+RISK_MIN_OBSERVATIONS = 60
+RISK_CACHE_MAX_ENTRIES = int(os.environ.get('FINANCE_RISK_CACHE_MAX_ENTRIES', '512'))
+TRADING_DAYS_PER_YEAR = 252
+
+# portfolio id, UTC day and holdings -> report; entries expire at the next UTC midnight
+_reports = LRUCache(RISK_CACHE_MAX_ENTRIES)
+
+
+def aligned_closes(series: List[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Put daily closes of several symbols on one date axis
+
+    Every date any symbol traded becomes a row; a symbol's gaps (holidays
+    of its exchange) carry its previous close forward, and rows before its
+    first close stay NaN.
+
+    Args:
+        series: (timestamps, closes) per symbol, each sorted by time
+
+    Returns:
+        Tuple of (timestamps, closes matrix of shape (dates, symbols)) in the order of ``series``
+    """
+    dates = np.unique(np.concatenate([ts for ts, _ in series]))
+    closes = np.full((len(dates), len(series)), np.nan)
+    for column, (ts, close) in enumerate(series):
+        closes[np.searchsorted(dates, ts), column] = close
+    # Forward fill: index of the last observed row at or above each row
+    rows = np.where(np.isnan(closes), 0, np.arange(len(dates))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return dates, closes[rows, np.arange(len(series))]
+
+
+def risk_metrics(returns: np.ndarray, weights: np.ndarray, benchmark: Optional[np.ndarray] = None,
+                 confidence_levels: Iterable[float] = RISK_CONFIDENCE_LEVELS) -> Dict[str, Any]:
+    """
+    Risk statistics of a constant-weight portfolio from daily returns
+
+    VaR and CVaR are one-day losses as positive fractions of the portfolio
+    value; volatilities and the covariance matrix are annualized.
+
+    Args:
+        returns: Daily simple returns, shape (days, assets)
+        weights: Portfolio weight per asset, summing to 1
+        benchmark: Daily benchmark returns on the same days, for betas
+        confidence_levels: VaR/CVaR confidence levels
+
+    Returns:
+        Dict with 'volatility', 'beta', 'var', 'max_drawdown' and per-asset arrays
+        under 'assets' ('volatility', 'beta') and 'covariance'
+    """
+    covariance = np.cov(returns, rowvar=False).reshape(len(weights), len(weights))
+    portfolio = returns @ weights
+    daily_volatility = float(np.sqrt(weights @ covariance @ weights))
+
+    betas = portfolio_beta = None
+    if benchmark is not None:
+        centered = benchmark - benchmark.mean()
+        variance = centered @ centered
+        if variance > 0:
+            betas = (returns - returns.mean(axis=0)).T @ centered / variance
+            portfolio_beta = float(weights @ betas)
+
+    mean, deviation = portfolio.mean(), portfolio.std(ddof=1)
+    tail_thresholds = np.quantile(portfolio, [1 - level for level in confidence_levels])
+    value_at_risk = []
+    for level, threshold in zip(confidence_levels, tail_thresholds):
+        z = NormalDist().inv_cdf(1 - level)
+        value_at_risk.append({
+            'confidence': level,
+            'historical_var': float(-threshold),
+            'historical_cvar': float(-portfolio[portfolio <= threshold].mean()),
+            'parametric_var': float(-(mean + z * deviation)),
+            'parametric_cvar': float(-(mean - deviation * NormalDist().pdf(z) / (1 - level))),
+        })
+
+    growth = np.cumprod(1 + portfolio)
+    drawdowns = 1 - growth / np.maximum.accumulate(growth)
+    trough = int(np.argmax(drawdowns))
+    peak = int(np.argmax(growth[:trough + 1])) if drawdowns[trough] > 0 else trough
+
+    return {
+        'volatility': {
+            'daily': daily_volatility,
+            'annual': daily_volatility * np.sqrt(TRADING_DAYS_PER_YEAR),
+        },
+        'beta': portfolio_beta,
+        'var': value_at_risk,
+        # Indexes are of the return rows; the caller maps them to dates
+        'max_drawdown': {'drawdown': float(drawdowns[trough]), 'peak': peak, 'trough': trough},
+        'assets': {
+            'volatility': np.sqrt(np.diag(covariance) * TRADING_DAYS_PER_YEAR),
+            'beta': betas,
+        },
+        'covariance': covariance * TRADING_DAYS_PER_YEAR,
+    }
+
+
+def last_session_start(now: Optional[float] = None) -> int:
+    """
+    UTC midnight of the latest weekday before today
+
+    Daily bars are stamped at UTC midnight, so a symbol whose last bar is
+    older than this is missing at least one completed session (exchange
+    holidays aside).
+    """
+    day = datetime.fromtimestamp(time.time() if now is None else now, timezone.utc).date() - timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return int(datetime.combine(day, datetime.min.time(), timezone.utc).timestamp())
+
+
+def _ensure_history(symbols: List[str], store: PriceHistoryStore) -> None:
+    """Ingest daily bars for symbols the store has never seen or has not updated since the last session"""
+    current = last_session_start()
+    missing = [symbol for symbol in symbols if (store.last_timestamp(symbol, '1d') or 0) < current]
+
+    def ingest(symbol):
+        try:
+            ingest_history(symbol, '1d', store)
+        except Exception as e:
+            logger.warning(f"Could not ingest price history for {symbol}: {e}")
+
+    list(get_batch_executor().map(ingest, missing))
+
+
+def _day(timestamp: int) -> str:
+    return datetime.fromtimestamp(int(timestamp), timezone.utc).date().isoformat()
+
+
+def compute_portfolio_risk(holdings: Iterable[Holding], benchmark: str = RISK_BENCHMARK,
+                           store: Optional[PriceHistoryStore] = None) -> Optional[Dict[str, Any]]:
+    """
+    Risk report of holdings valued at their latest stored daily close
+
+    Args:
+        holdings: Portfolio holdings
+        benchmark: Symbol of the index betas are measured against
+        store: Price history source (default: get_price_store())
+
+    Returns:
+        Report dict, or None if no holding has enough price history. Holdings
+        whose symbol is not a valid ticker are listed under 'excluded_symbols'.
+    """
+    store = store or get_price_store()
+    quantities: Dict[str, float] = {}
+    excluded = []
+    for holding in holdings:
+        try:
+            symbol = normalize_symbol(holding[1])
+        except ValueError:
+            # Stock.symbol is free text; one bad holding must not fail the whole report
+            excluded.append(holding[1])
+            continue
+        quantities[symbol] = quantities.get(symbol, 0.0) + float(holding[3])
+    symbols = [symbol for symbol, quantity in quantities.items() if quantity > 0]
+    _ensure_history(symbols + [benchmark], store)
+
+    end = int(time.time())
+    start = end - RISK_LOOKBACK_DAYS * 24 * 60 * 60
+    assets, series = [], []
+    for symbol in symbols:
+        bars = store.range(symbol, '1d', start, end + 1, ('close',))
+        if len(bars['ts']) > RISK_MIN_OBSERVATIONS:
+            assets.append(symbol)
+            series.append((bars['ts'], bars['close']))
+        else:
+            excluded.append(symbol)
+    if not assets:
+        return None
+    bars = store.range(benchmark, '1d', start, end + 1, ('close',))
+    has_benchmark = len(bars['ts']) > RISK_MIN_OBSERVATIONS
+    if has_benchmark:
+        series.append((bars['ts'], bars['close']))
+
+    dates, closes = aligned_closes(series)
+    # Start where every included series has a close
+    first = int(np.max(np.argmax(~np.isnan(closes), axis=0)))
+    dates, closes = dates[first:], closes[first:]
+    returns = closes[1:] / closes[:-1] - 1
+    asset_returns = returns[:, :len(assets)]
+    benchmark_returns = returns[:, len(assets)] if has_benchmark else None
+
+    values = np.array([quantities[symbol] for symbol in assets]) * closes[-1, :len(assets)]
+    total = float(values.sum())
+    weights = values / total
+    metrics = risk_metrics(asset_returns, weights, benchmark_returns)
+    current = last_session_start()
+    stale = [symbol for symbol, (ts, _) in zip(assets, series) if ts[-1] < current]
+
+    drawdown = metrics['max_drawdown']
+    asset_betas = metrics['assets']['beta']
+    return {
+        'as_of': _day(dates[-1]),
+        'start': _day(dates[0]),
+        'observations': len(returns),
+        'benchmark': benchmark if has_benchmark else None,
+        'market_value': round(total, 2),
+        'volatility': {name: round(value, 6) for name, value in metrics['volatility'].items()},
+        'beta': round(metrics['beta'], 4) if metrics['beta'] is not None else None,
+        'var': [
+            {
+                **{name: round(value, 6) for name, value in level.items()},
+                'historical_var_amount': round(level['historical_var'] * total, 2),
+                'parametric_var_amount': round(level['parametric_var'] * total, 2),
+            }
+            for level in metrics['var']
+        ],
+        'max_drawdown': {
+            'drawdown': round(drawdown['drawdown'], 6),
+            # Return row i ends on dates[i + 1]
+            'peak': _day(dates[drawdown['peak'] + 1]),
+            'trough': _day(dates[drawdown['trough'] + 1]),
+        },
+        'assets': [
+            {
+                'symbol': symbol,
+                'weight': round(float(weights[i]), 6),
+                'volatility': round(float(metrics['assets']['volatility'][i]), 6),
+                'beta': round(float(asset_betas[i]), 4) if asset_betas is not None else None,
+            }
+            for i, symbol in enumerate(assets)
+        ],
+        'covariance': {
+            'symbols': assets,
+            'matrix': np.round(metrics['covariance'], 8).tolist(),
+        },
+        'excluded_symbols': excluded,
+        # Holdings whose stored history could not be brought up to the last session
+        'stale_symbols': stale,
+    }
+
+
+def portfolio_risk(portfolio_id: int, holdings: Iterable[Holding],
+                   benchmark: str = RISK_BENCHMARK) -> Optional[Dict[str, Any]]:
+    """
+    Risk report of a portfolio, cached per portfolio and UTC day
+
+    Changing the holdings changes the cache key, so edits are reflected at once.
+
+    Args:
+        portfolio_id: Portfolio primary key
+        holdings: The portfolio's holdings
+        benchmark: Symbol of the index betas are measured against
+
+    Returns:
+        Report dict as produced by compute_portfolio_risk(), or None
+
+    Raises:
+        ValueError: If the benchmark is not a valid symbol
+    """
+    try:
+        benchmark = normalize_symbol(benchmark)
+    except ValueError:
+        raise ValueError(f'Invalid benchmark: {benchmark!r}')
+    holdings = list(holdings)
+    fingerprint = hashlib.sha1(repr(sorted(
+        (holding[1].strip().upper(), str(holding[3])) for holding in holdings
+    )).encode()).hexdigest()
+    today = datetime.now(timezone.utc).date()
+    key = f'{portfolio_id}:{today.isoformat()}:{benchmark}:{fingerprint}'
+    found, report, _ = _reports.get(key)
+    if found:
+        return report
+
+    report = compute_portfolio_risk(holdings, benchmark)
+    if report is None:
+        # Missing history may be ingested by the next request
+        return None
+    tomorrow = datetime.combine(today + timedelta(days=1), datetime.min.time(), timezone.utc)
+    _reports.set(key, report, tomorrow.timestamp())
+    return report
@@ -0,0 +1,154 @@
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .finance_data_service import BATCH_MAX_SYMBOLS, FinanceDataService
+
+# A holding as read from the database: (stock id, symbol, name, quantity, purchase price)
+Holding = Tuple[int, str, str, Any, Any]
+
+
+def extract_quote_price(result: Dict[str, Any]) -> Optional[float]:
+    """
+    Pull the current price out of a get_stock_quotes() result entry
+
+    Args:
+        result: {'data': quote} or {'error': message} for one symbol
+
+    Returns:
+        The price as a float, or None if the quote failed or has no price
+    """
+    quote = result.get('data')
+    if not isinstance(quote, dict):
+        return None
+    data = quote.get('data')
+    if not isinstance(data, dict):
+        return None
+    try:
+        price = float(data.get('price'))
+    except (TypeError, ValueError):
+        return None
+    return price if np.isfinite(price) else None
+
+
+def _round(values: np.ndarray, decimals: int) -> list:
+    """Round an array for JSON output, mapping NaN to None"""
+    rounded = np.round(values, decimals)
+    return [None if np.isnan(value) else float(value) for value in rounded]
+
+
+def value_holdings(holdings: Iterable[Holding], prices: Dict[str, Optional[float]]) -> Dict[str, Any]:
+    """
+    Compute per-position and aggregate valuation with vectorized arithmetic
+
+    Positions without a current price keep their cost basis but get no
+    market value, P&L or weight, and are listed under 'unpriced_symbols'.
+
+    Args:
+        holdings: Portfolio holdings
+        prices: Current price per upper-cased symbol (None if unavailable)
+
+    Returns:
+        Dict with 'positions', 'totals' and 'unpriced_symbols'
+    """
+    holdings = list(holdings)
+    ids = [holding[0] for holding in holdings]
+    symbols = [holding[1].strip().upper() for holding in holdings]
+    names = [holding[2] for holding in holdings]
+
+    quantity = np.array([holding[3] for holding in holdings], dtype=np.float64)
+    purchase_price = np.array([holding[4] for holding in holdings], dtype=np.float64)
+    price = np.array(
+        [np.nan if prices.get(symbol) is None else prices[symbol] for symbol in symbols],
+        dtype=np.float64,
+    )
+    priced = ~np.isnan(price)
+
+    cost_basis = quantity * purchase_price
+    market_value = quantity * price
+    unrealized_pnl = market_value - cost_basis
+    unrealized_pnl_pct = np.full_like(cost_basis, np.nan)
+    np.divide(unrealized_pnl, cost_basis, out=unrealized_pnl_pct, where=priced & (cost_basis != 0))
+
+    total_market_value = market_value[priced].sum()
+    total_priced_cost = cost_basis[priced].sum()
+    total_pnl = total_market_value - total_priced_cost
+    weights = np.full_like(market_value, np.nan)
+    if total_market_value:
+        np.divide(market_value, total_market_value, out=weights, where=priced)
+
+    columns = {
+        'current_price': _round(price, 4),
+        'market_value': _round(market_value, 2),
+        'cost_basis': _round(cost_basis, 2),
+        'unrealized_pnl': _round(unrealized_pnl, 2),
+        'unrealized_pnl_pct': _round(unrealized_pnl_pct * 100, 4),
+        'weight': _round(weights, 6),
+    }
+    positions = [
+        {
+            'id': ids[i],
+            'symbol': symbols[i],
+            'name': names[i],
+            'quantity': float(quantity[i]),
+            'purchase_price': float(purchase_price[i]),
+            **{column: values[i] for column, values in columns.items()},
+        }
+        for i in range(len(holdings))
+    ]
+
+    return {
+        'positions': positions,
+        'totals': {
+            'market_value': round(float(total_market_value), 2),
+            'cost_basis': round(float(cost_basis.sum()), 2),
+            'priced_cost_basis': round(float(total_priced_cost), 2),
+            'unrealized_pnl': round(float(total_pnl), 2),
+            'unrealized_pnl_pct': round(float(total_pnl / total_priced_cost * 100), 4) if total_priced_cost else None,
+            'position_count': len(holdings),
+        },
+        'unpriced_symbols': sorted({symbols[i] for i in np.flatnonzero(~priced)}),
+    }
+
+
+def fetch_quotes(symbols: List[str], language: str = 'en') -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch quotes for distinct symbols, at most BATCH_MAX_SYMBOLS per batch
+
+    Returns:
+        Dict mapping each symbol to its get_stock_quotes() result entry
+    """
+    quotes = {}
+    for start in range(0, len(symbols), BATCH_MAX_SYMBOLS):
+        quotes.update(FinanceDataService.get_stock_quotes(symbols[start:start + BATCH_MAX_SYMBOLS], language))
+    return quotes
+
+
+def value_portfolio(holdings: Iterable[Holding], language: str = 'en') -> Dict[str, Any]:
+    """
+    Value holdings at current market prices
+
+    Quotes are fetched concurrently, at most BATCH_MAX_SYMBOLS distinct
+    symbols per batch, so a large portfolio never queues more quotes at once
+    than the batch endpoint allows. Symbols whose quote failed are listed
+    with the error under 'quote_errors' (and under 'unpriced_symbols').
+
+    Args:
+        holdings: Portfolio holdings
+        language: Language code for the quote requests
+
+    Returns:
+        Valuation dict as produced by value_holdings(), plus 'quote_errors'
+    """
+    holdings = list(holdings)
+    symbols = list(dict.fromkeys(
+        holding[1].strip().upper() for holding in holdings if holding[1].strip()
+    ))
+    quotes = fetch_quotes(symbols, language)
+    prices = {symbol: extract_quote_price(result) for symbol, result in quotes.items()}
+
+    valuation = value_holdings(holdings, prices)
+    valuation['quote_errors'] = {
+        symbol: result['error'] for symbol, result in sorted(quotes.items()) if 'error' in result
+    }
+    return valuation
@@ -0,0 +1,431 @@
+import contextlib
+import logging
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .finance_data_service import FinanceDataService
+from .ticker_snapshots import parse_number
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Price history configuration
+PRICE_HISTORY_PATH = os.environ.get(
+    'FINANCE_PRICE_HISTORY_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'price_history'),
+)
+# Bars a chart returns by default, and the most it may ask for
+CHART_MAX_POINTS = int(os.environ.get('FINANCE_CHART_MAX_POINTS', '1000'))
+CHART_MAX_POINTS_LIMIT = 10000
+# Span of an interval=auto chart without a start
+AUTO_CHART_SPAN = 365 * 24 * 60 * 60
+
+# One append-only file per column; a bar is the same row of every column
+COLUMNS = (('ts', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'), ('volume', '<f8'))
+# Stored resolutions (bar size in seconds), finest first
+RESOLUTIONS = {'1m': 60, '1h': 60 * 60, '1d': 24 * 60 * 60}
+# Each stored resolution is rolled up into the next coarser one
+ROLLUPS = {'1m': '1h', '1h': '1d'}
+# numpy datetime unit naming a resolution's partition (None keeps one partition)
+PARTITION_UNITS = {'1m': 'M', '1h': 'Y', '1d': None}
+# Chart intervals, downsampled on read from the coarsest stored resolution that divides them
+CHART_INTERVALS = {
+    '1m': 60, '5m': 5 * 60, '15m': 15 * 60, '30m': 30 * 60,
+    '1h': 60 * 60, '4h': 4 * 60 * 60, '1d': 24 * 60 * 60, '1w': 7 * 24 * 60 * 60,
+}
+# Weeks start on Monday; the epoch was a Thursday
+WEEK_ORIGIN = 4 * 24 * 60 * 60
+
+SYMBOL_PATTERN = re.compile(r'^[A-Z0-9^][A-Z0-9.^=\-]{0,31}$')
+# 9999-12-31T23:59:59Z
+MAX_TIMESTAMP = 253402300799
+
+
+def normalize_symbol(symbol: str) -> str:
+    """Upper-cased symbol that is safe to use as a directory name"""
+    symbol = (symbol or '').strip().upper()
+    if not SYMBOL_PATTERN.match(symbol):
+        raise ValueError(f'Invalid symbol: {symbol!r}')
+    return symbol
+
+
+def empty_bars(columns: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+    return {name: np.empty(0, dtype) for name, dtype in COLUMNS if columns is None or name in columns}
+
+
+def slice_bars(bars: Dict[str, np.ndarray], start: int, stop: int) -> Dict[str, np.ndarray]:
+    return {name: column[start:stop] for name, column in bars.items()}
+
+
+def downsample(bars: Dict[str, np.ndarray], seconds: int, origin: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Aggregate time-ordered bars into buckets of ``seconds``
+
+    Args:
+        bars: Columns of COLUMNS, sorted by 'ts'
+        seconds: Bucket size
+        origin: Timestamp a bucket boundary falls on
+
+    Returns:
+        Columns with one bar per non-empty bucket, stamped with the bucket start
+    """
+    if not len(bars['ts']):
+        return empty_bars()
+    buckets = (bars['ts'] - origin) // seconds * seconds + origin
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.append(starts[1:], len(buckets)) - 1
+    return {
+        'ts': buckets[starts],
+        'open': bars['open'][starts],
+        'high': np.maximum.reduceat(bars['high'], starts),
+        'low': np.minimum.reduceat(bars['low'], starts),
+        'close': bars['close'][ends],
+        'volume': np.add.reduceat(bars['volume'], starts),
+    }
+
+
+def partition_keys(ts: np.ndarray, resolution: str) -> np.ndarray:
+    """Partition name of each timestamp ('2024-05' for 1m bars, '2024' for 1h bars)"""
+    unit = PARTITION_UNITS[resolution]
+    if unit is None:
+        return np.full(len(ts), 'all')
+    return np.datetime_as_string(ts.astype('datetime64[s]').astype(f'datetime64[{unit}]'))
+
+
+class PriceHistoryStore:
+    """
+    OHLCV bars on disk as append-only columnar files.
+
+    Layout: <root>/<SYMBOL>/<resolution>/<partition>/<column>.bin, where
+    each column file is a raw little-endian array read through np.memmap.
+    Bars are only ever appended in time order; a bar with the same
+    timestamp as the last stored one replaces it, so a still-forming bar
+    can be refreshed. Writes to a resolution are rolled up into the
+    coarser resolutions (1m -> 1h -> 1d).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def _resolution_dir(self, symbol: str, resolution: str) -> str:
+        return os.path.join(self.root, symbol, resolution)
+
+    def _partitions(self, symbol: str, resolution: str) -> List[str]:
+        try:
+            return sorted(os.listdir(self._resolution_dir(symbol, resolution)))
+        except FileNotFoundError:
+            return []
+
+    @contextlib.contextmanager
+    def _locked(self, symbol: str) -> Iterator[None]:
+        with self._locks_lock:
+            lock = self._locks.setdefault(symbol, threading.Lock())
+        with lock:
+            os.makedirs(os.path.join(self.root, symbol), exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.root, symbol, '.lock'), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_partition(path: str, columns: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        # A writer appends one column at a time, so only rows present in every column are complete
+        sizes = {
+            name: os.path.getsize(os.path.join(path, f'{name}.bin')) // np.dtype(dtype).itemsize
+            if os.path.exists(os.path.join(path, f'{name}.bin')) else 0
+            for name, dtype in COLUMNS
+        }
+        rows = min(sizes.values())
+        if not rows:
+            return empty_bars(columns)
+        return {
+            name: np.memmap(os.path.join(path, f'{name}.bin'), dtype=dtype, mode='r', shape=(rows,))
+            for name, dtype in COLUMNS if columns is None or name in columns
+        }
+
+    def _last_bar(self, symbol: str, resolution: str) -> Optional[Tuple[str, int, int]]:
+        """(partition, rows, timestamp) of the newest stored bar"""
+        for partition in reversed(self._partitions(symbol, resolution)):
+            bars = self._read_partition(os.path.join(self._resolution_dir(symbol, resolution), partition), ('ts',))
+            if len(bars['ts']):
+                return partition, len(bars['ts']), int(bars['ts'][-1])
+        return None
+
+    def last_timestamp(self, symbol: str, resolution: str) -> Optional[int]:
+        last = self._last_bar(normalize_symbol(symbol), resolution)
+        return last[2] if last is not None else None
+
+    def _append(self, symbol: str, resolution: str, bars: Dict[str, np.ndarray]) -> int:
+        directory = self._resolution_dir(symbol, resolution)
+        last = self._last_bar(symbol, resolution)
+        # Row each partition is written from; later partitions hold no complete rows yet
+        offsets: Dict[str, int] = {}
+        if last is not None:
+            partition, rows, last_ts = last
+            bars = slice_bars(bars, int(np.searchsorted(bars['ts'], last_ts)), len(bars['ts']))
+            if not len(bars['ts']):
+                return 0
+            # An update of the newest bar overwrites it. Files are written in place
+            # rather than truncated, which would fault readers mapping the old tail.
+            offsets[partition] = rows - 1 if bars['ts'][0] == last_ts else rows
+
+        keys = partition_keys(bars['ts'], resolution)
+        starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1, [len(keys)]))
+        for start, stop in zip(starts[:-1], starts[1:]):
+            key = str(keys[start])
+            path = os.path.join(directory, key)
+            os.makedirs(path, exist_ok=True)
+            for name, dtype in COLUMNS:
+                column = os.path.join(path, f'{name}.bin')
+                with open(column, 'r+b' if os.path.exists(column) else 'wb') as f:
+                    f.seek(offsets.get(key, 0) * np.dtype(dtype).itemsize)
+                    f.write(np.ascontiguousarray(bars[name][start:stop], dtype=dtype).tobytes())
+        return len(bars['ts'])
+
+    def write(self, symbol: str, resolution: str, bars: Dict[str, np.ndarray]) -> int:
+        """
+        Append time-ordered bars to a resolution and roll them up
+
+        Bars older than the newest stored one are ignored.
+
+        Args:
+            symbol: Stock symbol
+            resolution: A key of RESOLUTIONS
+            bars: Columns of COLUMNS, sorted by 'ts' without duplicates
+
+        Returns:
+            int: Bars written at ``resolution``
+        """
+        symbol = normalize_symbol(symbol)
+        with self._locked(symbol):
+            written = self._append(symbol, resolution, bars)
+            fine, since = resolution, int(bars['ts'][-written]) if written else 0
+            while written and fine in ROLLUPS:
+                coarse = ROLLUPS[fine]
+                # Rebuild the coarse buckets the new bars fall into; the first may replace a partial bar
+                begin = since // RESOLUTIONS[coarse] * RESOLUTIONS[coarse]
+                rolled = downsample(self._range(symbol, fine, begin, MAX_TIMESTAMP), RESOLUTIONS[coarse])
+                if not self._append(symbol, coarse, rolled):
+                    break
+                fine, since = coarse, begin
+        return written
+
+    def _range(self, symbol: str, resolution: str, start: int, end: int,
+               columns: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        if columns is not None:
+            columns = ('ts', *columns)
+        partitions = self._partitions(symbol, resolution)
+        if not partitions:
+            return empty_bars(columns)
+        first, last = partition_keys(np.clip([start, end], 0, MAX_TIMESTAMP), resolution)
+        parts = []
+        for partition in partitions:
+            if PARTITION_UNITS[resolution] is not None and not first <= partition <= last:
+                continue
+            bars = self._read_partition(os.path.join(self._resolution_dir(symbol, resolution), partition), columns)
+            lo, hi = np.searchsorted(bars['ts'], [start, end])
+            if hi > lo:
+                parts.append(slice_bars(bars, lo, hi))
+        if not parts:
+            return empty_bars(columns)
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    def range(self, symbol: str, resolution: str, start: int, end: int,
+              columns: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Read the stored bars of a resolution with start <= ts < end
+
+        Args:
+            columns: Columns to read besides 'ts' (default: all of COLUMNS)
+
+        Returns:
+            Columns as in-memory arrays
+        """
+        return self._range(normalize_symbol(symbol), resolution, start, end, columns)
+
+
+_stores: Dict[str, PriceHistoryStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_price_store(root: Optional[str] = None) -> PriceHistoryStore:
+    """The store under ``root`` (default: PRICE_HISTORY_PATH)"""
+    root = root or PRICE_HISTORY_PATH
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = PriceHistoryStore(root)
+        return store
+
+
+def history_bars(response: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    Bars of a get_stock_history response, sorted by time
+
+    Rows without a close are skipped; missing open/high/low fall back to the close.
+    """
+    body = response.get('body') if isinstance(response, dict) else None
+    rows = body.items() if isinstance(body, dict) else enumerate(body or [])
+    parsed = []
+    for key, row in rows:
+        if not isinstance(row, dict):
+            continue
+        ts = parse_number(row.get('date_utc', key))
+        close = parse_number(row.get('close'))
+        if ts is None or close is None:
+            continue
+        parsed.append((
+            int(ts),
+            *(parse_number(row.get(name)) or close for name in ('open', 'high', 'low')),
+            close,
+            parse_number(row.get('volume')) or 0.0,
+        ))
+    if not parsed:
+        return empty_bars()
+    parsed.sort(key=lambda bar: bar[0])
+    # A repeated timestamp keeps its last row
+    table = np.array(parsed, dtype=[(name, dtype) for name, dtype in COLUMNS])
+    keep = np.append(table['ts'][1:] != table['ts'][:-1], True)
+    return {name: np.ascontiguousarray(table[name][keep]) for name, _ in COLUMNS}
+
+
+def ingest_history(symbol: str, resolution: str = '1m', store: Optional[PriceHistoryStore] = None) -> int:
+    """
+    Fetch the latest bars of a symbol from RapidAPI and append the new ones
+
+    Args:
+        symbol: Stock symbol
+        resolution: A key of RESOLUTIONS
+        store: Target store (default: get_price_store())
+
+    Returns:
+        int: Bars written at ``resolution``
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f'resolution must be one of {", ".join(RESOLUTIONS)}')
+    symbol = normalize_symbol(symbol)
+    bars = history_bars(FinanceDataService.get_stock_history(symbol, resolution))
+    if not len(bars['ts']):
+        return 0
+    # Daily bars are stamped at the session open; align every bar to its bucket so rollups line up
+    bars = downsample(bars, RESOLUTIONS[resolution])
+    return (store or get_price_store()).write(symbol, resolution, bars)
+
+
+def parse_timestamp(value: Optional[str], name: str) -> Optional[int]:
+    """Unix seconds from an integer or an ISO 8601 date/datetime (UTC unless it has an offset)"""
+    if value in (None, ''):
+        return None
+    if re.fullmatch(r'-?\d+', value.strip()):
+        return int(value)
+    try:
+        moment = datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise ValueError(f'{name} must be unix seconds or an ISO 8601 date')
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def chart_source(interval: str) -> str:
+    """Coarsest stored resolution a chart interval can be built from"""
+    seconds = CHART_INTERVALS[interval]
+    return next(
+        resolution for resolution in reversed(list(RESOLUTIONS)) if seconds % RESOLUTIONS[resolution] == 0
+    )
+
+
+def price_chart(symbol: str, params, store: Optional[PriceHistoryStore] = None) -> Optional[Dict[str, Any]]:
+    """
+    Read chart bars for a symbol from the local store
+
+    Supported params:
+        interval: One of CHART_INTERVALS, or 'auto' (default) for the finest
+            interval that fits max_points bars between start and end
+        start, end: Unix seconds or ISO 8601 dates (default: the newest
+            max_points bars, or AUTO_CHART_SPAN for interval=auto)
+        max_points: Most bars returned, newest first kept (at most CHART_MAX_POINTS_LIMIT)
+
+    Args:
+        symbol: Stock symbol
+        params: Query parameters (a QueryDict or dict)
+        store: Source store (default: get_price_store())
+
+    Returns:
+        Dict with the bars as parallel 't', 'o', 'h', 'l', 'c', 'v' lists,
+        or None if nothing is stored for the symbol
+
+    Raises:
+        ValueError: If a parameter is invalid
+    """
+    store = store or get_price_store()
+    symbol = normalize_symbol(symbol)
+    interval = params.get('interval') or 'auto'
+    if interval != 'auto' and interval not in CHART_INTERVALS:
+        raise ValueError(f'interval must be auto or one of {", ".join(CHART_INTERVALS)}')
+    try:
+        max_points = int(params.get('max_points') or CHART_MAX_POINTS)
+    except ValueError:
+        max_points = 0
+    if not 1 <= max_points <= CHART_MAX_POINTS_LIMIT:
+        raise ValueError(f'max_points must be an integer between 1 and {CHART_MAX_POINTS_LIMIT}')
+
+    start = parse_timestamp(params.get('start'), 'start')
+    end = parse_timestamp(params.get('end'), 'end')
+    if end is None:
+        latest = [ts for ts in (store.last_timestamp(symbol, resolution) for resolution in RESOLUTIONS) if ts is not None]
+        if not latest:
+            return None
+        end = max(latest) + 1
+
+    if interval == 'auto':
+        if start is None:
+            start = end - AUTO_CHART_SPAN
+        interval = next(
+            (name for name, seconds in CHART_INTERVALS.items() if (end - start) / seconds <= max_points),
+            list(CHART_INTERVALS)[-1],
+        )
+    seconds = CHART_INTERVALS[interval]
+    if start is None:
+        start = end - seconds * max_points
+    if start >= end:
+        raise ValueError('start must be before end')
+
+    source = chart_source(interval)
+    # Widen the range to whole buckets so the first bar is not cut short
+    origin = WEEK_ORIGIN if interval == '1w' else 0
+    begin = (start - origin) // seconds * seconds + origin
+    bars = store.range(symbol, source, begin, end)
+    if seconds != RESOLUTIONS[source]:
+        bars = downsample(bars, seconds, origin)
+    bars = slice_bars(bars, max(len(bars['ts']) - max_points, 0), len(bars['ts']))
+    return {
+        'symbol': symbol,
+        'interval': interval,
+        'source': source,
+        'start': start,
+        'end': end,
+        'count': len(bars['ts']),
+        't': bars['ts'].tolist(),
+        'o': bars['open'].tolist(),
+        'h': bars['high'].tolist(),
+        'l': bars['low'].tolist(),
+        'c': bars['close'].tolist(),
+        'v': bars['volume'].tolist(),
+    }
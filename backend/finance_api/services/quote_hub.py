@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from .async_finance_data_service import AsyncFinanceDataService
+
+logger = logging.getLogger(__name__)
+
+# Quote streaming configuration
+# Seconds between polls of each watched symbol
+QUOTE_STREAM_INTERVAL = float(os.environ.get('FINANCE_QUOTE_STREAM_INTERVAL', '5'))
+# Symbols a single stream may watch
+QUOTE_STREAM_MAX_SYMBOLS = int(os.environ.get('FINANCE_QUOTE_STREAM_MAX_SYMBOLS', '20'))
+# Seconds of silence after which a keep-alive comment is sent to streams
+QUOTE_STREAM_HEARTBEAT = float(os.environ.get('FINANCE_QUOTE_STREAM_HEARTBEAT', '15'))
+# Events buffered per subscriber before the oldest are dropped
+QUOTE_STREAM_QUEUE_SIZE = 100
+
+
+def quote_fields(response: Any) -> Dict[str, Any]:
+    """The quote fields of a get_stock_quote() response"""
+    data = response.get('data') if isinstance(response, dict) else None
+    return data if isinstance(data, dict) else {}
+
+
+def quote_staleness(response: Any) -> Optional[str]:
+    """Why a get_stock_quote() response is served past its TTL (see mark_stale), or None if it is fresh"""
+    stale = response.get('stale') if isinstance(response, dict) else None
+    return stale.get('reason') if isinstance(stale, dict) else None
+
+
+class Subscription:
+    """A subscriber's queue of quote events for a set of symbols"""
+
+    def __init__(self, symbols: List[str]):
+        self.symbols = symbols
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUOTE_STREAM_QUEUE_SIZE)
+
+    def push(self, event: Dict[str, Any]) -> None:
+        """Queue an event, dropping the oldest one if the subscriber is not keeping up"""
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self) -> Dict[str, Any]:
+        return await self.queue.get()
+
+
+class QuoteHub:
+    """
+    Fan quote updates out to every subscriber of a symbol.
+
+    One poller task per watched symbol fetches the quote through
+    AsyncFinanceDataService, which also shares the response cache with the
+    request/response endpoints; polls accept cached quotes up to half an
+    interval old, so each poll sees a new quote even though the quote TTL
+    is longer than the interval. Subscribers first get a 'snapshot' event
+    with every field and then 'quote' events with only the fields that
+    changed. Every event carries 'stale': the reason the quote is served
+    from an expired cache entry, or None. A symbol's poller stops when its
+    last subscriber leaves, so upstream calls grow with distinct symbols,
+    not with connections.
+
+    asyncio objects are bound to one event loop; use get_quote_hub().
+    """
+
+    def __init__(self, interval: float = QUOTE_STREAM_INTERVAL, language: str = 'en'):
+        self.interval = interval
+        self.language = language
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._stale: Dict[str, Optional[str]] = {}
+        self.polls = 0
+        self.events = 0
+
+    def subscribe(self, symbols: Iterable[str]) -> Subscription:
+        """
+        Start receiving events for the given symbols
+
+        Args:
+            symbols: Stock symbols (tickers)
+
+        Returns:
+            Subscription whose get() yields {'type', 'symbol', 'fields', 'stale'} events
+        """
+        normalized = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol.strip()))
+        subscription = Subscription(normalized)
+        for symbol in normalized:
+            self._subscribers.setdefault(symbol, set()).add(subscription)
+            if symbol in self._latest:
+                subscription.push({
+                    'type': 'snapshot', 'symbol': symbol, 'fields': self._latest[symbol], 'stale': self._stale.get(symbol),
+                })
+            if symbol not in self._pollers:
+                self._pollers[symbol] = asyncio.get_running_loop().create_task(self._poll(symbol))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop a subscription, and the pollers nobody else is watching"""
+        for symbol in subscription.symbols:
+            subscribers = self._subscribers.get(symbol)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[symbol]
+                self._latest.pop(symbol, None)
+                self._stale.pop(symbol, None)
+                poller = self._pollers.pop(symbol, None)
+                if poller is not None:
+                    poller.cancel()
+
+    def _publish(self, symbol: str, event: Dict[str, Any]) -> None:
+        for subscription in self._subscribers.get(symbol, ()):
+            subscription.push(event)
+            self.events += 1
+
+    async def _poll(self, symbol: str) -> None:
+        failing = False
+        while True:
+            try:
+                response = await AsyncFinanceDataService.get_stock_quote(
+                    symbol, self.language, max_age=self.interval / 2
+                )
+                self.polls += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Report an outage once, not on every poll
+                if not failing:
+                    logger.warning(f"Quote stream poll for {symbol} failed: {e}")
+                    self._publish(symbol, {'type': 'error', 'symbol': symbol, 'fields': {'error': str(e)}, 'stale': None})
+                failing = True
+                await asyncio.sleep(self.interval)
+                continue
+
+            failing = False
+            fields, stale = quote_fields(response), quote_staleness(response)
+            previous, was_stale = self._latest.get(symbol), self._stale.get(symbol)
+            self._latest[symbol], self._stale[symbol] = fields, stale
+            if previous is None:
+                self._publish(symbol, {'type': 'snapshot', 'symbol': symbol, 'fields': fields, 'stale': stale})
+            else:
+                changed = {name: value for name, value in fields.items() if previous.get(name) != value}
+                # A quote turning stale (or fresh again) is news even when no field changed
+                if changed or stale != was_stale:
+                    self._publish(symbol, {'type': 'quote', 'symbol': symbol, 'fields': changed, 'stale': stale})
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'symbols': len(self._pollers),
+            'subscriptions': len({sub for subs in self._subscribers.values() for sub in subs}),
+            'polls': self.polls,
+            'events': self.events,
+        }
+
+
+_hubs: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, QuoteHub]' = weakref.WeakKeyDictionary()
+
+
+def get_quote_hub() -> QuoteHub:
+    """Get the quote hub of the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = QuoteHub()
+    return hub
@@ -0,0 +1,259 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+# Shortest sleep while a higher-priority request is waiting for the same host
+_YIELD_INTERVAL = 0.01
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when an upstream request is shed by the rate limiter
+
+    Attributes:
+        host: Upstream host the request was addressed to
+        endpoint: Service method that made the request
+        retry_after: Seconds until the request could be admitted, if known
+    """
+
+    def __init__(self, message: str, host: str, endpoint: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.host = host
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def time_until(self, tokens: float) -> float:
+        """Seconds until the bucket holds ``tokens`` (call refill() first)"""
+        if self.tokens >= tokens:
+            return 0.0
+        if tokens > self.capacity or self.rate <= 0:
+            return float('inf')
+        return (tokens - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter for upstream hosts and their endpoints.
+
+    Every request takes one token from its host's bucket and, if the
+    endpoint has its own limit, one from the endpoint's bucket. Requests
+    carry a priority lane (0 is most urgent):
+
+    - Lower-priority requests never take host tokens while a more urgent
+      request is waiting for that host.
+    - Lane ``n`` may not drain the host bucket below ``lane_reserves[n]``
+      of its capacity. This leaves headroom for more urgent lanes.
+
+    Requests wait for tokens up to their deadline and are shed with
+    RateLimitExceeded when they cannot be admitted in time or when the
+    host's daily quota is spent. Buckets are per process.
+    """
+
+    def __init__(
+        self,
+        host_limits: Dict[str, Tuple[float, float]],
+        endpoint_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        daily_quotas: Optional[Dict[str, int]] = None,
+        lane_reserves: Optional[Dict[int, float]] = None,
+    ):
+        """
+        Args:
+            host_limits: host -> (requests per second, burst)
+            endpoint_limits: endpoint -> (requests per second, burst); endpoints
+                without an entry are only limited by their host
+            daily_quotas: host -> requests per UTC day (0 or missing is unlimited)
+            lane_reserves: priority -> fraction of the host burst kept free for
+                more urgent lanes
+        """
+        self.host_limits = host_limits
+        self.endpoint_limits = endpoint_limits or {}
+        self.daily_quotas = daily_quotas or {}
+        self.lane_reserves = lane_reserves or {}
+        self._buckets: Dict[Any, TokenBucket] = {}
+        # host -> {priority: number of requests waiting for host tokens}
+        self._waiting: Dict[str, Dict[int, int]] = {}
+        # host -> (UTC date, requests admitted that day)
+        self._quota_usage: Dict[str, Tuple[str, int]] = {}
+        # (host, endpoint) -> counters
+        self._counters: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._cond = threading.Condition()
+
+    def _bucket(self, key, limit: Optional[Tuple[float, float]]) -> Optional[TokenBucket]:
+        if limit is None:
+            return None
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*limit)
+        return bucket
+
+    def _count(self, host: str, endpoint: str, counter: str, amount: float = 1) -> None:
+        counters = self._counters.setdefault(
+            (host, endpoint), {'admitted': 0, 'waited': 0, 'wait_seconds': 0.0, 'shed': 0, 'quota_exhausted': 0}
+        )
+        counters[counter] += amount
+
+    def _quota_used(self, host: str) -> int:
+        today = datetime.now(timezone.utc).date().isoformat()
+        day, used = self._quota_usage.get(host, (today, 0))
+        return used if day == today else 0
+
+    def _try_acquire(self, host: str, endpoint: str, priority: int) -> Tuple[float, bool]:
+        """
+        Take tokens if the request can be admitted now (call with the lock held)
+
+        Returns:
+            Tuple of (seconds to wait, 0 if admitted; whether the host bucket is the bottleneck)
+        """
+        quota = self.daily_quotas.get(host, 0)
+        if quota and self._quota_used(host) >= quota:
+            self._count(host, endpoint, 'quota_exhausted')
+            raise RateLimitExceeded(f'Daily request quota for {host} is exhausted', host, endpoint)
+
+        now = time.monotonic()
+        host_bucket = self._bucket(host, self.host_limits.get(host))
+        endpoint_bucket = self._bucket((host, endpoint), self.endpoint_limits.get(endpoint))
+
+        host_wait = 0.0
+        if host_bucket is not None:
+            host_bucket.refill(now)
+            host_wait = host_bucket.time_until(1 + self.lane_reserves.get(priority, 0.0) * host_bucket.capacity)
+            waiting = self._waiting.get(host, {})
+            if any(count and lane < priority for lane, count in waiting.items()):
+                # A more urgent request goes first
+                host_wait = max(host_wait, _YIELD_INTERVAL)
+
+        endpoint_wait = 0.0
+        if endpoint_bucket is not None:
+            endpoint_bucket.refill(now)
+            endpoint_wait = endpoint_bucket.time_until(1)
+
+        wait = max(host_wait, endpoint_wait)
+        if wait > 0:
+            return wait, host_wait > 0
+
+        if host_bucket is not None:
+            host_bucket.tokens -= 1
+        if endpoint_bucket is not None:
+            endpoint_bucket.tokens -= 1
+        if quota:
+            today = datetime.now(timezone.utc).date().isoformat()
+            self._quota_usage[host] = (today, self._quota_used(host) + 1)
+        return 0.0, False
+
+    def _set_waiting(self, host: str, priority: int, waiting: bool, was_waiting: bool) -> None:
+        if waiting == was_waiting:
+            return
+        lanes = self._waiting.setdefault(host, {})
+        lanes[priority] = lanes.get(priority, 0) + (1 if waiting else -1)
+        if not waiting:
+            # Less urgent requests may now be admissible
+            self._cond.notify_all()
+
+    def _finish(self, host: str, endpoint: str, started: float, admitted: bool, retry_after: Optional[float]) -> None:
+        waited = time.monotonic() - started
+        if admitted:
+            self._count(host, endpoint, 'admitted')
+            if waited > 0.001:
+                self._count(host, endpoint, 'waited')
+                self._count(host, endpoint, 'wait_seconds', waited)
+            return
+        self._count(host, endpoint, 'shed')
+        raise RateLimitExceeded(
+            f'Rate limit for {host} ({endpoint}) exceeded', host, endpoint,
+            retry_after=None if retry_after == float('inf') else retry_after,
+        )
+
+    def acquire(self, host: str, endpoint: str, priority: int = 0, timeout: float = 0.0) -> None:
+        """
+        Block until the request is admitted or its deadline passes
+
+        Args:
+            host: Upstream host
+            endpoint: Service method making the request
+            priority: Lane of the request (0 is most urgent)
+            timeout: Longest time to wait for tokens, in seconds
+
+        Raises:
+            RateLimitExceeded: If the request cannot be admitted before the deadline
+        """
+        started = time.monotonic()
+        deadline = started + timeout
+        blocked_on_host = False
+        with self._cond:
+            try:
+                while True:
+                    wait, host_bound = self._try_acquire(host, endpoint, priority)
+                    if wait == 0:
+                        return self._finish(host, endpoint, started, True, None)
+                    if time.monotonic() + wait > deadline:
+                        return self._finish(host, endpoint, started, False, wait)
+                    self._set_waiting(host, priority, host_bound, blocked_on_host)
+                    blocked_on_host = host_bound
+                    self._cond.wait(wait)
+            finally:
+                self._set_waiting(host, priority, False, blocked_on_host)
+
+    async def aacquire(self, host: str, endpoint: str, priority: int = 0, timeout: float = 0.0) -> None:
+        """Async variant of acquire() that sleeps on the event loop instead of blocking"""
+        started = time.monotonic()
+        deadline = started + timeout
+        blocked_on_host = False
+        try:
+            while True:
+                with self._cond:
+                    wait, host_bound = self._try_acquire(host, endpoint, priority)
+                    if wait == 0:
+                        return self._finish(host, endpoint, started, True, None)
+                    if time.monotonic() + wait > deadline:
+                        return self._finish(host, endpoint, started, False, wait)
+                    self._set_waiting(host, priority, host_bound, blocked_on_host)
+                    blocked_on_host = host_bound
+                await asyncio.sleep(wait)
+        finally:
+            with self._cond:
+                self._set_waiting(host, priority, False, blocked_on_host)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current limits, bucket levels, daily quota usage and admission counters per host"""
+        with self._cond:
+            now = time.monotonic()
+            hosts: Dict[str, Any] = {}
+            for host, (rate, burst) in self.host_limits.items():
+                bucket = self._buckets.get(host)
+                if bucket is not None:
+                    bucket.refill(now)
+                quota = self.daily_quotas.get(host, 0)
+                hosts[host] = {
+                    'rate_per_second': rate,
+                    'burst': burst,
+                    'tokens': round(bucket.tokens, 3) if bucket is not None else burst,
+                    'daily_quota': quota or None,
+                    'daily_quota_used': self._quota_used(host),
+                    'waiting': sum(self._waiting.get(host, {}).values()),
+                    'endpoints': {},
+                }
+            for (host, endpoint), counters in self._counters.items():
+                host_stats = hosts.setdefault(host, {'endpoints': {}})
+                endpoint_stats = dict(counters)
+                endpoint_stats['wait_seconds'] = round(endpoint_stats['wait_seconds'], 3)
+                if endpoint in self.endpoint_limits:
+                    endpoint_stats['rate_per_second'], endpoint_stats['burst'] = self.endpoint_limits[endpoint]
+                host_stats['endpoints'][endpoint] = endpoint_stats
+            return hosts
@@ -0,0 +1,267 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+CACHE_MAX_ENTRIES = int(os.environ.get('FINANCE_CACHE_MAX_ENTRIES', '2048'))
+# Alias from Django's CACHES used as the shared tier; empty disables it
+CACHE_SHARED_ALIAS = os.environ.get('FINANCE_CACHE_SHARED_ALIAS', '')
+CACHE_KEY_PREFIX = 'finance'
+# Seconds entries are kept past their TTL as a fallback while the upstream API is down
+CACHE_STALE_TTL = int(os.environ.get('FINANCE_CACHE_STALE_TTL', str(24 * 60 * 60)))
+
+# Parameters whose values are ticker symbols and therefore case-insensitive
+SYMBOL_PARAMS = ('symbol', 'symbols', 'ticker', 'tickers')
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded, thread-safe in-process cache with per-entry expiry"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any, float]:
+        """
+        Look up a live entry and mark it as most recently used
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Tuple of (found, value, expires_at)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None, 0.0
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return False, None, 0.0
+            self._entries.move_to_end(key)
+            return True, value, expires_at
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        """Store a value until the given epoch timestamp, evicting the LRU entry if full"""
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ResponseCache:
+    """
+    Two-tier cache for upstream market-data responses.
+
+    Lookups hit the bounded in-process LRU first and then, when configured,
+    the shared Django cache named by ``shared_alias``. Expired entries are
+    retained for ``stale_ttl`` seconds and returned as stale. Hits, stale
+    hits and misses are counted per service method.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        shared_alias: str = CACHE_SHARED_ALIAS,
+        stale_ttl: float = CACHE_STALE_TTL,
+    ):
+        self.local = LRUCache(max_entries)
+        self.shared_alias = shared_alias
+        self.stale_ttl = stale_ttl
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._counters_lock = threading.Lock()
+
+    @staticmethod
+    def normalize_params(params: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Normalize query parameters so equivalent requests share a cache key"""
+        normalized = {}
+        for name, value in (params or {}).items():
+            if value is None:
+                continue
+            value = str(value).strip()
+            if name in SYMBOL_PARAMS:
+                value = value.upper()
+            elif name == 'language':
+                value = value.lower()
+            normalized[name] = value
+        return normalized
+
+    @classmethod
+    def make_key(cls, method: str, url: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Build the cache key for a service call
+
+        Args:
+            method: Name of the FinanceDataService method
+            url: Endpoint URL (covers path parameters such as the ticker)
+            params: Query string parameters
+
+        Returns:
+            A key that is safe to use with any Django cache backend
+        """
+        payload = json.dumps([url, cls.normalize_params(params)], sort_keys=True)
+        digest = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+        return f"{CACHE_KEY_PREFIX}:{method}:{digest}"
+
+    def _shared_cache(self):
+        if not self.shared_alias:
+            return None
+        try:
+            from django.core.cache import caches
+            return caches[self.shared_alias]
+        except Exception as e:
+            logger.warning(f"Shared finance cache '{self.shared_alias}' unavailable: {e}")
+            return None
+
+    def _count(self, method: str, outcome: str) -> None:
+        with self._counters_lock:
+            counters = self._counters.setdefault(method, {'hits': 0, 'shared_hits': 0, 'stale_hits': 0, 'misses': 0})
+            counters[outcome] += 1
+
+    def _resolve(self, method: str, key: str, local: Tuple[bool, Any, float], entry: Any) -> Tuple[bool, Any, float]:
+        """Pick the fresher of the local entry and a shared-tier entry, promoting the latter"""
+        found, value, fresh_until = local
+        if entry is not _MISSING:
+            shared_fresh_until, shared_value = entry
+            if shared_fresh_until > fresh_until and shared_fresh_until + self.stale_ttl > time.time():
+                self.local.set(key, entry, shared_fresh_until + self.stale_ttl)
+                found, value, fresh_until = True, shared_value, shared_fresh_until
+                if fresh_until > time.time():
+                    self._count(method, 'shared_hits')
+                    return found, value, fresh_until
+        self._count(method, 'stale_hits' if found else 'misses')
+        return found, value, fresh_until
+
+    def _get_local(self, key: str) -> Tuple[bool, Any, float]:
+        found, entry, _ = self.local.get(key)
+        if not found:
+            return False, None, 0.0
+        fresh_until, value = entry
+        return True, value, fresh_until
+
+    def get(self, method: str, key: str) -> Tuple[bool, Any, float]:
+        """
+        Look up a cached response, trying the local tier before the shared one
+
+        Entries outlive their TTL by ``stale_ttl`` seconds so callers can fall
+        back to them while the upstream API is unavailable; check the returned
+        freshness deadline before treating a value as current.
+
+        Returns:
+            Tuple of (found, value, fresh_until epoch timestamp). Cached values
+            are shared between callers and must be treated as read-only.
+        """
+        local = self._get_local(key)
+        if local[0] and local[2] > time.time():
+            self._count(method, 'hits')
+            return local
+
+        entry = _MISSING
+        shared = self._shared_cache()
+        if shared is not None:
+            try:
+                entry = shared.get(key, _MISSING)
+            except Exception as e:
+                logger.warning(f"Shared finance cache lookup failed: {e}")
+        return self._resolve(method, key, local, entry)
+
+    async def aget(self, method: str, key: str) -> Tuple[bool, Any, float]:
+        """Async variant of get() that awaits the shared tier instead of blocking"""
+        local = self._get_local(key)
+        if local[0] and local[2] > time.time():
+            self._count(method, 'hits')
+            return local
+
+        entry = _MISSING
+        shared = self._shared_cache()
+        if shared is not None:
+            try:
+                entry = await shared.aget(key, _MISSING)
+            except Exception as e:
+                logger.warning(f"Shared finance cache lookup failed: {e}")
+        return self._resolve(method, key, local, entry)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store a response in both tiers, fresh for ``ttl`` seconds and kept for ``stale_ttl`` more"""
+        if ttl <= 0:
+            return
+        fresh_until = time.time() + ttl
+        self.local.set(key, (fresh_until, value), fresh_until + self.stale_ttl)
+
+        shared = self._shared_cache()
+        if shared is not None:
+            try:
+                shared.set(key, (fresh_until, value), timeout=ttl + self.stale_ttl)
+            except Exception as e:
+                logger.warning(f"Shared finance cache store failed: {e}")
+
+    async def aset(self, key: str, value: Any, ttl: float) -> None:
+        """Async variant of set()"""
+        if ttl <= 0:
+            return
+        fresh_until = time.time() + ttl
+        self.local.set(key, (fresh_until, value), fresh_until + self.stale_ttl)
+
+        shared = self._shared_cache()
+        if shared is not None:
+            try:
+                await shared.aset(key, (fresh_until, value), timeout=ttl + self.stale_ttl)
+            except Exception as e:
+                logger.warning(f"Shared finance cache store failed: {e}")
+
+    def clear(self) -> None:
+        """Drop the local tier and reset the counters"""
+        self.local.clear()
+        with self._counters_lock:
+            self._counters.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss counters, overall and per service method
+
+        Returns:
+            Dict with totals, fresh hit ratio, local tier size and per-method counters
+        """
+        with self._counters_lock:
+            methods = {method: dict(counters) for method, counters in self._counters.items()}
+
+        hits = sum(c['hits'] + c['shared_hits'] for c in methods.values())
+        stale_hits = sum(c['stale_hits'] for c in methods.values())
+        misses = sum(c['misses'] for c in methods.values())
+        lookups = hits + stale_hits + misses
+        return {
+            'hits': hits,
+            'stale_hits': stale_hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'local_entries': len(self.local),
+            'shared_alias': self.shared_alias or None,
+            'methods': methods,
+        }
+
+
+# Process-wide cache used by FinanceDataService
+response_cache = ResponseCache()
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from .response_cache import LRUCache
+
+# Retirement simulation configuration
+RETIREMENT_DEFAULT_PATHS = 10000
+RETIREMENT_MAX_PATHS = 100000
+# Paths a web request may ask for; larger runs go through the run_retirement_projection command
+RETIREMENT_API_MAX_PATHS = int(os.environ.get('FINANCE_RETIREMENT_API_MAX_PATHS', '20000'))
+# Paths per shard; results depend on the seed and the shard size, never on the worker count
+RETIREMENT_SHARD_PATHS = 10000
+# Processes the run_retirement_projection command spreads shards over. Web
+# requests always simulate in their own thread, so no web worker starts a pool.
+RETIREMENT_WORKERS = int(os.environ.get('FINANCE_RETIREMENT_WORKERS', str(os.cpu_count() or 1)))
+# Smaller runs finish before a worker process would receive its shard
+RETIREMENT_PARALLEL_MIN_PATHS = int(os.environ.get('FINANCE_RETIREMENT_PARALLEL_MIN_PATHS', '50000'))
+RETIREMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FINANCE_RETIREMENT_CACHE_MAX_ENTRIES', '256'))
+RETIREMENT_CACHE_TTL = 24 * 60 * 60
+RETIREMENT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Plan field -> (default, minimum, maximum); a None default makes the field required.
+# Money is in today's dollars per year, rates are annual fractions.
+PLAN_FIELDS = {
+    'current_age': (None, 0, 100),
+    'retirement_age': (None, 0, 110),
+    'end_age': (95, 1, 120),
+    'current_savings': (0.0, 0, 1e12),
+    'annual_contribution': (0.0, 0, 1e10),
+    'contribution_growth': (0.0, -0.5, 0.5),
+    'annual_withdrawal': (0.0, 0, 1e10),
+    'expected_return': (0.06, -0.5, 1.0),
+    'volatility': (0.15, 0, 2.0),
+    'inflation': (0.025, -0.1, 0.5),
+}
+
+# Hash of the plan, paths and seed -> projection; runs are deterministic
+_projections = LRUCache(RETIREMENT_CACHE_MAX_ENTRIES)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def parse_plan(data: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Validate a retirement plan and fill in defaults
+
+    Args:
+        data: Plan fields (see PLAN_FIELDS)
+
+    Returns:
+        Dict with every field of PLAN_FIELDS as a float
+
+    Raises:
+        ValueError: If a field is missing, not a number or out of range
+    """
+    if not isinstance(data, dict):
+        raise ValueError('The retirement plan must be an object')
+    plan = {}
+    for name, (default, minimum, maximum) in PLAN_FIELDS.items():
+        value = data.get(name, default)
+        if value is None:
+            raise ValueError(f'{name} is required')
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'{name} must be a number')
+        if not minimum <= value <= maximum:
+            raise ValueError(f'{name} must be between {minimum:g} and {maximum:g}')
+        plan[name] = value
+    if not plan['current_age'] <= plan['retirement_age'] < plan['end_age']:
+        raise ValueError('Ages must satisfy current_age <= retirement_age < end_age')
+    return plan
+
+
+def simulate_shard(plan: Dict[str, float], seed: np.random.SeedSequence, paths: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Simulate ``paths`` yearly balance paths of a plan
+
+    Each year starts with that year's contribution (while working) or
+    withdrawal (once retired), both growing from today's amounts, and then
+    earns a lognormal return with the plan's arithmetic mean and volatility.
+    A path that runs out of money stays at zero.
+
+    Args:
+        plan: Plan as returned by parse_plan()
+        seed: Independent seed of this shard
+        paths: Number of paths
+
+    Returns:
+        Tuple of (nominal balances of shape (years + 1, paths), year each
+        path ran out of money or -1)
+    """
+    rng = np.random.default_rng(seed)
+    years = int(math.ceil(plan['end_age'] - plan['current_age']))
+    working_years = int(math.ceil(plan['retirement_age'] - plan['current_age']))
+
+    mean, volatility = plan['expected_return'], plan['volatility']
+    log_variance = math.log1p(volatility ** 2 / (1 + mean) ** 2)
+    log_mean, log_deviation = math.log1p(mean) - log_variance / 2, math.sqrt(log_variance)
+
+    year = np.arange(years)
+    contributions = np.where(year < working_years, plan['annual_contribution'] * (1 + plan['contribution_growth']) ** year, 0.0)
+    withdrawals = np.where(year >= working_years, plan['annual_withdrawal'] * (1 + plan['inflation']) ** year, 0.0)
+
+    balances = np.empty((years + 1, paths))
+    balances[0] = plan['current_savings']
+    depleted = np.full(paths, -1, dtype=np.int32)
+    for t in range(years):
+        # Drawn a year at a time so only the balances are held for every year
+        growth = np.exp(rng.normal(log_mean, log_deviation, paths))
+        balance = (balances[t] + contributions[t] - withdrawals[t]) * growth
+        if withdrawals[t]:
+            depleted[(balance <= 0) & (depleted < 0)] = t
+        np.maximum(balance, 0.0, out=balances[t + 1])
+    return balances, depleted
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool, started on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Forking a threaded server process can deadlock the children
+                _pool = ProcessPoolExecutor(
+                    max_workers=RETIREMENT_WORKERS, mp_context=multiprocessing.get_context('spawn')
+                )
+    return _pool
+
+
+def run_simulation(plan: Dict[str, float], paths: int = RETIREMENT_DEFAULT_PATHS, seed: int = 0,
+                   workers: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Simulate a plan, optionally sharding the paths over the process pool
+
+    Shards get independent streams from SeedSequence(seed).spawn(), so the
+    result is the same whether they run in this process or in the pool.
+
+    Args:
+        plan: Plan as returned by parse_plan()
+        paths: Number of paths
+        seed: Root seed
+        workers: Processes to use; 1 (the default) simulates every shard in
+            the calling thread and never starts the pool
+
+    Returns:
+        Tuple of (nominal balances of shape (years + 1, paths), year each path ran out or -1)
+    """
+    shards = math.ceil(paths / RETIREMENT_SHARD_PATHS)
+    seeds = np.random.SeedSequence(seed).spawn(shards)
+    sizes = [min(RETIREMENT_SHARD_PATHS, paths - i * RETIREMENT_SHARD_PATHS) for i in range(shards)]
+
+    if workers > 1 and shards > 1:
+        results = list(get_process_pool().map(simulate_shard, [plan] * shards, seeds, sizes))
+    else:
+        results = [simulate_shard(plan, shard_seed, size) for shard_seed, size in zip(seeds, sizes)]
+    return np.concatenate([r[0] for r in results], axis=1), np.concatenate([r[1] for r in results])
+
+
+def sorted_percentiles(values: np.ndarray, percentiles=RETIREMENT_PERCENTILES) -> np.ndarray:
+    """
+    Linearly interpolated percentiles (as np.percentile) of rows sorted along the last axis
+
+    One sort of a (years, paths) matrix is several times faster than np.percentile's
+    per-row selection, and the same sorted rows serve every band.
+    """
+    last = values.shape[-1] - 1
+    position = np.asarray(percentiles, dtype=float) / 100 * last
+    lower = np.floor(position).astype(int)
+    upper = np.minimum(lower + 1, last)
+    fraction = position - lower
+    return values[..., lower] + (values[..., upper] - values[..., lower]) * fraction
+
+
+def project_retirement(plan: Dict[str, float], paths: int = RETIREMENT_DEFAULT_PATHS, seed: int = 0,
+                       workers: int = 1, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Monte Carlo projection of a retirement plan
+
+    Args:
+        plan: Plan as returned by parse_plan()
+        paths: Number of paths (at most RETIREMENT_MAX_PATHS)
+        seed: Root seed; the same plan, paths and seed give the same projection
+        workers: See run_simulation()
+        use_cache: Whether to read and populate the projection cache
+
+    Returns:
+        Dict with the success probability (no path year runs out of money),
+        percentile bands of the balance per age in today's dollars, and the
+        distribution of the balance at retirement and of the depletion age
+    """
+    if not 1 <= paths <= RETIREMENT_MAX_PATHS:
+        raise ValueError(f'paths must be between 1 and {RETIREMENT_MAX_PATHS}')
+    key = hashlib.sha1(json.dumps([plan, paths, seed], sort_keys=True).encode()).hexdigest()
+    if use_cache:
+        found, projection, _ = _projections.get(key)
+        if found:
+            return projection
+
+    started = time.perf_counter()
+    balances, depleted = run_simulation(plan, paths, seed, workers)
+    elapsed = time.perf_counter() - started
+
+    ages = plan['current_age'] + np.arange(balances.shape[0])
+    # Today's dollars, in place to avoid another (years + 1, paths) array
+    balances /= (1 + plan['inflation']) ** np.arange(balances.shape[0])[:, None]
+    balances.sort(axis=1)
+    # Shape (years + 1, percentiles)
+    bands = sorted_percentiles(balances)
+    retirement_year = int(math.ceil(plan['retirement_age'] - plan['current_age']))
+    at_retirement = bands[retirement_year]
+    failed = depleted[depleted >= 0]
+    # A path depleted in year t has nothing left at the end of it
+    depletion_ages = np.percentile(plan['current_age'] + failed + 1, RETIREMENT_PERCENTILES) if len(failed) else None
+
+    projection = {
+        'plan': plan,
+        'paths': paths,
+        'seed': seed,
+        'success_probability': round(float(np.mean(depleted < 0)), 4),
+        'ages': ages.tolist(),
+        'percentiles': {
+            str(q): np.round(band, 2).tolist() for q, band in zip(RETIREMENT_PERCENTILES, bands.T)
+        },
+        'balance_at_retirement': {
+            str(q): round(float(value), 2) for q, value in zip(RETIREMENT_PERCENTILES, at_retirement)
+        },
+        'depletion_age': {
+            str(q): float(value) for q, value in zip(RETIREMENT_PERCENTILES, depletion_ages)
+        } if depletion_ages is not None else None,
+        'paths_per_second': round(paths / elapsed) if elapsed else None,
+    }
+    if use_cache:
+        _projections.set(key, projection, time.time() + RETIREMENT_CACHE_TTL)
+    return projection
+
+
+def summarize_projection(projection: Dict[str, Any]) -> str:
+    """One-paragraph description of a projection for an LLM prompt"""
+    plan = projection['plan']
+    at_retirement = projection['balance_at_retirement']
+    final = {q: band[-1] for q, band in projection['percentiles'].items()}
+    summary = (
+        f"Monte Carlo projection over {projection['paths']} paths (today's dollars): "
+        f"{projection['success_probability']:.0%} chance the savings last to age {plan['end_age']:g}. "
+        f"Balance at retirement (age {plan['retirement_age']:g}): median {at_retirement['50']:,.0f}, "
+        f"5th percentile {at_retirement['5']:,.0f}, 95th percentile {at_retirement['95']:,.0f}. "
+        f"Balance at age {plan['end_age']:g}: median {final['50']:,.0f}, 5th percentile {final['5']:,.0f}."
+    )
+    if projection['depletion_age'] is not None:
+        summary += f" Paths that run out do so at a median age of {projection['depletion_age']['50']:g}."
+    return summary
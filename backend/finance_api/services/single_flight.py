@@ -0,0 +1,137 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _Call:
+    """An in-flight call that followers wait on"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight block until it finishes and receive the same result, or the
+    same exception. The key is released as soon as the call completes, so
+    later callers trigger a fresh execution.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        Run ``func`` once for all concurrent callers sharing ``key``
+
+        Args:
+            key: Identity of the call (e.g. endpoint and normalized params)
+            func: Zero-argument callable performing the actual work
+
+        Returns:
+            The result of ``func``, shared between all waiting callers
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        """Number of keys currently being fetched"""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls),
+            }
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight.
+
+    The first caller starts the work as its own task and every caller, the
+    first one included, awaits it through asyncio.shield; cancelling any
+    caller (e.g. a disconnected client) leaves the shared call running for
+    the others. Calls are keyed per event loop so tasks never cross loops.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Tuple[int, str], 'asyncio.Task[Any]'] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await ``func()`` once for all concurrent callers sharing ``key``
+
+        Args:
+            key: Identity of the call (e.g. endpoint and normalized params)
+            func: Zero-argument coroutine function performing the actual work
+
+        Returns:
+            The result of ``func()``, shared between all waiting callers
+        """
+        loop = asyncio.get_running_loop()
+        call_key = (id(loop), key)
+
+        task = self._calls.get(call_key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = loop.create_task(func())
+            self._calls[call_key] = task
+            self.executed += 1
+            task.add_done_callback(lambda done: self._release(call_key, done))
+        return await asyncio.shield(task)
+
+    def _release(self, call_key: Tuple[int, str], task: 'asyncio.Task[Any]') -> None:
+        if self._calls.get(call_key) is task:
+            del self._calls[call_key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every caller was cancelled
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._calls),
+        }
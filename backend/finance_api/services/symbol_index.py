@@ -0,0 +1,325 @@
+import bisect
+import gzip
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .rate_limiter import RateLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+# Symbol index configuration
+SYMBOL_INDEX_PATH = os.environ.get(
+    'FINANCE_SYMBOL_INDEX_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'symbol_index.json.gz'),
+)
+# Ticker types crawled by build_symbol_index (OPTIONS are per contract and left out)
+SYMBOL_INDEX_TYPES = os.environ.get('FINANCE_SYMBOL_INDEX_TYPES', 'STOCKS,ETFS,MUTUAL_FUNDS,INDICES,FUTURES').split(',')
+# Smallest trigram similarity a fuzzy match needs
+FUZZY_MIN_SIMILARITY = 0.3
+
+FORMAT_VERSION = 1
+SEARCH_LIMIT = 10
+
+# Ticker type -> result group of the RapidAPI /search response
+RESULT_GROUPS = {
+    'STOCKS': 'stock',
+    'ETFS': 'etf',
+    'MUTUAL_FUNDS': 'mutual_fund',
+    'INDICES': 'index',
+    'FUTURES': 'futures',
+}
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def _trigrams(token: str) -> set:
+    padded = f' {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymbolIndex:
+    """
+    In-memory index of ticker symbols and names.
+
+    Prefix lookups bisect sorted arrays of symbols and of name words that
+    are pre-ranked, so a one-word lookup reads only the first ``limit``
+    matches. Fuzzy lookups rank the distinct name words and symbols by
+    trigram similarity to each query word, then map the best ones back to
+    tickers. Type-ahead searches stay in the low milliseconds without
+    calling RapidAPI.
+    """
+
+    # Tickers taken from each similar word when scoring fuzzy matches
+    FUZZY_TOKENS_PER_WORD = 50
+    FUZZY_ENTRIES_PER_TOKEN = 100
+
+    def __init__(self, entries: List[Tuple[str, str, str]], built_at: Optional[float] = None):
+        """
+        Args:
+            entries: (symbol, name, ticker type) tuples
+            built_at: Unix time the entries were crawled
+        """
+        self.entries = entries
+        self.built_at = built_at
+        # (upper-cased symbol, entry)
+        self._symbols: List[Tuple[str, int]] = []
+        # (name word, name length, entry): shorter names rank first within a word
+        self._words: List[Tuple[str, int, int]] = []
+        # Distinct lower-cased symbols and name words, for fuzzy matching
+        vocabulary: Dict[str, List[int]] = {}
+
+        for position, (symbol, name, _) in enumerate(entries):
+            self._symbols.append((symbol.upper(), position))
+            words = tuple(dict.fromkeys(_WORD.findall(name.lower())))
+            self._words.extend((word, len(name), position) for word in words)
+            for token in (symbol.lower(),) + words:
+                vocabulary.setdefault(token, []).append(position)
+        self._symbols.sort()
+        self._words.sort()
+        self._word_positions = [position for _, _, position in self._words]
+
+        self._tokens: List[str] = list(vocabulary)
+        self._token_entries: List[List[int]] = [
+            sorted(positions, key=lambda position: len(entries[position][1]))[:self.FUZZY_ENTRIES_PER_TOKEN]
+            for positions in vocabulary.values()
+        ]
+        self._token_trigrams: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        for token_id, token in enumerate(self._tokens):
+            trigrams = _trigrams(token)
+            self._token_trigrams.append(len(trigrams))
+            for trigram in trigrams:
+                self._postings.setdefault(trigram, []).append(token_id)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _range(keys: List[tuple], prefix: str) -> Tuple[int, int]:
+        return bisect.bisect_left(keys, (prefix,)), bisect.bisect_left(keys, (prefix + '\uffff',))
+
+    def prefix_search(self, query: str, limit: int = SEARCH_LIMIT) -> List[int]:
+        """
+        Entries whose symbol, or whose name words, start with the query
+
+        Symbol matches come first in alphabetical order, which puts an
+        exact match at the top. Name matches follow, with shorter names first.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        start, end = self._range(self._symbols, query.upper())
+        results = list(dict.fromkeys(position for _, position in self._symbols[start:min(end, start + limit)]))
+
+        words = _WORD.findall(query.lower())
+        if len(results) < limit and words:
+            # Entries matching every query word, visited in the rank order of the rarest word
+            ranges = sorted((self._range(self._words, word) for word in words), key=lambda r: r[1] - r[0])
+            candidates = None
+            if len(ranges) > 1:
+                candidates = set(self._word_positions[ranges[0][0]:ranges[0][1]])
+                for start, end in ranges[1:]:
+                    candidates.intersection_update(self._word_positions[start:end])
+            seen = set(results)
+            start, end = ranges[0]
+            for index in range(start, end):
+                position = self._word_positions[index]
+                if (candidates is None or position in candidates) and position not in seen:
+                    seen.add(position)
+                    results.append(position)
+                    if len(results) >= limit:
+                        break
+        return results
+
+    def _similar_tokens(self, word: str) -> List[Tuple[float, int]]:
+        trigrams = _trigrams(word)
+        shared: Dict[int, int] = {}
+        for trigram in trigrams:
+            for token_id in self._postings.get(trigram, ()):
+                shared[token_id] = shared.get(token_id, 0) + 1
+        similar = (
+            (count / (len(trigrams) + self._token_trigrams[token_id] - count), token_id)
+            for token_id, count in shared.items()
+        )
+        return heapq.nlargest(
+            self.FUZZY_TOKENS_PER_WORD, (item for item in similar if item[0] >= FUZZY_MIN_SIMILARITY)
+        )
+
+    def fuzzy_search(self, query: str, limit: int = SEARCH_LIMIT) -> List[int]:
+        """Entries most similar to the query by trigrams, tolerating typos"""
+        words = _WORD.findall(query.lower())
+        if not words:
+            return []
+        # entry -> summed best similarity of each query word
+        scores: Dict[int, float] = {}
+        for word in words:
+            best: Dict[int, float] = {}
+            for similarity, token_id in self._similar_tokens(word):
+                for position in self._token_entries[token_id]:
+                    if similarity > best.get(position, 0.0):
+                        best[position] = similarity
+            for position, similarity in best.items():
+                scores[position] = scores.get(position, 0.0) + similarity
+        threshold = FUZZY_MIN_SIMILARITY * len(words)
+        ranked = heapq.nlargest(
+            limit, ((score, -position) for position, score in scores.items() if score >= threshold)
+        )
+        return [-position for _, position in ranked]
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> List[Dict[str, str]]:
+        """
+        Prefix matches, topped up with fuzzy matches when there are too few
+
+        Args:
+            query: Text typed by the user
+            limit: Maximum number of results
+
+        Returns:
+            List of {'symbol', 'name', 'type'} dicts, best match first
+        """
+        positions = self.prefix_search(query, limit)
+        if len(positions) < limit:
+            seen = set(positions)
+            positions += [p for p in self.fuzzy_search(query, limit) if p not in seen][:limit - len(positions)]
+        return [
+            {'symbol': symbol, 'name': name, 'type': ticker_type}
+            for symbol, name, ticker_type in (self.entries[position] for position in positions)
+        ]
+
+    def save(self, path: str = SYMBOL_INDEX_PATH) -> None:
+        """Write the entries as gzipped JSON; the lookup structures are rebuilt on load"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        payload = {'version': FORMAT_VERSION, 'built_at': self.built_at, 'entries': self.entries}
+        temporary = f'{path}.tmp'
+        with gzip.open(temporary, 'wt', encoding='utf-8') as f:
+            json.dump(payload, f, separators=(',', ':'))
+        # Readers never see a half-written file
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str = SYMBOL_INDEX_PATH) -> 'SymbolIndex':
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get('version') != FORMAT_VERSION:
+            raise ValueError(f'Unsupported symbol index version {payload.get("version")}')
+        return cls([tuple(entry) for entry in payload['entries']], payload.get('built_at'))
+
+
+def ticker_rows(response: Any) -> List[Dict[str, Any]]:
+    """
+    The ticker rows of a get_market_tickers() response
+
+    Raises:
+        ValueError: If the response has no list of rows, such as an error payload
+    """
+    rows = response.get('body') if isinstance(response, dict) else None
+    if not isinstance(rows, list):
+        raise ValueError(f'Unexpected market tickers response: {str(response)[:200]}')
+    return rows
+
+
+def build_symbol_index(types: List[str] = SYMBOL_INDEX_TYPES, max_pages: Optional[int] = None,
+                       progress=None) -> SymbolIndex:
+    """
+    Crawl the market tickers of each type into a SymbolIndex
+
+    Pages are fetched from the upstream API through FinanceDataService,
+    bypassing its response cache, so the crawl is paced by its rate limiter
+    and waits out requests that get shed. A page that fails or answers with
+    an error payload fails the build instead of ending the type early.
+
+    Args:
+        types: Ticker types to crawl
+        max_pages: Stop each type after this many pages (None crawls every page)
+        progress: Optional callable(type, page, rows) called after each page
+
+    Returns:
+        The built index
+    """
+    from .finance_data_service import FinanceDataService
+
+    entries: Dict[str, Tuple[str, str, str]] = {}
+    for ticker_type in types:
+        page = 1
+        while max_pages is None or page <= max_pages:
+            try:
+                response = FinanceDataService.get_market_tickers(str(page), ticker_type, use_cache=False)
+            except RateLimitExceeded as e:
+                if e.retry_after is None:
+                    # The daily quota is spent
+                    raise
+                time.sleep(e.retry_after)
+                continue
+            rows = ticker_rows(response)
+            added = 0
+            for row in rows:
+                symbol = str(row.get('symbol') or '').strip()
+                if symbol and symbol.upper() not in entries:
+                    entries[symbol.upper()] = (symbol, str(row.get('name') or '').strip(), ticker_type)
+                    added += 1
+            if progress is not None:
+                progress(ticker_type, page, len(rows))
+            # Past the last page the API returns nothing, or repeats the last page
+            if not added:
+                break
+            page += 1
+    return SymbolIndex(list(entries.values()), built_at=time.time())
+
+
+_index: Optional[SymbolIndex] = None
+_index_mtime: Optional[float] = None
+_index_lock = threading.Lock()
+
+
+def get_symbol_index(path: Optional[str] = None) -> Optional[SymbolIndex]:
+    """
+    Get the persisted index, reloading it after build_symbol_index rewrites the file
+
+    Args:
+        path: Index file (default: SYMBOL_INDEX_PATH)
+
+    Returns:
+        The index, or None if it has not been built
+    """
+    global _index, _index_mtime
+    path = path or SYMBOL_INDEX_PATH
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    if mtime != _index_mtime:
+        with _index_lock:
+            if mtime != _index_mtime:
+                try:
+                    _index = SymbolIndex.load(path)
+                except Exception as e:
+                    logger.warning(f"Could not load the symbol index from {path}: {e}")
+                    _index = None
+                _index_mtime = mtime
+    return _index
+
+
+def local_search(query: str, limit: int = SEARCH_LIMIT) -> Optional[Dict[str, Any]]:
+    """
+    Answer a symbol search from the local index
+
+    Returns:
+        A response shaped like RapidAPI's /search, or None if the index is
+        missing or has no match
+    """
+    index = get_symbol_index()
+    if index is None:
+        return None
+    results = index.search(query, limit)
+    if not results:
+        return None
+    groups: Dict[str, List[Dict[str, str]]] = {}
+    for result in results:
+        groups.setdefault(RESULT_GROUPS.get(result['type'], result['type'].lower()), []).append(result)
+    return {'status': 'OK', 'source': 'local_index', 'data': groups}
@@ -0,0 +1,300 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from .finance_data_service import FinanceDataService
+from .rate_limiter import RateLimitExceeded
+from .symbol_index import ticker_rows
+
+logger = logging.getLogger(__name__)
+
+# Ticker snapshot configuration
+# Pages of one ticker type fetched at once; the rate limiter still paces them
+TICKER_CRAWL_CONCURRENCY = int(os.environ.get('FINANCE_TICKER_CRAWL_CONCURRENCY', '4'))
+# Times a shed page request is retried before the crawl gives up
+TICKER_CRAWL_RETRIES = 5
+TICKER_PAGE_SIZE = 50
+TICKER_MAX_PAGE_SIZE = 200
+# Rows written per bulk query
+WRITE_BATCH_SIZE = 500
+
+# ?ordering= value -> model field
+ORDERING_FIELDS = {
+    'symbol': 'symbol',
+    'name': 'name',
+    'price': 'last_sale',
+    'change': 'net_change',
+    'change_pct': 'pct_change',
+    'market_cap': 'market_cap',
+}
+# ?min_<name>= / ?max_<name>= filters -> model field
+RANGE_FILTERS = {
+    'price': 'last_sale',
+    'change_pct': 'pct_change',
+    'market_cap': 'market_cap',
+}
+# MarketTicker fields derived from the upstream row
+TICKER_FIELDS = ['name', 'last_sale', 'net_change', 'pct_change', 'market_cap', 'data', 'content_hash']
+# Upstream row keys holding the numeric columns
+NUMERIC_FIELDS = {
+    'last_sale': ('lastsale', 'lastSalePrice', 'price'),
+    'net_change': ('netchange', 'netChange'),
+    'pct_change': ('pctchange', 'percentageChange', 'pctChange'),
+    'market_cap': ('marketCap', 'market_cap'),
+}
+
+
+def parse_number(value: Any) -> Optional[float]:
+    """Parse upstream numbers such as '$1,234.50', '-0.35%' or 'N/A'"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if math.isfinite(value) else None
+    try:
+        number = float(str(value).replace('$', '').replace('%', '').replace(',', '').strip())
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def ticker_fields(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Model fields of one upstream ticker row"""
+    fields = {
+        'name': str(row.get('name') or '').strip()[:255],
+        'data': row,
+        'content_hash': hashlib.sha1(json.dumps(row, sort_keys=True, default=str).encode()).hexdigest(),
+    }
+    for field, keys in NUMERIC_FIELDS.items():
+        fields[field] = next((parse_number(row[key]) for key in keys if key in row), None)
+    return fields
+
+
+def _fetch_page(ticker_type: str, page: int) -> List[Dict[str, Any]]:
+    for attempt in range(TICKER_CRAWL_RETRIES + 1):
+        try:
+            return ticker_rows(FinanceDataService.get_market_tickers(str(page), ticker_type, use_cache=False))
+        except RateLimitExceeded as e:
+            # A spent daily quota will not recover during the crawl
+            if e.retry_after is None or attempt == TICKER_CRAWL_RETRIES:
+                raise
+            time.sleep(e.retry_after)
+    return []
+
+
+def fetch_all_pages(ticker_type: str, concurrency: int = TICKER_CRAWL_CONCURRENCY,
+                    max_pages: Optional[int] = None) -> Tuple[Dict[str, Dict[str, Any]], int]:
+    """
+    Fetch every page of a ticker type, ``concurrency`` pages at a time
+
+    The page count is not known up front, so pages are requested in waves
+    that stop at the first empty page or at a wave that adds no new symbols.
+    Pages are read from the upstream API, never from the response cache.
+
+    Returns:
+        Tuple of (upper-cased symbol -> upstream row, pages fetched)
+
+    Raises:
+        UpstreamUnavailable: If a page failed or answered with a non-2xx status
+        ValueError: If a page answered without a list of rows
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+    pages = 0
+    next_page = 1
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ticker-crawl') as executor:
+        while max_pages is None or next_page <= max_pages:
+            last = next_page + concurrency - 1 if max_pages is None else min(next_page + concurrency - 1, max_pages)
+            wave = executor.map(lambda page: _fetch_page(ticker_type, page), range(next_page, last + 1))
+            added = 0
+            exhausted = False
+            for page_rows in wave:
+                if not page_rows:
+                    exhausted = True
+                    break
+                pages += 1
+                for row in page_rows:
+                    symbol = str(row.get('symbol') or '').strip().upper()
+                    if symbol and symbol not in rows:
+                        rows[symbol] = row
+                        added += 1
+            # Past the last page the API returns nothing, or repeats the last page
+            if exhausted or not added:
+                break
+            next_page = last + 1
+    return rows, pages
+
+
+def crawl_tickers(ticker_type: str, concurrency: int = TICKER_CRAWL_CONCURRENCY,
+                  max_pages: Optional[int] = None):
+    """
+    Crawl one ticker type into a new snapshot version
+
+    Only new and changed rows are written. The new version is published
+    in a single transaction, so readers see either the previous snapshot
+    or the complete new one.
+
+    Args:
+        ticker_type: Type of tickers (STOCKS, ETFS, ...)
+        concurrency: Pages fetched at once
+        max_pages: Stop after this many pages (None crawls every page)
+
+    Returns:
+        The TickerSnapshot, complete or failed
+    """
+    from ..models import MarketTicker, TickerSnapshot
+
+    previous = latest_snapshot(ticker_type)
+    with transaction.atomic():
+        latest = TickerSnapshot.objects.filter(ticker_type=ticker_type).aggregate(version=Max('version'))['version']
+        snapshot = TickerSnapshot.objects.create(ticker_type=ticker_type, version=(latest or 0) + 1)
+    version = snapshot.version
+
+    try:
+        rows, snapshot.pages = fetch_all_pages(ticker_type, concurrency, max_pages)
+        existing = {
+            symbol.upper(): (pk, content_hash, last_seen_version)
+            for pk, symbol, content_hash, last_seen_version in MarketTicker.objects.filter(ticker_type=ticker_type)
+            .values_list('id', 'symbol', 'content_hash', 'last_seen_version')
+        }
+        created, changed, unchanged_ids = [], [], []
+        for symbol, row in rows.items():
+            fields = ticker_fields(row)
+            current = existing.get(symbol)
+            if current is None:
+                created.append(MarketTicker(
+                    ticker_type=ticker_type, symbol=str(row['symbol']).strip()[:32], first_version=version,
+                    updated_version=version, last_seen_version=version, **fields,
+                ))
+            elif current[1] != fields['content_hash']:
+                changed.append(MarketTicker(
+                    pk=current[0], updated_version=version, last_seen_version=version, **fields,
+                ))
+            else:
+                unchanged_ids.append(current[0])
+
+        with transaction.atomic():
+            MarketTicker.objects.bulk_create(created, batch_size=WRITE_BATCH_SIZE)
+            MarketTicker.objects.bulk_update(
+                changed, ['updated_version', 'last_seen_version'] + TICKER_FIELDS,
+                batch_size=WRITE_BATCH_SIZE,
+            )
+            for start in range(0, len(unchanged_ids), WRITE_BATCH_SIZE):
+                MarketTicker.objects.filter(id__in=unchanged_ids[start:start + WRITE_BATCH_SIZE]).update(
+                    last_seen_version=version
+                )
+            snapshot.tickers = len(rows)
+            snapshot.added = len(created)
+            snapshot.changed = len(changed)
+            snapshot.removed = sum(
+                1 for symbol, (_, _, seen) in existing.items()
+                if previous is not None and seen == previous.version and symbol not in rows
+            )
+            snapshot.status = TickerSnapshot.COMPLETE
+            snapshot.finished_at = timezone.now()
+            snapshot.save()
+    except Exception as e:
+        logger.error(f"Crawling {ticker_type} tickers failed: {e}")
+        snapshot.status = TickerSnapshot.FAILED
+        snapshot.error = str(e)
+        snapshot.finished_at = timezone.now()
+        snapshot.save(update_fields=['pages', 'status', 'error', 'finished_at'])
+    return snapshot
+
+
+def latest_snapshot(ticker_type: str):
+    """The newest complete snapshot of a ticker type, or None"""
+    from ..models import TickerSnapshot
+
+    return TickerSnapshot.objects.filter(
+        ticker_type=ticker_type, status=TickerSnapshot.COMPLETE
+    ).order_by('-version').first()
+
+
+def _int_param(params, name: str, default: int, minimum: int) -> int:
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        number = minimum - 1
+    if number < minimum:
+        raise ValueError(f'{name} must be an integer of at least {minimum}')
+    return number
+
+
+def query_tickers(ticker_type: str, params) -> Optional[Dict[str, Any]]:
+    """
+    Filter, sort and paginate the latest snapshot of a ticker type
+
+    Supported params:
+        q: Symbol prefix or name substring
+        min_price, max_price, min_change_pct, max_change_pct, min_market_cap, max_market_cap
+        changed_since: Only tickers added or changed after this snapshot version
+        ordering: One of ORDERING_FIELDS, prefixed with '-' for descending
+        page, page_size: 1-based page and its size (at most TICKER_MAX_PAGE_SIZE)
+
+    Args:
+        ticker_type: Type of tickers (STOCKS, ETFS, ...)
+        params: Query parameters (a QueryDict or dict)
+
+    Returns:
+        Dict with 'meta' and the upstream rows under 'body', or None if the
+        type has never been crawled
+
+    Raises:
+        ValueError: If a parameter is invalid
+    """
+    from ..models import MarketTicker
+
+    snapshot = latest_snapshot(ticker_type)
+    if snapshot is None:
+        return None
+
+    tickers = MarketTicker.objects.filter(ticker_type=ticker_type, last_seen_version=snapshot.version)
+    query = (params.get('q') or '').strip()
+    if query:
+        tickers = tickers.filter(Q(symbol__istartswith=query) | Q(name__icontains=query))
+    for name, field in RANGE_FILTERS.items():
+        for bound, lookup in (('min', 'gte'), ('max', 'lte')):
+            value = params.get(f'{bound}_{name}')
+            if value not in (None, ''):
+                number = parse_number(value)
+                if number is None:
+                    raise ValueError(f'{bound}_{name} must be a number')
+                tickers = tickers.filter(**{f'{field}__{lookup}': number})
+    changed_since = _int_param(params, 'changed_since', 0, 0)
+    if changed_since:
+        tickers = tickers.filter(updated_version__gt=changed_since)
+
+    ordering = params.get('ordering') or 'symbol'
+    field = ORDERING_FIELDS.get(ordering.lstrip('-'))
+    if field is None:
+        raise ValueError(f'ordering must be one of {", ".join(ORDERING_FIELDS)}')
+    expression = F(field).desc(nulls_last=True) if ordering.startswith('-') else F(field).asc(nulls_last=True)
+    tickers = tickers.order_by(expression, 'symbol')
+
+    page = _int_param(params, 'page', 1, 1)
+    page_size = min(_int_param(params, 'page_size', TICKER_PAGE_SIZE, 1), TICKER_MAX_PAGE_SIZE)
+    total = tickers.count()
+    start = (page - 1) * page_size
+    return {
+        'meta': {
+            'type': ticker_type,
+            'version': snapshot.version,
+            'crawled_at': snapshot.finished_at,
+            'total': total,
+            'page': page,
+            'page_size': page_size,
+            'pages': math.ceil(total / page_size),
+        },
+        'body': list(tickers.values_list('data', flat=True)[start:start + page_size]),
+    }
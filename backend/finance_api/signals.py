@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Portfolio, Stock
+from .services.advice_context import invalidate_advice_context
+
+
+@receiver([post_save, post_delete], sender=Stock)
+def stock_changed(sender, instance, **kwargs):
+    """Holdings changed, so the owner's advice context is out of date"""
+    if Stock.portfolio.is_cached(instance):
+        user_id = instance.portfolio.user_id
+    else:
+        user_id = Portfolio.objects.filter(pk=instance.portfolio_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate_advice_context(user_id)
+
+
+@receiver([post_save, post_delete], sender=Portfolio)
+def portfolio_changed(sender, instance, **kwargs):
+    """Portfolio names and membership are part of the owner's advice context"""
+    invalidate_advice_context(instance.user_id)
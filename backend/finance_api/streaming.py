@@ -0,0 +1,48 @@
+import json
+from typing import Any, AsyncIterator, Iterable, Iterator, Union
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+_DONE = object()
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def _iterate_in_thread(iterator: Iterator[str]) -> AsyncIterator[str]:
+    """Drive a blocking iterator from a worker thread, one item at a time"""
+    while True:
+        item = await sync_to_async(next, thread_sensitive=False)(iterator, _DONE)
+        if item is _DONE:
+            break
+        yield item
+
+
+def sse_response(request, events: Union[Iterable[str], AsyncIterator[str]]) -> StreamingHttpResponse:
+    """
+    Wrap an iterator of formatted events in a text/event-stream response.
+
+    Under ASGI, Django would buffer a synchronous iterator completely before
+    sending it, so blocking iterators are then driven from a worker thread
+    and exposed as an async iterator instead.
+
+    Args:
+        request: The Django or DRF request being answered
+        events: Iterator of strings produced by sse_event()
+
+    Returns:
+        A streaming response that disables proxy buffering
+    """
+    django_request = getattr(request, '_request', request)
+    if isinstance(django_request, ASGIRequest) and not hasattr(events, '__aiter__'):
+        events = _iterate_in_thread(iter(events))
+
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
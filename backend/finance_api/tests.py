@@ -1,3 +1,1310 @@
-from django.test import TestCase
+import asyncio
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+import numpy as np
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from . import agents, views
+from .models import AdviceJob, FinancialAdvice, MarketTicker, Portfolio, Stock, TickerSnapshot
+from .serializers import ADVICE_SUMMARY_LENGTH
+from .services import (
+    advice_cache, advice_context, advice_jobs, async_finance_data_service, finance_data_service, http_session,
+    portfolio_risk, portfolio_valuation, price_history, retirement_simulation, symbol_index, ticker_snapshots,
+)
+from .services.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry, UpstreamUnavailable
+from .services.metrics import registry
+from .services.quote_hub import QuoteHub
+from .services.rate_limiter import RateLimiter, RateLimitExceeded
+from .services.response_cache import LRUCache, ResponseCache
+from .services.single_flight import AsyncSingleFlight, SingleFlight
+
+
+class HttpSessionTests(SimpleTestCase):
+    """Upstream sessions are pooled, time out and never wait out long Retry-After delays"""
+
+    def test_session_pools_connections_and_only_retries_connection_errors(self):
+        adapter = http_session.create_session(pool_size=7).get_adapter('https://host/')
+
+        self.assertEqual(adapter._pool_maxsize, 7)
+        self.assertEqual(adapter.max_retries.connect, http_session.HTTP_MAX_RETRIES)
+        self.assertEqual((adapter.max_retries.read, adapter.max_retries.status), (0, 0))
+        self.assertFalse(adapter.max_retries.respect_retry_after_header)
+        self.assertIs(http_session.get_session('host'), http_session.get_session('host'))
+        self.assertEqual(http_session.get_timeout(), (http_session.HTTP_CONNECT_TIMEOUT, http_session.HTTP_READ_TIMEOUT))
+
+    def test_retry_delay_is_capped(self):
+        def response(retry_after):
+            return mock.Mock(headers={'Retry-After': retry_after} if retry_after else {})
+
+        self.assertEqual(http_session.retry_delay(response('2'), 0), 2)
+        self.assertIsNone(http_session.retry_delay(response('3600'), 0))
+        self.assertEqual(http_session.retry_delay(response(None), 2), http_session.HTTP_BACKOFF_FACTOR * 4)
+
+
+class ResponseCacheTests(SimpleTestCase):
+    """Upstream responses are bounded, expire after their TTL and are kept a while as stale"""
+
+    def test_lru_evicts_least_recently_used_and_expired_entries(self):
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 1, time.time() + 60)
+        cache.set('b', 2, time.time() + 60)
+        cache.get('a')
+        cache.set('c', 3, time.time() + 60)
+
+        self.assertEqual(cache.get('a')[:2], (True, 1))
+        self.assertEqual(cache.get('b')[:2], (False, None))
+
+        cache.set('c', 3, time.time() - 1)
+        self.assertEqual(cache.get('c')[:2], (False, None))
+        self.assertEqual(len(cache), 1)
+
+    def test_equivalent_requests_share_a_key(self):
+        url = 'https://host/stock-quote'
+
+        self.assertEqual(
+            ResponseCache.make_key('get_stock_quote', url, {'symbol': ' aapl ', 'language': 'EN', 'page': None}),
+            ResponseCache.make_key('get_stock_quote', url, {'language': 'en', 'symbol': 'AAPL'}),
+        )
+        self.assertNotEqual(
+            ResponseCache.make_key('get_stock_quote', url, {'symbol': 'AAPL'}),
+            ResponseCache.make_key('get_stock_news', url, {'symbol': 'AAPL'}),
+        )
+
+    def test_expired_entries_are_returned_as_stale_until_the_stale_ttl(self):
+        cache = ResponseCache(shared_alias='', stale_ttl=60)
+        cache.set('fresh', {'price': 1}, 30)
+        cache.set('skipped', {'price': 2}, 0)
+        cache.local.set('stale', (time.time() - 10, {'price': 3}), time.time() + 50)
+        cache.local.set('gone', (time.time() - 70, {'price': 4}), time.time() - 10)
+
+        found, value, fresh_until = cache.get('get_stock_quote', 'fresh')
+        self.assertTrue(found and fresh_until > time.time())
+        self.assertEqual(value, {'price': 1})
+        found, value, fresh_until = cache.get('get_stock_quote', 'stale')
+        self.assertTrue(found and fresh_until < time.time())
+        self.assertEqual(value, {'price': 3})
+        self.assertFalse(cache.get('get_stock_quote', 'skipped')[0])
+        self.assertFalse(cache.get('get_stock_quote', 'gone')[0])
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['stale_hits'], stats['misses']), (1, 1, 2))
+        self.assertEqual(stats['hit_ratio'], 0.25)
+
+    def test_shared_tier_entries_are_promoted_to_the_local_tier(self):
+        writer = ResponseCache(shared_alias='default')
+        reader = ResponseCache(shared_alias='default')
+        key = ResponseCache.make_key('get_stock_quote', 'https://host/shared', {'symbol': 'SHRD'})
+        self.addCleanup(caches['default'].delete, key)
+        writer.set(key, {'price': 5}, 30)
+
+        self.assertEqual(reader.get('get_stock_quote', key)[:2], (True, {'price': 5}))
+        self.assertEqual(len(reader.local), 1)
+        self.assertEqual(reader.stats()['methods']['get_stock_quote']['shared_hits'], 1)
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Concurrent identical calls share one execution"""
+
+    def run_concurrently(self, flight, key, func, callers):
+        results = []
+
+        def call():
+            try:
+                results.append(flight.do(key, func))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_concurrent_callers_share_one_execution(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            release.wait(5)
+            return 'quote'
+
+        threads, results = self.run_concurrently(flight, 'quote:AAPL', work, 5)
+        while flight.stats()['coalesced'] < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['quote'] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.in_flight(), 0)
+        # The key is released, so the next call runs again
+        self.assertEqual(flight.do('quote:AAPL', lambda: 'fresh'), 'fresh')
+        self.assertEqual(flight.stats()['executed'], 2)
+
+    def test_followers_receive_the_leaders_exception(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        error = RuntimeError('upstream down')
+
+        def work():
+            release.wait(5)
+            raise error
+
+        threads, results = self.run_concurrently(flight, 'quote:MSFT', work, 3)
+        while flight.stats()['coalesced'] < 2:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [error] * 3)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_cancelled_async_leader_does_not_fail_its_followers(self):
+        async def scenario():
+            flight = AsyncSingleFlight()
+            release = asyncio.Event()
+
+            async def work():
+                await release.wait()
+                return 'quote'
+
+            leader = asyncio.ensure_future(flight.do('quote:AAPL', work))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.do('quote:AAPL', work))
+            await asyncio.sleep(0)
+            leader.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            return await follower, leader.cancelled(), flight.stats()
+
+        result, leader_cancelled, stats = asyncio.run(scenario())
+
+        self.assertEqual(result, 'quote')
+        self.assertTrue(leader_cancelled)
+        self.assertEqual(stats, {'executed': 1, 'coalesced': 1, 'in_flight': 0})
+
+
+class BatchQuotesTests(APITestCase):
+    """Batch quote endpoints validate, de-duplicate and fetch every symbol independently"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='batcher', password='s3cret-pass')
+        # The async views authenticate with the project's DRF authenticators, not force_authenticate
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+
+    def test_views_package_keeps_the_module_import_paths(self):
+        from .views.finance_views import batch_quotes
+
+        self.assertIs(resolve('/api/finance/quotes/batch').func, batch_quotes)
+        # The package still exposes the views that used to live in views.py
+        for name in ('PortfolioViewSet', 'get_ai_advice', 'get_advice_history', 'register_user'):
+            self.assertTrue(hasattr(views, name), name)
+
+    def test_quotes_are_fetched_once_per_symbol_with_failures_isolated(self):
+        def quote(symbol, language='en'):
+            if symbol == 'BAD':
+                raise ValueError('Unknown symbol')
+            return {'symbol': symbol, 'language': language}
+
+        service = finance_data_service.FinanceDataService
+        with mock.patch.object(service, 'get_stock_quote', side_effect=quote) as get_quote:
+            response = self.client.post(
+                reverse('batch_quotes'), {'symbols': ['aapl', ' AAPL ', 'bad'], 'language': 'de'}, format='json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], {
+            'AAPL': {'data': {'symbol': 'AAPL', 'language': 'de'}},
+            'BAD': {'error': 'Unknown symbol'},
+        })
+        self.assertEqual(get_quote.call_count, 2)
+
+    def test_async_batch_matches_the_sync_endpoint(self):
+        async def quote(symbol, language='en', max_age=None):
+            return {'symbol': symbol}
+
+        service = async_finance_data_service.AsyncFinanceDataService
+        with mock.patch.object(service, 'get_stock_quote', side_effect=quote):
+            response = self.client.post(reverse('async_batch_quotes'), {'symbols': ['msft', 'MSFT']}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'results': {'MSFT': {'data': {'symbol': 'MSFT'}}}})
+
+    def test_invalid_batches_are_rejected(self):
+        for name in ('batch_quotes', 'async_batch_quotes'):
+            for symbols in ([], 'AAPL', ['AAPL', ''], ['AAPL', 7]):
+                response = self.client.post(reverse(name), {'symbols': symbols}, format='json')
+                self.assertEqual(response.status_code, 400, (name, symbols))
+
+            too_many = [f'SYM{i}' for i in range(finance_data_service.BATCH_MAX_SYMBOLS + 1)]
+            response = self.client.post(reverse(name), {'symbols': too_many}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(reverse('batch_quotes'), {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class PortfolioValuationTests(APITestCase):
+    """Holdings are valued in bounded quote batches and unpriced symbols are reported"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='valuer', password='s3cret-pass')
+        self.client.force_authenticate(self.user)
+        self.portfolio = Portfolio.objects.create(user=self.user, name='Large')
+
+    def quote(self, symbols, language):
+        return {
+            symbol: {'error': 'Quote unavailable'} if symbol == 'SYM3'
+            else {'data': {'data': {'price': 110 if symbol == 'SYM0' else 50}}}
+            for symbol in symbols
+        }
+
+    def test_quotes_are_fetched_in_batches_and_failures_are_reported(self):
+        Stock.objects.bulk_create([
+            Stock(portfolio=self.portfolio, symbol=f'sym{i % 5}', name=f'Company {i}', quantity=2,
+                  purchase_price=100, purchase_date=date(2024, 1, 2))
+            for i in range(6)
+        ])
+        service = finance_data_service.FinanceDataService
+        with mock.patch.object(portfolio_valuation, 'BATCH_MAX_SYMBOLS', 2), \
+                mock.patch.object(service, 'get_stock_quotes', side_effect=self.quote) as get_quotes:
+            response = self.client.get(reverse('portfolio-valuation', args=[self.portfolio.id]))
+
+        self.assertEqual(response.status_code, 200)
+        batches = [call.args[0] for call in get_quotes.call_args_list]
+        self.assertEqual(batches, [['SYM0', 'SYM1'], ['SYM2', 'SYM3'], ['SYM4']])
+        self.assertEqual(response.data['unpriced_symbols'], ['SYM3'])
+        self.assertEqual(response.data['quote_errors'], {'SYM3': 'Quote unavailable'})
+        totals = response.data['totals']
+        self.assertEqual(totals['position_count'], 6)
+        self.assertEqual(totals['cost_basis'], 1200)
+        self.assertEqual(totals['priced_cost_basis'], 1000)
+        # Two SYM0 holdings at 110 and three others at 50, two shares each
+        self.assertEqual(totals['market_value'], 740)
+        self.assertEqual(response.data['portfolio'], {'id': self.portfolio.id, 'name': 'Large'})
+
+    def test_empty_portfolio_fetches_no_quotes(self):
+        with mock.patch.object(finance_data_service.FinanceDataService, 'get_stock_quotes') as get_quotes:
+            response = self.client.get(reverse('portfolio-valuation', args=[self.portfolio.id]))
+
+        get_quotes.assert_not_called()
+        self.assertEqual(response.data['positions'], [])
+        self.assertEqual(response.data['quote_errors'], {})
+        self.assertIsNone(response.data['totals']['unrealized_pnl_pct'])
+
+
+class PortfolioQueryCountTests(APITestCase):
+    """Listing and retrieving portfolios must not issue a query per portfolio or holding"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='investor', password='s3cret-pass')
+        self.client.force_authenticate(self.user)
+
+    def create_portfolios(self, count, holdings):
+        portfolios = []
+        for i in range(count):
+            portfolio = Portfolio.objects.create(user=self.user, name=f'Portfolio {i}')
+            Stock.objects.bulk_create([
+                Stock(
+                    portfolio=portfolio,
+                    symbol=f'SYM{j}',
+                    name=f'Company {j}',
+                    quantity=10,
+                    purchase_price=100,
+                    purchase_date=date(2024, 1, 2),
+                )
+                for j in range(holdings)
+            ])
+            portfolios.append(portfolio)
+        return portfolios
+
+    def test_list_query_count_is_constant(self):
+        self.create_portfolios(1, 1)
+        with CaptureQueriesContext(connection) as baseline:
+            self.client.get(reverse('portfolio-list'))
+
+        self.create_portfolios(5, 10)
+        with self.assertNumQueries(len(baseline)):
+            response = self.client.get(reverse('portfolio-list'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(sum(len(portfolio['stocks']) for portfolio in response.data), 51)
+
+    def test_retrieve_query_count_is_constant(self):
+        small, = self.create_portfolios(1, 1)
+        large, = self.create_portfolios(1, 25)
+
+        with CaptureQueriesContext(connection) as baseline:
+            self.client.get(reverse('portfolio-detail', args=[small.id]))
+        with self.assertNumQueries(len(baseline)):
+            response = self.client.get(reverse('portfolio-detail', args=[large.id]))
+
+        self.assertEqual(len(response.data['stocks']), 25)
+
+
+class AdviceHistoryTests(APITestCase):
+    """Advice history is cursor-paginated and summaries never load the full answers"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='historian', password='s3cret-pass')
+        self.client.force_authenticate(self.user)
+        FinancialAdvice.objects.bulk_create([
+            FinancialAdvice(user=self.user, question=f'Question {i}', answer=f'{i} ' + 'x' * (i * 20))
+            for i in range(25)
+        ])
+        other = User.objects.create_user(username='other', password='s3cret-pass')
+        FinancialAdvice.objects.create(user=other, question='Not mine', answer='Hidden')
+
+    def test_pages_follow_the_cursor_newest_first_without_overlap(self):
+        first = self.client.get(reverse('advice_history')).data
+        second = self.client.get(first['next']).data
+        small = self.client.get(reverse('advice_history'), {'page_size': 10}).data
+
+        questions = [advice['question'] for advice in first['results'] + second['results']]
+        self.assertEqual(questions, [f'Question {i}' for i in reversed(range(25))])
+        self.assertEqual(len(first['results']), 20)
+        self.assertIsNone(second['next'])
+        self.assertNotIn('count', first)
+        self.assertEqual(len(small['results']), 10)
+
+    def test_summary_truncates_answers_in_the_database(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('advice_history'), {'summary': 'true', 'page_size': 25})
+
+        results = {advice['question']: advice for advice in response.data['results']}
+        self.assertEqual(len(results['Question 24']['answer']), ADVICE_SUMMARY_LENGTH)
+        self.assertTrue(results['Question 24']['truncated'])
+        self.assertEqual(results['Question 1']['answer'], '1 ' + 'x' * 20)
+        self.assertFalse(results['Question 1']['truncated'])
+        history_query = next(query['sql'] for query in queries if 'SUBSTR' in query['sql'].upper())
+        # The answer column is only read through SUBSTR() and LENGTH()
+        self.assertIsNone(re.search(r'(?<!\()"finance_api_financialadvice"\."answer"', history_query))
+
+
+class AdviceCacheTests(APITestCase):
+    """Near-duplicate matching is opt-in and never crosses different numbers or qualifiers"""
+
+    def test_near_duplicates_are_off_by_default(self):
+        cache = advice_cache.AdviceCache()
+        cache.set('Should I open a Roth IRA?', {}, 'answer')
+
+        self.assertEqual(cache.get('should i open a roth ira'), 'answer')
+        self.assertIsNone(cache.get('Should I open a Roth IRA account?'))
+
+    def test_near_duplicates_need_the_same_numbers_and_qualifiers(self):
+        cache = advice_cache.AdviceCache(similarity=0.85)
+        pairs = [
+            ('How much should I put in my 401k at age 25 with a salary of $50000?',
+             'How much should I put in my 401k at age 55 with a salary of $50000?'),
+            ('How much should I put in my 401k at age 25 with a salary of $50000?',
+             'How much should I put in my 401k at age 25 with a salary of $150000?'),
+            ('Is a Roth conversion a good idea this year for me?',
+             'Is a Roth conversion a bad idea this year for me?'),
+        ]
+        for cached, asked in pairs:
+            cache.clear()
+            cache.set(cached, {'risk': 'moderate'}, 'cached answer')
+            self.assertIsNone(cache.get(asked, {'risk': 'moderate'}), asked)
+
+        cache.set('Is a Roth conversion a good idea this year for me?', {}, 'cached answer')
+        self.assertEqual(cache.get('Is a Roth conversion a good idea this year for me??!', {}), 'cached answer')
+        self.assertEqual(cache.get('Is the Roth conversion a good idea this year for me?', {}), 'cached answer')
+
+    def test_warm_start_replays_rows_by_their_stored_context_hash(self):
+        user = User.objects.create_user(username='returning', password='s3cret-pass')
+        context = {'portfolio': {'totals': {'market_value': 5000.0}}}
+        FinancialAdvice.objects.create(user=user, question='Roth or traditional?', answer='Roth',
+                                       context_hash=advice_cache.hash_context(context))
+        FinancialAdvice.objects.create(user=user, question='Before hashes were stored?', answer='Old')
+        FinancialAdvice.objects.create(user=user, question='Failed?', answer='Sorry: timeout',
+                                       context_hash=advice_cache.hash_context(context))
+        cache = advice_cache.AdviceCache()
+
+        self.assertEqual(cache.warm_from_history(error_prefix='Sorry'), 1)
+        self.assertEqual(cache.get('Roth or traditional?', context), 'Roth')
+        self.assertIsNone(cache.get('Roth or traditional?', {}))
+        self.assertEqual(cache.warm_from_history(error_prefix='Sorry'), 0)
+
+
+class AdvisorAgentTests(SimpleTestCase):
+    """Questions reach the fewest LLM calls that can answer them"""
+
+    def test_stream_forwards_the_routed_specialists_tokens(self):
+        chain = mock.Mock()
+        chain.prompt.format.return_value = 'prompt'
+        chain.llm.stream.return_value = [mock.Mock(content='Buy '), mock.Mock(content=''), mock.Mock(content='ETFs.')]
+        system = mock.Mock(specialist_chains={'InvestmentAdvice': chain})
+
+        with mock.patch.object(agents, 'get_agent_system', return_value=system), \
+                mock.patch.object(agents, 'route_question', return_value='InvestmentAdvice') as route:
+            chunks = list(agents.stream_financial_advice('Should I buy ETFs?', {'cash': 1}, use_cache=False))
+
+        self.assertEqual(chunks, ['Buy ', 'ETFs.'])
+        route.assert_called_once_with('Should I buy ETFs?')
+        chain.prompt.format.assert_called_once_with(question='Should I buy ETFs?', context='{"cash": 1}')
+
+    def test_confident_questions_are_classified_locally(self):
+        self.assertEqual(agents.classify_intent('Should I rebalance my portfolio into index funds?'), 'InvestmentAdvice')
+        self.assertEqual(agents.classify_intent('When can I withdraw from my Roth IRA?'), 'RetirementPlanning')
+        # No specialist vocabulary at all, or an even split between two specialists
+        self.assertIsNone(agents.classify_intent('What should I do next?'))
+        self.assertIsNone(agents.classify_intent('How do taxes affect my retirement?'))
+        with mock.patch.object(agents, 'INTENT_CONFIDENCE_THRESHOLD', 0.5):
+            self.assertEqual(agents.classify_intent('How do taxes affect my retirement?'), 'TaxPlanning')
+
+    def test_only_unclassified_questions_pay_for_the_router_call(self):
+        system = mock.Mock()
+        system.routing_prompt.format.return_value = 'route this'
+        system.router_llm.invoke.side_effect = [mock.Mock(content='RetirementPlanning'), mock.Mock(content='Unsure')]
+
+        with mock.patch.object(agents, 'get_agent_system', return_value=system):
+            self.assertEqual(agents.route_question('Is my portfolio diversified enough?'), 'InvestmentAdvice')
+            system.router_llm.invoke.assert_not_called()
+            self.assertEqual(agents.route_question('What should I do next?'), 'RetirementPlanning')
+            self.assertEqual(agents.route_question('What should I do next?'), agents.DEFAULT_SPECIALIST)
+
+        self.assertEqual(system.router_llm.invoke.call_count, 2)
+
+    def test_cross_domain_questions_fan_out_to_each_relevant_specialist(self):
+        self.assertEqual(
+            agents.relevant_intents('How do taxes affect my retirement?'), ['TaxPlanning', 'RetirementPlanning']
+        )
+        self.assertEqual(agents.relevant_intents('Should I rebalance my portfolio?'), ['InvestmentAdvice'])
+        self.assertEqual(agents.relevant_intents('What should I do next?'), [])
+
+    def test_fan_out_drops_late_specialists_and_merges_the_rest(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def specialist(answer, delay=None):
+            def run(inputs):
+                if delay is not None:
+                    release.wait(delay)
+                return answer
+            return mock.Mock(prompt=None, run=mock.Mock(side_effect=run))
+
+        system = mock.Mock()
+        system.specialist_chains = {
+            'TaxPlanning': specialist('Use the Roth.'),
+            'RetirementPlanning': specialist('Retire at 65.'),
+            'MarketAnalysis': specialist('Too late.', delay=5),
+        }
+        system.synthesis_chain = mock.Mock(prompt=None, run=mock.Mock(return_value='Merged advice.'))
+        intents = ['TaxPlanning', 'RetirementPlanning', 'MarketAnalysis']
+
+        with mock.patch.object(agents, 'get_agent_system', return_value=system), \
+                mock.patch.object(agents, 'SPECIALIST_TIMEOUT', 0.2):
+            started = time.monotonic()
+            advice = agents.fan_out_advice('Taxes on retirement?', {'cash': 1}, intents)
+            elapsed = time.monotonic() - started
+            only = agents.fan_out_advice('Taxes on retirement?', {}, ['TaxPlanning', 'MarketAnalysis'])
+            with self.assertRaises(TimeoutError):
+                agents.fan_out_advice('Taxes on retirement?', {}, ['MarketAnalysis'])
+
+        self.assertEqual(advice, 'Merged advice.')
+        self.assertLess(elapsed, 2)
+        merged = system.synthesis_chain.run.call_args.args[0]
+        self.assertEqual(merged['context'], '{"cash": 1}')
+        self.assertIn('[TaxPlanning]\nUse the Roth.', merged['analyses'])
+        self.assertIn('[RetirementPlanning]\nRetire at 65.', merged['analyses'])
+        self.assertNotIn('Too late.', merged['analyses'])
+        # A single answer in time is the advice itself, without a synthesis call
+        self.assertEqual(only, 'Use the Roth.')
+        self.assertEqual(system.synthesis_chain.run.call_count, 1)
+
+    def test_specialists_still_queued_at_the_deadline_are_cancelled(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        slow = mock.Mock(prompt=None, run=mock.Mock(side_effect=lambda inputs: release.wait(5) and 'Too late.'))
+        queued = mock.Mock(prompt=None, run=mock.Mock(return_value='Never run.'))
+        system = mock.Mock(specialist_chains={'MarketAnalysis': slow, 'TaxPlanning': queued})
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+
+        with mock.patch.object(agents, 'get_agent_system', return_value=system), \
+                mock.patch.object(agents, 'specialist_executor', executor), \
+                mock.patch.object(agents, 'SPECIALIST_TIMEOUT', 0.1):
+            analyses = agents.run_specialists('Taxes on stocks?', {}, ['MarketAnalysis', 'TaxPlanning'])
+        release.set()
+        executor.shutdown(wait=True)
+
+        self.assertEqual(analyses, {})
+        queued.run.assert_not_called()
+
+    def test_stream_yields_the_only_fanned_out_answer_without_routing(self):
+        with mock.patch.object(agents, 'get_agent_system'), \
+                mock.patch.object(agents, 'relevant_intents', return_value=['TaxPlanning', 'RetirementPlanning']), \
+                mock.patch.object(agents, 'run_specialists', return_value={'TaxPlanning': 'Max out the Roth.'}), \
+                mock.patch.object(agents, 'route_question') as route:
+            chunks = list(agents.stream_financial_advice('Taxes on retirement withdrawals?', use_cache=False))
+
+        self.assertEqual(chunks, ['Max out the Roth.'])
+        route.assert_not_called()
+
+    def test_agent_system_is_built_once_on_first_use(self):
+        with mock.patch.object(agents, '_agent_system', None), \
+                mock.patch.object(agents, 'AgentSystem', side_effect=lambda: time.sleep(0.05) or mock.Mock()) as build:
+            systems = []
+            threads = [threading.Thread(target=lambda: systems.append(agents.get_agent_system())) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        build.assert_called_once_with()
+        self.assertTrue(all(system is systems[0] for system in systems))
+
+    def test_app_loads_without_the_llm_libraries(self):
+        # Block google-generativeai and LangChain: loading the URLconf must not need them
+        script = (
+            "import sys, django\n"
+            "class Block:\n"
+            "    def find_spec(self, name, path=None, target=None):\n"
+            "        if name.split('.')[0] in ('langchain', 'langchain_core', 'langchain_google_genai') "
+            "or name.startswith('google.generativeai'):\n"
+            "            raise ImportError(name)\n"
+            "sys.meta_path.insert(0, Block())\n"
+            "django.setup()\n"
+            "import finance_advisor.urls\n"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'finance_advisor.settings'}, capture_output=True, text=True,
+        )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class AdviceContextTests(APITestCase):
+    """The advice context is built from one holdings query and dropped when holdings change"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='advisee', password='s3cret-pass')
+        growth = Portfolio.objects.create(user=self.user, name='Growth')
+        income = Portfolio.objects.create(user=self.user, name='Income')
+        for portfolio, symbol, quantity in ((growth, 'AAPL', 10), (growth, 'MSFT', 5), (income, 'aapl', 10)):
+            Stock.objects.create(
+                portfolio=portfolio,
+                symbol=symbol,
+                name=symbol.upper(),
+                quantity=quantity,
+                purchase_price=100,
+                purchase_date=date(2024, 1, 2),
+            )
+
+    @staticmethod
+    def fake_quotes(symbols, language='en'):
+        prices = {'AAPL': 150.0, 'MSFT': 400.0}
+        return {symbol: {'data': {'data': {'price': prices[symbol]}}} for symbol in symbols}
+
+    @staticmethod
+    def fake_company_data(symbol, language='en'):
+        return {'data': {'sector': 'Technology'}}
+
+    def build(self, max_tokens=advice_context.ADVICE_CONTEXT_MAX_TOKENS):
+        with mock.patch.object(advice_context.FinanceDataService, 'get_stock_quotes', side_effect=self.fake_quotes), \
+                mock.patch.object(advice_context.FinanceDataService, 'get_company_data', side_effect=self.fake_company_data), \
+                mock.patch.object(advice_context, 'ADVICE_CONTEXT_MAX_TOKENS', max_tokens):
+            with self.assertNumQueries(1):
+                return advice_context.build_advice_context(self.user)
+
+    def test_context_summarizes_holdings_across_portfolios(self):
+        portfolio = self.build()['portfolio']
+
+        self.assertEqual(portfolio['totals']['market_value'], 5000.0)
+        self.assertEqual([holding['symbol'] for holding in portfolio['holdings']], ['AAPL', 'MSFT'])
+        self.assertEqual(portfolio['holdings'][0]['weight'], 0.6)
+        self.assertEqual(portfolio['holdings'][0]['pnl_pct'], 50.0)
+        self.assertEqual(portfolio['sector_weights'], {'Technology': 1.0})
+        self.assertEqual(portfolio['portfolios'], {'Growth': 0.7, 'Income': 0.3})
+
+    def test_quotes_are_fetched_in_bounded_batches(self):
+        with mock.patch.object(portfolio_valuation, 'BATCH_MAX_SYMBOLS', 1), \
+                mock.patch.object(advice_context.FinanceDataService, 'get_stock_quotes',
+                                  side_effect=self.fake_quotes) as get_quotes, \
+                mock.patch.object(advice_context.FinanceDataService, 'get_company_data', side_effect=self.fake_company_data):
+            portfolio = advice_context.build_advice_context(self.user)['portfolio']
+
+        self.assertEqual([call.args[0] for call in get_quotes.call_args_list], [['AAPL'], ['MSFT']])
+        self.assertEqual(portfolio['totals']['market_value'], 5000.0)
+
+    def test_context_is_trimmed_to_the_token_budget(self):
+        full = self.build()
+        trimmed = self.build(max_tokens=len(advice_context.json.dumps(full, separators=(',', ':'))) // 4 - 5)
+
+        self.assertEqual([holding['symbol'] for holding in trimmed['portfolio']['holdings']], ['AAPL'])
+        self.assertEqual(trimmed['portfolio']['omitted_holdings'], 1)
+
+    def test_holding_changes_invalidate_the_cached_context(self):
+        advice_context._contexts.set(self.user.pk, (0.0, {'user': 'advisee'}), float('inf'))
+
+        stock = Stock.objects.select_related('portfolio').filter(portfolio__user=self.user).first()
+
+        with mock.patch.object(advice_context, '_schedule_precompute') as schedule, \
+                self.captureOnCommitCallbacks(execute=True):
+            # The owner is read from the cached portfolio, not queried
+            with self.assertNumQueries(1):
+                stock.delete()
+
+        self.assertIsNone(advice_context.cached_advice_context(self.user.pk))
+        schedule.assert_called_with(self.user.pk)
+
+    def test_a_burst_of_changes_is_rebuilt_once(self):
+        with mock.patch.object(advice_context, 'ADVICE_CONTEXT_REBUILD_DELAY', 0.05), \
+                mock.patch.object(advice_context, '_precompute_executor') as executor:
+            for _ in range(3):
+                advice_context._schedule_precompute(self.user.pk)
+            time.sleep(0.3)
+
+        executor.submit.assert_called_once_with(advice_context._precompute, self.user.pk)
+        self.assertNotIn(self.user.pk, advice_context._rebuild_timers)
+
+
+class AdviceJobQueueTests(APITestCase):
+    """Advice questions can be queued, claimed once and limited per user"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='queued', password='s3cret-pass')
+        self.client.force_authenticate(self.user)
+
+    def test_enqueue_returns_job_to_poll(self):
+        response = self.client.post(reverse('advice_jobs'), {'question': 'Roth or traditional IRA?'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], AdviceJob.QUEUED)
+
+        poll = self.client.get(reverse('advice_job', args=[response.data['id']]))
+        self.assertEqual(poll.status_code, 200)
+        self.assertIsNone(poll.data['advice'])
+
+    def test_enqueue_is_refused_when_too_many_jobs_are_pending(self):
+        with mock.patch.object(advice_jobs, 'ADVICE_JOBS_MAX_PENDING_PER_USER', 1):
+            self.client.post(reverse('advice_jobs'), {'question': 'First'}, format='json')
+            response = self.client.post(reverse('advice_jobs'), {'question': 'Second'}, format='json')
+        self.assertEqual(response.status_code, 429)
+
+    def test_claim_respects_per_user_limit(self):
+        other = User.objects.create_user(username='other', password='s3cret-pass')
+        first = AdviceJob.objects.create(user=self.user, question='First')
+        AdviceJob.objects.create(user=self.user, question='Second')
+        third = AdviceJob.objects.create(user=other, question='Third')
+
+        with mock.patch.object(advice_jobs, 'ADVICE_JOBS_PER_USER', 1):
+            self.assertEqual(advice_jobs.claim_next_job('w1').pk, first.pk)
+            # The first user is at their limit, so the other user's job goes next
+            self.assertEqual(advice_jobs.claim_next_job('w2').pk, third.pk)
+            self.assertIsNone(advice_jobs.claim_next_job('w3'))
+
+    def test_failing_chain_fails_the_job_without_saving_advice(self):
+        job = AdviceJob.objects.create(user=self.user, question='Which index fund should I buy?')
+        advice_jobs.claim_next_job('w1')
+        job.refresh_from_db()
+
+        with mock.patch.object(agents, 'relevant_intents', return_value=['InvestmentAdvice']), \
+                mock.patch.object(agents, 'classify_intent', return_value='InvestmentAdvice'), \
+                mock.patch.object(agents, 'get_agent_system'), \
+                mock.patch.object(agents, 'run_chain', side_effect=RuntimeError('model unavailable')):
+            advice_jobs.run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AdviceJob.FAILED)
+        self.assertEqual(job.error, 'model unavailable')
+        self.assertIsNone(job.advice)
+        self.assertFalse(FinancialAdvice.objects.filter(user=self.user).exists())
+
+    def test_job_failed_as_abandoned_keeps_its_outcome(self):
+        job = AdviceJob.objects.create(user=self.user, question='Should I pay off my mortgage early?')
+        advice_jobs.claim_next_job('w1')
+        job.refresh_from_db()
+
+        def slow_answer(question, context, raise_errors=False):
+            with mock.patch.object(advice_jobs, 'ADVICE_JOB_TIMEOUT', -1):
+                self.assertEqual(advice_jobs.fail_abandoned_jobs(), 1)
+            return 'Pay it off.'
+
+        with mock.patch.object(advice_context, 'get_advice_context', return_value={'user': 'queued'}), \
+                mock.patch.object(agents, 'get_financial_advice', side_effect=slow_answer):
+            advice_jobs.run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (AdviceJob.FAILED, 'The advice request timed out'))
+        self.assertIsNone(job.advice)
+        self.assertFalse(FinancialAdvice.objects.filter(user=self.user).exists())
+
+
+class RateLimiterTests(SimpleTestCase):
+    """Upstream requests are admitted by token buckets, lanes and the daily quota"""
+
+    def test_request_is_shed_when_tokens_do_not_arrive_before_the_deadline(self):
+        limiter = RateLimiter({'host': (1, 1)})
+        limiter.acquire('host', 'quote')
+
+        with self.assertRaises(RateLimitExceeded) as raised:
+            limiter.acquire('host', 'quote', timeout=0.1)
+        self.assertAlmostEqual(raised.exception.retry_after, 1, places=1)
+        self.assertEqual(limiter.stats()['host']['endpoints']['quote']['shed'], 1)
+
+    def test_low_priority_lane_leaves_reserve_for_urgent_lane(self):
+        limiter = RateLimiter({'host': (0.001, 4)}, lane_reserves={0: 0.0, 2: 0.5})
+        limiter.acquire('host', 'news', priority=2)
+        limiter.acquire('host', 'news', priority=2)
+
+        with self.assertRaises(RateLimitExceeded):
+            limiter.acquire('host', 'news', priority=2)
+        limiter.acquire('host', 'quote', priority=0)
+        limiter.acquire('host', 'quote', priority=0)
+
+    def test_daily_quota_is_enforced(self):
+        limiter = RateLimiter({'host': (100, 100)}, daily_quotas={'host': 1})
+        limiter.acquire('host', 'quote')
+
+        with self.assertRaises(RateLimitExceeded):
+            limiter.acquire('host', 'quote', timeout=5)
+        self.assertEqual(limiter.stats()['host']['daily_quota_used'], 1)
+
+
+class RateLimitedViewTests(APITestCase):
+    """Requests shed by the rate limiter surface as 429 instead of upstream errors"""
+
+    def test_shed_request_returns_429_with_retry_after(self):
+        self.client.force_authenticate(User.objects.create_user(username='trader', password='s3cret-pass'))
+        shed = RateLimitExceeded('Rate limit exceeded', 'host', 'get_stock_quote', retry_after=1.2)
+
+        with mock.patch.object(finance_data_service.rate_limiter, 'acquire', side_effect=shed):
+            response = self.client.get(reverse('stock_quote'), {'symbol': 'RATE-LIMITED'})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '2')
+
+
+class UpstreamResilienceTests(APITestCase):
+    """Failing upstream calls trip the circuit and fall back to stale cached data"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='resilient', password='s3cret-pass'))
+        finance_data_service.response_cache.clear()
+        self.addCleanup(finance_data_service.response_cache.clear)
+
+    def test_circuit_opens_after_failures_and_half_opens_after_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        # Only one trial request while half-open
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_expired_response_is_served_stale_when_upstream_fails(self):
+        service = finance_data_service.FinanceDataService
+        with mock.patch.object(service, '_fetch', return_value=(200, {'data': {'price': 10}})):
+            service.get_stock_quote('STALE')
+
+        key = finance_data_service.response_cache.make_key(
+            'get_stock_quote', 'https://real-time-finance-data.p.rapidapi.com/stock-quote',
+            {'symbol': 'STALE', 'language': 'en'},
+        )
+        _, entry, _ = finance_data_service.response_cache.local.get(key)
+        # Expired longer ago than the stale-while-revalidate window
+        finance_data_service.response_cache.local.set(key, (time.time() - 3600, entry[1]), time.time() + 60)
+
+        with mock.patch.object(service, '_fetch', side_effect=ConnectionError('down')):
+            data = service.get_stock_quote('STALE')
+
+        self.assertEqual(data['data'], {'price': 10})
+        self.assertEqual(data['stale']['reason'], 'upstream_unavailable')
+
+    def test_failing_upstream_without_cache_returns_503(self):
+        service = finance_data_service.FinanceDataService
+        with mock.patch.object(service, '_fetch', return_value=(502, {'message': 'Bad gateway'})):
+            response = self.client.get(reverse('stock_quote'), {'symbol': 'DOWN'})
+
+        self.assertEqual(response.status_code, 503)
+
+    def test_sync_retries_pass_through_the_rate_limiter(self):
+        failure = mock.Mock(status_code=503, headers={})
+        success = mock.Mock(status_code=200, headers={})
+        success.json.return_value = {'data': {'price': 10}}
+        session = mock.Mock(get=mock.Mock(side_effect=[failure, success]))
+        service = finance_data_service.FinanceDataService
+
+        with mock.patch.object(finance_data_service, 'get_session', return_value=session), \
+                mock.patch.object(finance_data_service.rate_limiter, 'acquire') as acquire, \
+                mock.patch.object(finance_data_service.time, 'sleep'):
+            status, data = service._fetch('get_stock_quote', 'host', 'https://host/stock-quote')
+
+        self.assertEqual((status, data), (200, {'data': {'price': 10}}))
+        self.assertEqual(acquire.call_count, 2)
+
+    def test_body_that_is_not_json_is_reported_with_its_status(self):
+        page = mock.Mock(status_code=200, headers={})
+        page.json.side_effect = ValueError('Expecting value')
+        session = mock.Mock(get=mock.Mock(return_value=page))
+        breakers = CircuitBreakerRegistry()
+
+        with mock.patch.object(finance_data_service, 'get_session', return_value=session), \
+                mock.patch.object(finance_data_service, 'circuit_breakers', breakers), \
+                mock.patch.object(finance_data_service.rate_limiter, 'acquire'):
+            first = self.client.get(reverse('stock_quote'), {'symbol': 'HTML'})
+            # Not cached, so the next call asks upstream again
+            self.client.get(reverse('stock_quote'), {'symbol': 'HTML'})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data, {'error': finance_data_service.NON_JSON_ERROR})
+        self.assertEqual(session.get.call_count, 2)
+        self.assertEqual(breakers.get(finance_data_service.RAPIDAPI_HOST_FINANCE, 'get_stock_quote').failures, 0)
+
+    def test_every_failed_attempt_counts_against_the_circuit(self):
+        failure = mock.Mock(status_code=503, headers={})
+        failure.json.return_value = {'message': 'Service unavailable'}
+        session = mock.Mock(get=mock.Mock(return_value=failure))
+        breakers = CircuitBreakerRegistry(failure_threshold=3)
+
+        with mock.patch.object(finance_data_service, 'get_session', return_value=session), \
+                mock.patch.object(finance_data_service, 'circuit_breakers', breakers), \
+                mock.patch.object(finance_data_service.rate_limiter, 'acquire'), \
+                mock.patch.object(finance_data_service.time, 'sleep') as sleep:
+            first = self.client.get(reverse('stock_quote'), {'symbol': 'DEAD'})
+            second = self.client.get(reverse('stock_quote'), {'symbol': 'DEAD'})
+
+        self.assertEqual((first.status_code, second.status_code), (503, 503))
+        # Two retried failures plus the returned one open the circuit within the first call
+        self.assertEqual(session.get.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(breakers.get(finance_data_service.RAPIDAPI_HOST_FINANCE, 'get_stock_quote').state,
+                         CircuitBreaker.OPEN)
+
+    def test_async_fetch_does_not_sleep_through_a_long_retry_after(self):
+        response = mock.Mock(status_code=429, headers={'Retry-After': '3600'})
+        response.json.return_value = {'message': 'Too many requests'}
+        client = mock.Mock(get=mock.AsyncMock(return_value=response))
+        service = async_finance_data_service.AsyncFinanceDataService
+
+        with mock.patch.object(async_finance_data_service, 'get_async_client', return_value=client), \
+                mock.patch.object(async_finance_data_service.rate_limiter, 'aacquire', mock.AsyncMock()):
+            started = time.monotonic()
+            status, _ = asyncio.run(service._fetch('get_stock_quote', 'host', 'https://host/stock-quote'))
+
+        self.assertEqual(status, 429)
+        self.assertEqual(client.get.await_count, 1)
+        self.assertLess(time.monotonic() - started, 1)
+
+
+class QuoteHubTests(SimpleTestCase):
+    """Quote streams share one poller per symbol and only push changed fields"""
+
+    def test_subscribers_share_a_poller_and_get_only_changes(self):
+        quotes = iter([
+            {'data': {'symbol': 'AAPL', 'price': 100, 'volume': 5}},
+            {'data': {'symbol': 'AAPL', 'price': 100, 'volume': 5}},
+            {'data': {'symbol': 'AAPL', 'price': 101, 'volume': 5}},
+            {'data': {'symbol': 'AAPL', 'price': 101, 'volume': 5}, 'stale': {'reason': 'upstream_unavailable'}},
+        ])
+        fetch = mock.AsyncMock(side_effect=lambda symbol, language, max_age: next(quotes))
+
+        async def scenario():
+            hub = QuoteHub(interval=0.01)
+            first = hub.subscribe(['aapl'])
+            second = hub.subscribe(['AAPL'])
+            events = [await first.get(), await first.get(), await first.get(), await second.get(), await second.get()]
+            stats = hub.stats()
+            hub.unsubscribe(first)
+            hub.unsubscribe(second)
+            return events, stats, hub.stats()
+
+        with mock.patch(
+            'finance_api.services.quote_hub.AsyncFinanceDataService.get_stock_quote', fetch
+        ):
+            events, stats, after = asyncio.run(scenario())
+
+        self.assertEqual(events[0], {
+            'type': 'snapshot', 'symbol': 'AAPL', 'fields': {'symbol': 'AAPL', 'price': 100, 'volume': 5}, 'stale': None,
+        })
+        self.assertEqual(events[1], {'type': 'quote', 'symbol': 'AAPL', 'fields': {'price': 101}, 'stale': None})
+        # Nothing changed but the quote now comes from an expired cache entry
+        self.assertEqual(events[2], {'type': 'quote', 'symbol': 'AAPL', 'fields': {}, 'stale': 'upstream_unavailable'})
+        self.assertEqual(events[3:], events[:2])
+        self.assertEqual(stats['symbols'], 1)
+        self.assertEqual(fetch.await_count, 4)
+        self.assertEqual(fetch.await_args.kwargs['max_age'], 0.005)
+        self.assertEqual(after['symbols'], 0)
+
+    def test_polls_refetch_quotes_older_than_max_age(self):
+        service = async_finance_data_service.AsyncFinanceDataService
+        cache = async_finance_data_service.response_cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+        key = cache.make_key('get_stock_quote', 'https://real-time-finance-data.p.rapidapi.com/stock-quote',
+                             {'symbol': 'POLL', 'language': 'en'})
+        # Cached three seconds ago under the 15 second quote TTL
+        cache.set(key, {'data': {'price': 1}}, finance_data_service.CACHE_TTLS['get_stock_quote'] - 3)
+
+        with mock.patch.object(service, '_refresh', mock.AsyncMock(return_value={'data': {'price': 2}})):
+            cached = asyncio.run(service.get_stock_quote('POLL'))
+            polled = asyncio.run(service.get_stock_quote('POLL', max_age=2.5))
+
+        self.assertEqual(cached, {'data': {'price': 1}})
+        self.assertEqual(polled, {'data': {'price': 2}})
+
+        # A failed refetch falls back to the cached quote, which is still within its TTL
+        failure = UpstreamUnavailable('down', 'host', 'get_stock_quote')
+        with mock.patch.object(service, '_refresh', mock.AsyncMock(side_effect=failure)):
+            fallback = asyncio.run(service.get_stock_quote('POLL', max_age=0))
+        self.assertEqual(fallback, {'data': {'price': 1}})
+
+
+class SymbolIndexTests(SimpleTestCase):
+    """Symbol search is answered from the local index before calling RapidAPI"""
+
+    def setUp(self):
+        pages = {
+            ('1', 'STOCKS'): {'body': [
+                {'symbol': 'AAPL', 'name': 'Apple Inc. Common Stock'},
+                {'symbol': 'MSFT', 'name': 'Microsoft Corporation Common Stock'},
+            ]},
+            ('2', 'STOCKS'): {'body': [{'symbol': 'AMZN', 'name': 'Amazon.com, Inc. Common Stock'}]},
+            ('1', 'ETFS'): {'body': [{'symbol': 'SPY', 'name': 'SPDR S&P 500 ETF Trust'}]},
+        }
+        with mock.patch.object(
+            finance_data_service.FinanceDataService, 'get_market_tickers',
+            side_effect=lambda page, type, use_cache: pages.get((page, type), {'body': []}),
+        ):
+            self.index = symbol_index.build_symbol_index(['STOCKS', 'ETFS'])
+
+    def symbols(self, query):
+        return [result['symbol'] for result in self.index.search(query)]
+
+    def test_prefix_and_fuzzy_matches(self):
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.symbols('AM')[0], 'AMZN')
+        self.assertEqual(self.symbols('micro')[0], 'MSFT')
+        self.assertEqual(self.symbols('apple inc')[0], 'AAPL')
+        # Typos fall back to trigram similarity
+        self.assertEqual(self.symbols('amazn')[0], 'AMZN')
+        self.assertEqual(self.symbols('microsft')[0], 'MSFT')
+        self.assertEqual(self.symbols('qqqqqq'), [])
+
+    def test_search_uses_persisted_index_before_rapidapi(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'symbols.json.gz')
+            self.index.save(path)
+            service = finance_data_service.FinanceDataService
+            with mock.patch.object(symbol_index, 'SYMBOL_INDEX_PATH', path), \
+                    mock.patch.object(service, '_get', return_value={'status': 'OK', 'data': {}}) as remote:
+                local = service.search_symbols('spdr')
+                service.search_symbols('zzzz')
+
+        self.assertEqual(local['source'], 'local_index')
+        self.assertEqual(local['data']['etf'][0]['symbol'], 'SPY')
+        remote.assert_called_once()
+
+    def test_build_reads_upstream_and_fails_on_error_pages(self):
+        service = finance_data_service.FinanceDataService
+        finance_data_service.response_cache.clear()
+        self.addCleanup(finance_data_service.response_cache.clear)
+        first_page = {'body': [{'symbol': 'AAPL', 'name': 'Apple Inc. Common Stock'}]}
+        with mock.patch.object(service, '_fetch', return_value=(200, {'body': [{'symbol': 'OLD', 'name': 'Cached'}]})):
+            service.get_market_tickers('1', 'STOCKS')
+
+        for failure, error in (((403, {'message': 'Not subscribed'}), UpstreamUnavailable),
+                               ((200, {'message': 'Try again later'}), ValueError)):
+            with mock.patch.object(service, '_fetch', side_effect=[(200, first_page), failure]) as fetch:
+                with self.assertRaises(error):
+                    symbol_index.build_symbol_index(['STOCKS'])
+            # The cached first page was fetched again rather than served from the cache
+            self.assertEqual(fetch.call_count, 2)
+
+
+class TickerSnapshotTests(APITestCase):
+    """Crawls write versioned snapshots that market_tickers filters, sorts and pages"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='screener', password='s3cret-pass'))
+
+    def crawl(self, rows, page_size=2):
+        pages = [rows[i:i + page_size] for i in range(0, len(rows), page_size)]
+        with mock.patch.object(
+            finance_data_service.FinanceDataService, 'get_market_tickers',
+            side_effect=lambda page, type, use_cache: {'body': pages[int(page) - 1] if int(page) <= len(pages) else []},
+        ):
+            return ticker_snapshots.crawl_tickers('STOCKS', concurrency=2)
+
+    def test_crawl_is_incremental_and_versioned(self):
+        first = self.crawl([
+            {'symbol': 'AAPL', 'name': 'Apple Inc.', 'lastsale': '$190.00', 'marketCap': '2,900,000'},
+            {'symbol': 'MSFT', 'name': 'Microsoft Corp', 'lastsale': '$410.50', 'marketCap': '3,100,000'},
+            {'symbol': 'IBM', 'name': 'IBM', 'lastsale': '$180.00', 'marketCap': '160,000'},
+        ])
+        second = self.crawl([
+            {'symbol': 'AAPL', 'name': 'Apple Inc.', 'lastsale': '$191.00', 'marketCap': '2,900,000'},
+            {'symbol': 'MSFT', 'name': 'Microsoft Corp', 'lastsale': '$410.50', 'marketCap': '3,100,000'},
+            {'symbol': 'NVDA', 'name': 'NVIDIA', 'lastsale': '$120.00', 'marketCap': '2,950,000'},
+        ])
+
+        self.assertEqual((first.version, first.status, first.pages, first.added), (1, TickerSnapshot.COMPLETE, 2, 3))
+        self.assertEqual((second.version, second.added, second.changed, second.removed), (2, 1, 1, 1))
+        self.assertEqual(MarketTicker.objects.get(symbol='MSFT').updated_version, 1)
+        self.assertEqual(MarketTicker.objects.get(symbol='AAPL').last_sale, 191.0)
+
+        response = self.client.get(reverse('market_tickers'), {
+            'type': 'STOCKS', 'min_market_cap': '1000000', 'ordering': '-market_cap', 'page_size': '2',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['meta']['version'], 2)
+        self.assertEqual(response.data['meta']['total'], 3)
+        self.assertEqual([row['symbol'] for row in response.data['body']], ['MSFT', 'NVDA'])
+
+        response = self.client.get(reverse('market_tickers'), {'type': 'STOCKS', 'changed_since': '1'})
+        self.assertEqual([row['symbol'] for row in response.data['body']], ['AAPL', 'NVDA'])
+
+    def test_failed_page_fails_the_snapshot(self):
+        complete = self.crawl([{'symbol': 'AAPL', 'name': 'Apple Inc.'}])
+        finance_data_service.response_cache.clear()
+        self.addCleanup(finance_data_service.response_cache.clear)
+        answers = {
+            '1': (200, {'body': [{'symbol': 'AAPL', 'name': 'Apple Inc.'}]}),
+            '2': (403, {'message': 'You are not subscribed to this API.'}),
+            '3': (200, {'body': [{'symbol': 'MSFT', 'name': 'Microsoft Corp'}]}),
+        }
+
+        with mock.patch.object(
+            finance_data_service.FinanceDataService, '_fetch',
+            side_effect=lambda method, host, url, params: answers.get(params['page'], (200, {'body': []})),
+        ):
+            failed = ticker_snapshots.crawl_tickers('STOCKS', concurrency=2)
+
+        self.assertEqual(failed.status, TickerSnapshot.FAILED)
+        self.assertIn('403', failed.error)
+        self.assertEqual(ticker_snapshots.latest_snapshot('STOCKS').pk, complete.pk)
+
+    def test_invalid_parameters_return_400(self):
+        self.crawl([{'symbol': 'AAPL', 'name': 'Apple Inc.'}])
+        response = self.client.get(reverse('market_tickers'), {'ordering': 'volume'})
+        self.assertEqual(response.status_code, 400)
+
+
+class MetricsTests(APITestCase):
+    """Views, upstream calls and DB queries are recorded and exposed on /metrics"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='operator', password='s3cret-pass'))
+
+    def sample(self, text, line_start):
+        return next((float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(line_start)), 0)
+
+    def test_scrape_reports_view_and_upstream_histograms(self):
+        before = registry.render()
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'status': 'OK', 'data': {'symbol': 'AAPL', 'price': 190.0}}
+        with mock.patch.object(finance_data_service, 'get_session') as get_session:
+            get_session.return_value.get.return_value = response
+            self.assertEqual(self.client.get(reverse('stock_quote'), {'symbol': 'MTRC'}).status_code, 200)
+        self.assertEqual(self.client.get(reverse('portfolio-list')).status_code, 200)
+
+        scrape = self.client.get(reverse('metrics'))
+        self.assertEqual(scrape.status_code, 200)
+        text = scrape.content.decode()
+        view = 'finance_http_request_duration_seconds_count{view="portfolio-list",method="GET",status="200"}'
+        self.assertEqual(self.sample(text, view) - self.sample(before, view), 1)
+        self.assertGreater(self.sample(text, 'finance_http_request_db_queries_sum{view="portfolio-list"}'), 0)
+        self.assertIn(
+            'finance_upstream_request_duration_seconds_count{method="get_stock_quote",'
+            'host="real-time-finance-data.p.rapidapi.com",outcome="2xx"}',
+            text,
+        )
+        self.assertIn('finance_cache_hit_ratio{cache="response",method="get_stock_quote"}', text)
+
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.7').status_code, 403)
+
+
+class PriceHistoryTests(APITestCase):
+    """Ingested bars are appended per symbol, rolled up and charted from disk"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='charter', password='s3cret-pass'))
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(price_history, 'PRICE_HISTORY_PATH', directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def history(self, start, closes):
+        return {'body': {
+            str(start + i * 60): {'date_utc': start + i * 60, 'open': close, 'high': close + 1,
+                                  'low': close - 1, 'close': close, 'volume': 10}
+            for i, close in enumerate(closes)
+        }}
+
+    def test_ingest_appends_and_rolls_up(self):
+        start = 1704205800  # 2024-01-02 14:30 UTC
+        service = finance_data_service.FinanceDataService
+        with mock.patch.object(service, 'get_stock_history', side_effect=[
+            self.history(start, [100, 101, 102]),
+            # Overlaps the stored bars and updates the last one
+            self.history(start + 60, [101, 105, 106]),
+        ]):
+            self.assertEqual(price_history.ingest_history('aapl', '1m'), 3)
+            self.assertEqual(price_history.ingest_history('AAPL', '1m'), 2)
+
+        store = price_history.get_price_store()
+        minutes = store.range('AAPL', '1m', 0, price_history.MAX_TIMESTAMP)
+        self.assertEqual(minutes['close'].tolist(), [100, 101, 105, 106])
+        hours = store.range('AAPL', '1h', 0, price_history.MAX_TIMESTAMP)
+        self.assertEqual(hours['ts'].tolist(), [start - 30 * 60])
+        self.assertEqual(
+            [hours[name][0] for name in ('open', 'high', 'low', 'close', 'volume')], [100, 107, 99, 106, 40]
+        )
+        self.assertEqual(store.range('AAPL', '1d', 0, price_history.MAX_TIMESTAMP)['close'].tolist(), [106])
+
+        response = self.client.get(reverse('chart'), {'symbol': 'AAPL', 'interval': '5m'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['source'], response.data['count']), ('1m', 1))
+        self.assertEqual((response.data['o'], response.data['c'], response.data['v']), ([100], [106], [40]))
+
+        # interval=auto without a start charts the last AUTO_CHART_SPAN
+        response = self.client.get(reverse('chart'), {'symbol': 'AAPL'})
+        self.assertEqual(response.data['interval'], '1d')
+        self.assertEqual(response.data['end'] - response.data['start'], price_history.AUTO_CHART_SPAN)
+        self.assertEqual(response.data['c'], [106])
+
+        response = self.client.get(reverse('chart'), {'symbol': 'AAPL', 'interval': '2m'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PortfolioRiskTests(APITestCase):
+    """Risk statistics come from stored daily closes and are cached per portfolio and day"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='risk', password='s3cret-pass')
+        self.client.force_authenticate(self.user)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(price_history, 'PRICE_HISTORY_PATH', directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_risk_report(self):
+        rng = np.random.default_rng(7)
+        days = np.arange(500) * 86400 + (int(time.time()) // 86400 - 500) * 86400
+        market = rng.normal(0.0005, 0.01, len(days))
+        store = price_history.get_price_store()
+        for symbol, beta in (('HIGH', 1.5), ('LOW', 0.5), ('^GSPC', 1.0)):
+            noise = rng.normal(0, 0.002, len(days)) if symbol != '^GSPC' else 0
+            closes = 100 * np.cumprod(1 + beta * market + noise)
+            store.write(symbol, '1d', {
+                'ts': days, 'open': closes, 'high': closes, 'low': closes, 'close': closes, 'volume': np.ones(len(days)),
+            })
+        portfolio = Portfolio.objects.create(user=self.user, name='Risk')
+        for symbol in ('HIGH', 'LOW'):
+            Stock.objects.create(portfolio=portfolio, symbol=symbol, name=symbol, quantity=10,
+                                 purchase_price=100, purchase_date=date(2024, 1, 2))
+
+        with mock.patch.object(portfolio_risk, 'compute_portfolio_risk',
+                               wraps=portfolio_risk.compute_portfolio_risk) as compute:
+            response = self.client.get(reverse('portfolio-risk', args=[portfolio.id]))
+            cached = self.client.get(reverse('portfolio-risk', args=[portfolio.id]), {'covariance': 'true'})
+        self.assertEqual(compute.call_count, 1)
+
+        self.assertEqual(response.status_code, 200)
+        betas = {asset['symbol']: asset['beta'] for asset in response.data['assets']}
+        self.assertAlmostEqual(betas['HIGH'], 1.5, delta=0.05)
+        self.assertAlmostEqual(betas['LOW'], 0.5, delta=0.05)
+        self.assertEqual(response.data['observations'], 499)
+        for level in response.data['var']:
+            self.assertGreater(level['historical_cvar'], level['historical_var'])
+            self.assertGreater(level['parametric_var'], 0)
+        self.assertNotIn('covariance', response.data)
+        self.assertEqual(cached.data['covariance']['symbols'], ['HIGH', 'LOW'])
+
+    def test_invalid_holding_symbols_are_excluded_and_stale_history_is_refreshed(self):
+        days = np.arange(300) * 86400 + (int(time.time()) // 86400 - 310) * 86400
+        closes = 100 * np.cumprod(1 + np.random.default_rng(3).normal(0, 0.01, len(days)))
+        price_history.get_price_store().write('OLD', '1d', {
+            'ts': days, 'open': closes, 'high': closes, 'low': closes, 'close': closes, 'volume': np.ones(len(days)),
+        })
+        portfolio = Portfolio.objects.create(user=self.user, name='Mixed')
+        for symbol in ('OLD', 'BRK B'):
+            Stock.objects.create(portfolio=portfolio, symbol=symbol, name=symbol, quantity=10,
+                                 purchase_price=100, purchase_date=date(2024, 1, 2))
+
+        with mock.patch.object(portfolio_risk, 'ingest_history') as ingest:
+            response = self.client.get(reverse('portfolio-risk', args=[portfolio.id]))
+            invalid = self.client.get(reverse('portfolio-risk', args=[portfolio.id]), {'benchmark': 'NOT A SYMBOL'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['excluded_symbols'], ['BRK B'])
+        # History ten days old is refreshed before the report is computed
+        self.assertIn(mock.call('OLD', '1d', mock.ANY), ingest.call_args_list)
+        self.assertEqual(response.data['stale_symbols'], ['OLD'])
+        self.assertEqual(invalid.status_code, 400)
+        self.assertIn('benchmark', invalid.data['error'])
+
+
+class RetirementProjectionTests(APITestCase):
+    """Monte Carlo projections are reproducible per seed and exact without volatility"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='retiree', password='s3cret-pass')
+        self.client.force_authenticate(self.user)
+
+    def test_projection_without_volatility_compounds_exactly(self):
+        plan = retirement_simulation.parse_plan({
+            'current_age': 55, 'retirement_age': 65, 'end_age': 70, 'current_savings': 100000,
+            'expected_return': 0.05, 'volatility': 0, 'inflation': 0, 'annual_withdrawal': 50000,
+        })
+        projection = retirement_simulation.project_retirement(plan, paths=100, workers=1, use_cache=False)
+
+        self.assertAlmostEqual(projection['balance_at_retirement']['5'], 100000 * 1.05 ** 10, places=0)
+        self.assertEqual(projection['balance_at_retirement']['5'], projection['balance_at_retirement']['95'])
+        # 162,889 lasts three withdrawals of 50,000 and runs out in the fourth year, at 69
+        self.assertEqual(projection['success_probability'], 0)
+        self.assertEqual(projection['depletion_age']['50'], 69)
+
+    def test_api_returns_reproducible_bands(self):
+        body = {
+            'current_age': 35, 'retirement_age': 65, 'current_savings': 50000,
+            'annual_contribution': 12000, 'annual_withdrawal': 60000, 'paths': 2000, 'seed': 3,
+        }
+        response = self.client.post(reverse('retirement_projection'), body, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['percentiles']), {'5', '25', '50', '75', '95'})
+        self.assertEqual(len(response.data['percentiles']['50']), len(response.data['ages']))
+        self.assertTrue(0 < response.data['success_probability'] < 1)
+        bands = [response.data['balance_at_retirement'][q] for q in ('5', '25', '50', '75', '95')]
+        self.assertEqual(bands, sorted(bands))
+
+        plan = retirement_simulation.parse_plan(body)
+        uncached = retirement_simulation.project_retirement(plan, 2000, seed=3, use_cache=False)
+        self.assertEqual(uncached['percentiles'], response.data['percentiles'])
+
+        invalid = self.client.post(reverse('retirement_projection'), {'current_age': 70, 'retirement_age': 60}, format='json')
+        self.assertEqual(invalid.status_code, 400)
+
+        too_many = self.client.post(
+            reverse('retirement_projection'),
+            {**body, 'paths': retirement_simulation.RETIREMENT_API_MAX_PATHS + 1}, format='json',
+        )
+        self.assertEqual(too_many.status_code, 400)
@@ -1,15 +1,35 @@
-from django.urls import path
+from django.urls import path, re_path, include
+from rest_framework.routers import DefaultRouter
 from .views.finance_views import (
     company_cash_flow,
     company_data,
     stock_price,
     market_news,
     stock_quote,
+    batch_quotes,
     search_symbols,
     market_tickers,
     ticker_details,
     ticker_news,
+    chart,
+    rate_limits,
+    circuit_breakers,
 )
+from .views import async_finance_views
+from .views import (
+    PortfolioViewSet,
+    get_ai_advice,
+    stream_ai_advice,
+    enqueue_advice_job,
+    get_advice_job,
+    get_advice_history,
+    retirement_projection,
+)
+
+router = DefaultRouter()
+# Accept routes with or without the trailing slash
+router.trailing_slash = '/?'
+router.register('portfolios', PortfolioViewSet, basename='portfolio')
 
 urlpatterns = [
     # Finance API endpoints
@@ -18,8 +38,38 @@ urlpatterns = [
     path('finance/stock-price/', stock_price, name='stock_price'),
     path('finance/market-news/', market_news, name='market_news'),
     path('finance/stock-quote/', stock_quote, name='stock_quote'),
+    re_path(r'^finance/quotes/batch/?$', batch_quotes, name='batch_quotes'),
+    re_path(r'^finance/quotes/stream/?$', async_finance_views.quote_stream, name='quote_stream'),
     path('finance/search/', search_symbols, name='search_symbols'),
     path('finance/market-tickers/', market_tickers, name='market_tickers'),
     path('finance/ticker-details/<str:ticker>/', ticker_details, name='ticker_details'),
     path('finance/ticker-news/<str:ticker>/', ticker_news, name='ticker_news'),
+    path('finance/chart/', chart, name='chart'),
+    path('finance/rate-limits/', rate_limits, name='rate_limits'),
+    path('finance/circuit-breakers/', circuit_breakers, name='circuit_breakers'),
+    
+    # Async (ASGI) variants of the finance endpoints
+    path('finance/async/company-cash-flow/', async_finance_views.company_cash_flow, name='async_company_cash_flow'),
+    path('finance/async/company-data/', async_finance_views.company_data, name='async_company_data'),
+    path('finance/async/stock-price/', async_finance_views.stock_price, name='async_stock_price'),
+    path('finance/async/market-news/', async_finance_views.market_news, name='async_market_news'),
+    path('finance/async/stock-quote/', async_finance_views.stock_quote, name='async_stock_quote'),
+    re_path(r'^finance/async/quotes/batch/?$', async_finance_views.batch_quotes, name='async_batch_quotes'),
+    path('finance/async/search/', async_finance_views.search_symbols, name='async_search_symbols'),
+    path('finance/async/market-tickers/', async_finance_views.market_tickers, name='async_market_tickers'),
+    path('finance/async/ticker-details/<str:ticker>/', async_finance_views.ticker_details, name='async_ticker_details'),
+    path('finance/async/ticker-news/<str:ticker>/', async_finance_views.ticker_news, name='async_ticker_news'),
+    
+    # Financial advice endpoints
+    path('advice/', get_ai_advice, name='advice'),
+    path('advice/stream/', stream_ai_advice, name='advice_stream'),
+    path('advice/jobs/', enqueue_advice_job, name='advice_jobs'),
+    path('advice/jobs/<int:job_id>/', get_advice_job, name='advice_job'),
+    path('advice/history/', get_advice_history, name='advice_history'),
+    
+    # Planning endpoints
+    path('retirement/projection/', retirement_projection, name='retirement_projection'),
+    
+    # Portfolio endpoints
+    path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -0,0 +1,304 @@
+from rest_framework import viewsets, status, permissions
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.authtoken.models import Token
+from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth.models import User
+from django.db.models import Prefetch
+from django.db.models.functions import Length, Substr
+from ..models import Portfolio, Stock, FinancialAdvice, AdviceJob
+from ..serializers import (
+    UserSerializer, UserRegistrationSerializer, PortfolioSerializer,
+    StockSerializer, FinancialAdviceSerializer, FinancialAdviceSummarySerializer,
+    AdviceJobSerializer, ADVICE_SUMMARY_LENGTH
+)
+from ..pagination import AdviceHistoryPagination
+from ..streaming import sse_event, sse_response
+from ..agents import get_financial_advice, stream_financial_advice
+from ..services.portfolio_valuation import value_portfolio
+from ..services.portfolio_risk import RISK_BENCHMARK, portfolio_risk
+from ..services.retirement_simulation import (
+    RETIREMENT_API_MAX_PATHS, RETIREMENT_DEFAULT_PATHS, parse_plan, project_retirement, summarize_projection,
+)
+from ..services.advice_cache import hash_context
+from ..services.advice_context import get_advice_context
+from ..services.advice_jobs import QueueFullError, enqueue_job
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Authentication views
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def register_user(request):
+    serializer = UserRegistrationSerializer(data=request.data)
+    if serializer.is_valid():
+        user = serializer.save()
+        if user:
+            # Create a token for the user
+            token, created = Token.objects.get_or_create(user=user)
+            return Response({
+                'user': UserSerializer(user).data,
+                'token': token.key
+            }, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def login_user(request):
+    username = request.data.get('username')
+    password = request.data.get('password')
+    
+    user = authenticate(username=username, password=password)
+    if user:
+        login(request, user)
+        token, created = Token.objects.get_or_create(user=user)
+        return Response({
+            'user': UserSerializer(user).data,
+            'token': token.key
+        })
+    return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def logout_user(request):
+    logout(request)
+    return Response({'message': 'Successfully logged out'})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_user(request):
+    return Response(UserSerializer(request.user).data)
+
+# Portfolio viewset
+class PortfolioViewSet(viewsets.ModelViewSet):
+    serializer_class = PortfolioSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = Portfolio.objects.filter(user=self.request.user)
+        if self.action in ('list', 'retrieve'):
+            # Load only the serialized columns and fetch every portfolio's
+            # holdings in one extra query instead of one per portfolio
+            queryset = queryset.only(
+                'id', 'name', 'description', 'created_at', 'updated_at'
+            ).prefetch_related(
+                Prefetch('stocks', queryset=Stock.objects.order_by('id'))
+            )
+        return queryset
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+    
+    @action(detail=True, methods=['get'])
+    def valuation(self, request, pk=None):
+        """Value the portfolio's holdings at current market prices"""
+        portfolio = self.get_object()
+        holdings = portfolio.stocks.values_list('id', 'symbol', 'name', 'quantity', 'purchase_price')
+        
+        valuation = value_portfolio(holdings, request.GET.get('language', 'en'))
+        valuation['portfolio'] = {'id': portfolio.id, 'name': portfolio.name}
+        return Response(valuation)
+    
+    @action(detail=True, methods=['get'])
+    def risk(self, request, pk=None):
+        """
+        Volatility, beta, VaR/CVaR and max drawdown from daily price history
+        
+        The covariance matrix is only included with ?covariance=true.
+        """
+        portfolio = self.get_object()
+        holdings = portfolio.stocks.values_list('id', 'symbol', 'name', 'quantity', 'purchase_price')
+        
+        try:
+            report = portfolio_risk(portfolio.id, holdings, request.GET.get('benchmark') or RISK_BENCHMARK)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if report is None:
+            return Response(
+                {'error': 'Not enough price history for any holding'}, status=status.HTTP_404_NOT_FOUND
+            )
+        if request.GET.get('covariance', '').lower() != 'true':
+            report = {key: value for key, value in report.items() if key != 'covariance'}
+        report['portfolio'] = {'id': portfolio.id, 'name': portfolio.name}
+        return Response(report)
+
+# Stock viewset
+class StockViewSet(viewsets.ModelViewSet):
+    serializer_class = StockSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        portfolio_id = self.kwargs.get('portfolio_pk')
+        queryset = Stock.objects.filter(portfolio__user=self.request.user).select_related('portfolio')
+        if portfolio_id:
+            return queryset.filter(portfolio_id=portfolio_id)
+        return queryset
+    
+    def perform_create(self, serializer):
+        portfolio_id = self.kwargs.get('portfolio_pk')
+        portfolio = Portfolio.objects.get(id=portfolio_id, user=self.request.user)
+        serializer.save(portfolio=portfolio)
+
+# Financial Advice views
+def with_retirement_projection(context, plan_data):
+    """
+    Add the projection of an optional retirement plan to the advice context
+    
+    The specialist chains cannot call tools, so the numbers are computed up
+    front; the cached per-user context is copied, not modified.
+    
+    Raises:
+        ValueError: If the plan is invalid
+    """
+    if not plan_data:
+        return context
+    projection = project_retirement(parse_plan(plan_data))
+    return {**context, 'retirement_projection': summarize_projection(projection)}
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def get_ai_advice(request):
+    question = request.data.get('question')
+    if not question:
+        return Response({'error': 'Question is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Get context data: the user's holdings, allocation and P&L (cached per user)
+    context = get_advice_context(request.user)
+    try:
+        context = with_retirement_projection(context, request.data.get('retirement_plan'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Get advice from our multi-agent system
+    advice = get_financial_advice(question, context)
+    
+    # Save the question and answer
+    financial_advice = FinancialAdvice.objects.create(
+        user=request.user,
+        question=question,
+        answer=advice,
+        context_hash=hash_context(context),
+    )
+    
+    serializer = FinancialAdviceSerializer(financial_advice)
+    return Response(serializer.data)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def stream_ai_advice(request):
+    """
+    Stream advice as server-sent events while the model generates it.
+    
+    Emits 'token' events ({'text': ...}) as chunks arrive, then a 'done'
+    event with the saved FinancialAdvice, or an 'error' event on failure.
+    """
+    question = request.data.get('question')
+    if not question:
+        return Response({'error': 'Question is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    user = request.user
+    context = get_advice_context(user)
+    try:
+        context = with_retirement_projection(context, request.data.get('retirement_plan'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    def events():
+        chunks = []
+        try:
+            for chunk in stream_financial_advice(question, context):
+                chunks.append(chunk)
+                yield sse_event('token', {'text': chunk})
+        except Exception as e:
+            logger.error(f"Error streaming financial advice: {e}")
+            yield sse_event('error', {'error': str(e)})
+            return
+        
+        # Save the question and the complete answer
+        financial_advice = FinancialAdvice.objects.create(
+            user=user,
+            question=question,
+            answer=''.join(chunks),
+            context_hash=hash_context(context),
+        )
+        yield sse_event('done', FinancialAdviceSerializer(financial_advice).data)
+    
+    return sse_response(request, events())
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def enqueue_advice_job(request):
+    """
+    Queue a question for the advice worker pool and return immediately.
+    
+    Responds 202 with the job; poll get_advice_job until its status is
+    'succeeded' or 'failed'.
+    """
+    question = request.data.get('question')
+    if not question:
+        return Response({'error': 'Question is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        job = enqueue_job(request.user, question)
+    except QueueFullError as e:
+        return Response({'error': str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    return Response(AdviceJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_advice_job(request, job_id):
+    """Return the status of one of the user's advice jobs, with the advice once answered"""
+    job = AdviceJob.objects.select_related('advice').filter(user=request.user, pk=job_id).first()
+    if job is None:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(AdviceJobSerializer(job).data)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def retirement_projection(request):
+    """
+    Monte Carlo projection of a retirement plan
+    
+    The body holds the plan fields (see PLAN_FIELDS), plus optional 'paths'
+    (up to RETIREMENT_API_MAX_PATHS) and 'seed'; the same body always gives
+    the same projection. The simulation runs in this thread; larger runs
+    belong to the run_retirement_projection command.
+    """
+    try:
+        plan = parse_plan(request.data)
+        paths = int(request.data.get('paths', RETIREMENT_DEFAULT_PATHS))
+        seed = int(request.data.get('seed', 0))
+        if paths > RETIREMENT_API_MAX_PATHS:
+            raise ValueError(f'paths must be at most {RETIREMENT_API_MAX_PATHS}')
+        projection = project_retirement(plan, paths, seed)
+    except (TypeError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(projection)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_advice_history(request):
+    """
+    Return the user's advice history, newest first, one cursor page at a time.
+    
+    Pass ?summary=true to receive answers truncated to ADVICE_SUMMARY_LENGTH
+    characters; the full answers are then never read from the database.
+    """
+    advice = FinancialAdvice.objects.filter(user=request.user)
+    
+    if request.GET.get('summary', '').lower() in ('1', 'true', 'yes'):
+        advice = advice.defer('answer').annotate(
+            answer_preview=Substr('answer', 1, ADVICE_SUMMARY_LENGTH),
+            answer_length=Length('answer'),
+        )
+        serializer_class = FinancialAdviceSummarySerializer
+    else:
+        serializer_class = FinancialAdviceSerializer
+    
+    paginator = AdviceHistoryPagination()
+    page = paginator.paginate_queryset(advice, request)
+    serializer = serializer_class(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
\ No newline at end of file
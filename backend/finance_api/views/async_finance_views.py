@@ -0,0 +1,316 @@
+import asyncio
+import functools
+import json
+import logging
+import math
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from ..services.async_finance_data_service import AsyncFinanceDataService
+from ..services.finance_data_service import BATCH_MAX_SYMBOLS
+from ..services.circuit_breaker import UpstreamUnavailable
+from ..services.quote_hub import QUOTE_STREAM_HEARTBEAT, QUOTE_STREAM_MAX_SYMBOLS, get_quote_hub
+from ..services.rate_limiter import RateLimitExceeded
+from ..services.ticker_snapshots import query_tickers
+from ..streaming import sse_event, sse_response
+
+logger = logging.getLogger(__name__)
+
+
+def rate_limited_response(error: RateLimitExceeded) -> JsonResponse:
+    """429 response for a request shed by the upstream rate limiter"""
+    response = JsonResponse({'error': str(error)}, status=429)
+    if error.retry_after is not None:
+        response['Retry-After'] = str(math.ceil(error.retry_after))
+    return response
+
+
+def upstream_unavailable_response(error: UpstreamUnavailable) -> JsonResponse:
+    """503 response for an upstream API that is failing and has nothing cached"""
+    response = JsonResponse({'error': str(error)}, status=503)
+    if error.retry_after:
+        response['Retry-After'] = str(math.ceil(error.retry_after))
+    return response
+
+
+def _authenticate(request):
+    """Run the configured DRF authenticators against a plain Django request"""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    return drf_request.user
+
+
+def async_api_view(http_method_names):
+    """
+    Decorator for native async views that mirrors @api_view's access rules.
+
+    DRF's @api_view does not support coroutine views, so this applies the
+    project's default authenticators (off the event loop, since token lookup
+    hits the database) and requires an authenticated user, matching the
+    DEFAULT_PERMISSION_CLASSES setting. Like DRF, CSRF is only enforced by
+    SessionAuthentication.
+    """
+    def decorator(func):
+        @csrf_exempt
+        @functools.wraps(func)
+        async def view(request, *args, **kwargs):
+            if request.method not in http_method_names:
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+            try:
+                user = await sync_to_async(_authenticate)(request)
+            except exceptions.APIException as e:
+                return JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+            if not user or not user.is_authenticated:
+                return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+            request.user = user
+            return await func(request, *args, **kwargs)
+        return view
+    return decorator
+
+@async_api_view(['GET'])
+async def company_cash_flow(request):
+    """Get company cash flow data from RapidAPI"""
+    try:
+        symbol = request.GET.get('symbol')
+        period = request.GET.get('period', 'QUARTERLY')
+        language = request.GET.get('language', 'en')
+
+        if not symbol:
+            return JsonResponse({'error': 'Symbol parameter is required'}, status=400)
+
+        data = await AsyncFinanceDataService.get_company_cash_flow(symbol, period, language)
+        return JsonResponse(data, safe=False)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error getting company cash flow: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@async_api_view(['GET'])
+async def company_data(request):
+    """Get company data from RapidAPI"""
+    try:
+        symbol = request.GET.get('symbol')
+        language = request.GET.get('language', 'en')
+
+        if not symbol:
+            return JsonResponse({'error': 'Symbol parameter is required'}, status=400)
+
+        data = await AsyncFinanceDataService.get_company_data(symbol, language)
+        return JsonResponse(data, safe=False)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error getting company data: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@async_api_view(['GET'])
+async def stock_price(request):
+    """Get stock price data from RapidAPI"""
+    try:
+        symbol = request.GET.get('symbol')
+        language = request.GET.get('language', 'en')
+
+        if not symbol:
+            return JsonResponse({'error': 'Symbol parameter is required'}, status=400)
+
+        data = await AsyncFinanceDataService.get_stock_price(symbol, language)
+        return JsonResponse(data, safe=False)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error getting stock price: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@async_api_view(['GET'])
+async def market_news(request):
+    """Get market news from RapidAPI"""
+    try:
+        symbols = request.GET.get('symbols')
+        language = request.GET.get('language', 'en')
+
+        data = await AsyncFinanceDataService.get_market_news(symbols, language)
+        return JsonResponse(data, safe=False)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error getting market news: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@async_api_view(['GET'])
+async def stock_quote(request):
+    """Get stock quote data from RapidAPI"""
+    try:
+        symbol = request.GET.get('symbol')
+        language = request.GET.get('language', 'en')
+
+        if not symbol:
+            return JsonResponse({'error': 'Symbol parameter is required'}, status=400)
+
+        data = await AsyncFinanceDataService.get_stock_quote(symbol, language)
+        return JsonResponse(data, safe=False)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error getting stock quote: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@async_api_view(['POST'])
+async def batch_quotes(request):
+    """Get stock quotes for many symbols in one request from RapidAPI"""
+    try:
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'error': 'Request body must be valid JSON'}, status=400)
+
+        symbols = payload.get('symbols') if isinstance(payload, dict) else None
+        language = payload.get('language', 'en') if isinstance(payload, dict) else 'en'
+
+        if not isinstance(symbols, list) or not symbols:
+            return JsonResponse({'error': 'Symbols must be a non-empty list'}, status=400)
+        if not all(isinstance(symbol, str) and symbol.strip() for symbol in symbols):
+            return JsonResponse({'error': 'Symbols must be non-empty strings'}, status=400)
+        if len(set(symbol.strip().upper() for symbol in symbols)) > BATCH_MAX_SYMBOLS:
+            return JsonResponse({'error': f'At most {BATCH_MAX_SYMBOLS} symbols are allowed per request'}, status=400)
+
+        results = await AsyncFinanceDataService.get_stock_quotes(symbols, language)
+        return JsonResponse({'results': results})
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error getting batch stock quotes: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@async_api_view(['GET'])
+async def quote_stream(request):
+    """
+    Push quote updates for ?symbols=AAPL,MSFT as server-sent events.
+
+    Each symbol first gets a 'snapshot' event with the full quote, then a
+    'quote' event with only the fields that changed whenever its shared
+    poller sees new data. Every event has 'stale': null, or the reason the
+    quote comes from an expired cache entry. Requires the ASGI server: the
+    pollers live on its event loop and are shared by every open stream.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Quote streaming requires the ASGI server'}, status=501)
+
+    symbols = list(dict.fromkeys(
+        symbol.strip().upper() for symbol in request.GET.get('symbols', '').split(',') if symbol.strip()
+    ))
+    if not symbols:
+        return JsonResponse({'error': 'Symbols are required'}, status=400)
+    if len(symbols) > QUOTE_STREAM_MAX_SYMBOLS:
+        return JsonResponse({'error': f'At most {QUOTE_STREAM_MAX_SYMBOLS} symbols may be streamed at once'}, status=400)
+
+    async def events():
+        hub = get_quote_hub()
+        subscription = hub.subscribe(symbols)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), QUOTE_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+                    continue
+                yield sse_event(event['type'], {
+                    'symbol': event['symbol'], 'fields': event['fields'], 'stale': event['stale'],
+                })
+        finally:
+            # Runs when the client disconnects and Django cancels the stream
+            hub.unsubscribe(subscription)
+
+    return sse_response(request, events())
+
+@async_api_view(['GET'])
+async def search_symbols(request):
+    """Search for financial symbols from RapidAPI"""
+    try:
+        query = request.GET.get('query')
+        language = request.GET.get('language', 'en')
+
+        if not query:
+            return JsonResponse({'error': 'Query parameter is required'}, status=400)
+
+        data = await AsyncFinanceDataService.search_symbols(query, language)
+        return JsonResponse(data, safe=False)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error searching symbols: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@async_api_view(['GET'])
+async def market_tickers(request):
+    """List market tickers from the latest crawled snapshot, or proxy Yahoo Finance RapidAPI"""
+    try:
+        page = request.GET.get('page', '1')
+        ticker_type = request.GET.get('type', 'STOCKS')
+
+        try:
+            snapshot = await sync_to_async(query_tickers)(ticker_type.upper(), request.GET)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if snapshot is not None:
+            return JsonResponse(snapshot)
+
+        data = await AsyncFinanceDataService.get_market_tickers(page, ticker_type)
+        return JsonResponse(data, safe=False)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error getting market tickers: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@async_api_view(['GET'])
+async def ticker_details(request, ticker):
+    """Get ticker details from Yahoo Finance RapidAPI"""
+    try:
+        data = await AsyncFinanceDataService.get_ticker_details(ticker)
+        return JsonResponse(data, safe=False)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error getting ticker details: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@async_api_view(['GET'])
+async def ticker_news(request, ticker):
+    """Get news for a specific ticker from Yahoo Finance RapidAPI"""
+    try:
+        news_type = request.GET.get('type', 'ALL')
+
+        data = await AsyncFinanceDataService.get_ticker_news(ticker, news_type)
+        return JsonResponse(data, safe=False)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error getting ticker news: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
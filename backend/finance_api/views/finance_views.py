@@ -1,12 +1,32 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from ..services.finance_data_service import FinanceDataService
+from ..services.finance_data_service import FinanceDataService, BATCH_MAX_SYMBOLS
+from ..services.circuit_breaker import UpstreamUnavailable
+from ..services.metrics import METRICS_ALLOWED_IPS, registry
+from ..services.price_history import ingest_history, price_chart
+from ..services.rate_limiter import RateLimitExceeded
+from ..services.ticker_snapshots import query_tickers
 import logging
+import math
 
 logger = logging.getLogger(__name__)
 
+def rate_limited_response(error: RateLimitExceeded) -> Response:
+    """429 response for a request shed by the upstream rate limiter"""
+    response = Response({'error': str(error)}, status=429)
+    if error.retry_after is not None:
+        response['Retry-After'] = str(math.ceil(error.retry_after))
+    return response
+
+def upstream_unavailable_response(error: UpstreamUnavailable) -> Response:
+    """503 response for an upstream API that is failing and has nothing cached"""
+    response = Response({'error': str(error)}, status=503)
+    if error.retry_after:
+        response['Retry-After'] = str(math.ceil(error.retry_after))
+    return response
+
 @api_view(['GET'])
 def company_cash_flow(request):
     """Get company cash flow data from RapidAPI"""
@@ -20,6 +40,10 @@ def company_cash_flow(request):
         
         data = FinanceDataService.get_company_cash_flow(symbol, period, language)
         return Response(data)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
     except Exception as e:
         logger.error(f"Error getting company cash flow: {e}")
         return Response({'error': str(e)}, status=500)
@@ -36,6 +60,10 @@ def company_data(request):
         
         data = FinanceDataService.get_company_data(symbol, language)
         return Response(data)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
     except Exception as e:
         logger.error(f"Error getting company data: {e}")
         return Response({'error': str(e)}, status=500)
@@ -52,6 +80,10 @@ def stock_price(request):
         
         data = FinanceDataService.get_stock_price(symbol, language)
         return Response(data)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
     except Exception as e:
         logger.error(f"Error getting stock price: {e}")
         return Response({'error': str(e)}, status=500)
@@ -65,6 +97,10 @@ def market_news(request):
         
         data = FinanceDataService.get_market_news(symbols, language)
         return Response(data)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
     except Exception as e:
         logger.error(f"Error getting market news: {e}")
         return Response({'error': str(e)}, status=500)
@@ -81,10 +117,38 @@ def stock_quote(request):
         
         data = FinanceDataService.get_stock_quote(symbol, language)
         return Response(data)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
     except Exception as e:
         logger.error(f"Error getting stock quote: {e}")
         return Response({'error': str(e)}, status=500)
 
+@api_view(['POST'])
+def batch_quotes(request):
+    """Get stock quotes for many symbols in one request from RapidAPI"""
+    try:
+        symbols = request.data.get('symbols')
+        language = request.data.get('language', 'en')
+        
+        if not isinstance(symbols, list) or not symbols:
+            return Response({'error': 'Symbols must be a non-empty list'}, status=400)
+        if not all(isinstance(symbol, str) and symbol.strip() for symbol in symbols):
+            return Response({'error': 'Symbols must be non-empty strings'}, status=400)
+        if len(set(symbol.strip().upper() for symbol in symbols)) > BATCH_MAX_SYMBOLS:
+            return Response({'error': f'At most {BATCH_MAX_SYMBOLS} symbols are allowed per request'}, status=400)
+        
+        results = FinanceDataService.get_stock_quotes(symbols, language)
+        return Response({'results': results})
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error getting batch stock quotes: {e}")
+        return Response({'error': str(e)}, status=500)
+
 @api_view(['GET'])
 def search_symbols(request):
     """Search for financial symbols from RapidAPI"""
@@ -97,19 +161,40 @@ def search_symbols(request):
         
         data = FinanceDataService.search_symbols(query, language)
         return Response(data)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
     except Exception as e:
         logger.error(f"Error searching symbols: {e}")
         return Response({'error': str(e)}, status=500)
 
 @api_view(['GET'])
 def market_tickers(request):
-    """Get market tickers from Yahoo Finance RapidAPI"""
+    """
+    List market tickers from the latest crawled snapshot.
+    
+    Supports the filtering, sorting and pagination parameters of
+    query_tickers(). Types that have not been crawled yet are proxied to
+    Yahoo Finance RapidAPI page by page.
+    """
     try:
         page = request.GET.get('page', '1')
         ticker_type = request.GET.get('type', 'STOCKS')
         
+        try:
+            snapshot = query_tickers(ticker_type.upper(), request.GET)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        if snapshot is not None:
+            return Response(snapshot)
+        
         data = FinanceDataService.get_market_tickers(page, ticker_type)
         return Response(data)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
     except Exception as e:
         logger.error(f"Error getting market tickers: {e}")
         return Response({'error': str(e)}, status=500)
@@ -120,6 +205,10 @@ def ticker_details(request, ticker):
     try:
         data = FinanceDataService.get_ticker_details(ticker)
         return Response(data)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
     except Exception as e:
         logger.error(f"Error getting ticker details: {e}")
         return Response({'error': str(e)}, status=500)
@@ -132,6 +221,59 @@ def ticker_news(request, ticker):
         
         data = FinanceDataService.get_ticker_news(ticker, news_type)
         return Response(data)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
     except Exception as e:
         logger.error(f"Error getting ticker news: {e}")
-        return Response({'error': str(e)}, status=500)
\ No newline at end of file
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+def chart(request):
+    """
+    Get OHLCV chart bars from the local price history store.
+    
+    Supports the interval, start, end and max_points parameters of
+    price_chart(). A symbol with no stored history is ingested from
+    RapidAPI first.
+    """
+    try:
+        symbol = request.GET.get('symbol')
+        
+        if not symbol:
+            return Response({'error': 'Symbol parameter is required'}, status=400)
+        
+        try:
+            data = price_chart(symbol, request.GET)
+            if data is None:
+                ingest_history(symbol, '1d')
+                data = price_chart(symbol, request.GET)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        if data is None:
+            return Response({'error': f'No price history for {symbol}'}, status=404)
+        return Response(data)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except Exception as e:
+        logger.error(f"Error getting chart: {e}")
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+def rate_limits(request):
+    """Get the upstream rate limits, daily quota usage and admission counters"""
+    return Response(FinanceDataService.rate_limit_stats())
+
+@api_view(['GET'])
+def circuit_breakers(request):
+    """Get the circuit breaker state of each upstream endpoint"""
+    return Response(FinanceDataService.circuit_breaker_stats())
+
+def metrics(request):
+    """Prometheus scrape endpoint, limited to FINANCE_METRICS_ALLOWED_IPS"""
+    if request.META.get('REMOTE_ADDR') not in METRICS_ALLOWED_IPS:
+        return HttpResponse(status=403)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')